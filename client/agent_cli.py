@@ -1,17 +1,26 @@
 import argparse
+import itertools
 import json
 import os
 import re
 import subprocess
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
 from dataclasses import dataclass
+from types import SimpleNamespace
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from openai import OpenAI
 
 import yaml
+from client.budget import StepBudget
+from client.compaction import ContextCompactor
+from client.render import render_tool_result
 from client.session_log import SessionLogger
+from mcp_server import framing as wire
 
 CONFIG_PATH = Path("configs/config.yaml")
 
@@ -28,8 +37,29 @@ def load_config() -> dict:
     }
 
 
+# Per-tool deadlines in seconds (override with tool_timeouts in configs/config.yaml).
+# A call that exceeds its deadline is cancelled on the server.
+DEFAULT_TOOL_TIMEOUTS: Dict[str, float] = {
+    "elasticsearch_search": 30.0,
+    "read_file_range": 15.0,
+    "read_file_ranges": 15.0,
+    "list_paths": 15.0,
+    "search_rg": 60.0,
+    "file_search": 120.0,
+}
+
+
+# Tool calls of one LLM step that run at the same time (override with
+# tool_concurrency in configs/config.yaml or AGENT_TOOL_CONCURRENCY)
+DEFAULT_TOOL_CONCURRENCY = int(os.environ.get("AGENT_TOOL_CONCURRENCY", "4"))
+
+
+class MCPTimeoutError(RuntimeError):
+    pass
+
+
 class MCPClient:
-    def __init__(self, server_cmd: Optional[List[str]] = None, cwd: Optional[Path] = None, env: Optional[dict] = None, logger: Optional[SessionLogger] = None):
+    def __init__(self, server_cmd: Optional[List[str]] = None, cwd: Optional[Path] = None, env: Optional[dict] = None, logger: Optional[SessionLogger] = None, tool_timeouts: Optional[Dict[str, float]] = None, framing: Optional[str] = None):
         if server_cmd is None:
             server_cmd = [sys.executable, "-u", "mcp_server/server.py"]
         self.proc = subprocess.Popen(
@@ -39,23 +69,227 @@ class MCPClient:
             stderr=subprocess.PIPE,
             cwd=cwd or Path.cwd(),
             env=env,
-            text=True,
-            encoding="utf-8",
-            bufsize=1,
         )
+        # Wire format: "line" (line-delimited JSON), "length" (length-prefixed
+        # frames, codec negotiated with the server), "length:<codec>" to offer
+        # a single codec, or "auto" (= "length", falling back to lines if the
+        # server does not support it)
+        self.framing = "line"
+        self.codec = "json"
         self._id = 0
         self.logger = logger
+        self.tool_timeouts = {**DEFAULT_TOOL_TIMEOUTS, **(tool_timeouts or {})}
+        # Last stderr lines of the server, reported if it dies
+        self._stderr_tail: deque = deque(maxlen=20)
+        threading.Thread(target=self._drain_stderr, name="mcp-client-stderr", daemon=True).start()
+        requested, _, only_codec = (framing or os.environ.get("MCP_FRAMING") or "auto").lower().partition(":")
+        if requested in ("auto", "length"):
+            self._negotiate([only_codec] if only_codec else wire.available_codecs())
+        # Requests are pipelined: any number may be in flight, the reader
+        # thread resolves each pending Future by the JSON-RPC id of its response.
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._exit_reason = "No response from MCP server"
+        self._reader = threading.Thread(target=self._read_responses, name="mcp-client-reader", daemon=True)
+        self._reader.start()
+
+    def _negotiate(self, codecs: List[str]) -> None:
+        """Offer length-prefixed framing with our codecs; runs before the reader thread starts.
 
-    def call_tool(self, tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
-        self._id += 1
-        req = {"jsonrpc": "2.0", "id": self._id, "method": "call_tool", "params": {"tool": tool, "args": args}}
+        A server that does not answer within the longest tool deadline is
+        stopped and MCPTimeoutError raised.
+        """
         assert self.proc.stdin and self.proc.stdout
-        self.proc.stdin.write(json.dumps(req, ensure_ascii=False) + "\n")
-        self.proc.stdin.flush()
-        line = self.proc.stdout.readline()
-        if not line:
-            raise RuntimeError("No response from MCP server")
-        resp = json.loads(line)
+        req = {"jsonrpc": "2.0", "id": 0, "method": "negotiate", "params": {"framing": "length", "codecs": codecs}}
+        deadline = max(self.tool_timeouts.values(), default=None)
+        answer: Future = Future()
+
+        def read_answer() -> None:
+            try:
+                answer.set_result(self.proc.stdout.readline())
+            except Exception as e:
+                answer.set_exception(e)
+
+        try:
+            self.proc.stdin.write(json.dumps(req).encode("utf-8") + b"\n")
+            self.proc.stdin.flush()
+            threading.Thread(target=read_answer, name="mcp-client-negotiate", daemon=True).start()
+            resp = json.loads(answer.result(timeout=deadline) or b"{}")
+        except FutureTimeout:
+            # The reader would take the next line, so the connection is unusable
+            self.proc.kill()
+            raise MCPTimeoutError(f"MCP server did not answer within {deadline:g}s: {self._exit_message()}")
+        except (OSError, ValueError):
+            return
+        result = resp.get("result") or {}
+        if result.get("framing") == "length":
+            self.framing = "length"
+            self.codec = result.get("codec") or "json"
+
+    def _next_response(self) -> Optional[Any]:
+        """Next decoded message from the server; None at EOF"""
+        assert self.proc.stdout
+        if self.framing == "length":
+            while True:
+                try:
+                    payload = wire.read_frame(self.proc.stdout)
+                except (EOFError, ValueError):
+                    return None
+                if payload is None:
+                    return None
+                try:
+                    return wire.decode(payload, self.codec)
+                except Exception:
+                    # One undecodable frame; the stream is still in step
+                    continue
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if line:
+                try:
+                    return json.loads(line)
+                except ValueError:
+                    continue
+
+    def _read_responses(self) -> None:
+        error: Optional[Exception] = None
+        while True:
+            try:
+                resp = self._next_response()
+            except Exception as e:
+                # Reading again would fail the same way (e.g. stdout closed)
+                error = e
+                break
+            if resp is None:
+                break
+            if not isinstance(resp, dict):
+                continue
+            with self._lock:
+                fut = self._pending.pop(resp.get("id"), None)
+            if fut is not None:
+                fut.set_result(resp)
+        # Server exited or its output is unreadable: fail everything still waiting
+        reason = f"MCP server output unreadable: {error}" if error is not None else self._exit_message()
+        with self._lock:
+            self._closed = True
+            self._exit_reason = reason
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for fut in pending:
+            fut.set_exception(RuntimeError(reason))
+
+    def _drain_stderr(self) -> None:
+        if self.proc.stderr is None:
+            return
+        for line in self.proc.stderr:
+            self._stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+
+    def _exit_message(self) -> str:
+        try:
+            code = self.proc.wait(timeout=1)
+        except Exception:
+            code = None
+        msg = "No response from MCP server"
+        if code is not None:
+            msg += f" (exit code {code})"
+        tail = [l for l in list(self._stderr_tail)[-3:] if l]
+        if tail:
+            msg += ": " + " | ".join(tail)
+        return msg
+
+    def submit(self, method: str, params: Optional[Dict[str, Any]] = None) -> Future:
+        """Send a JSON-RPC request without waiting; the Future resolves to the raw response"""
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(self._exit_reason)
+            self._id += 1
+            req = {"jsonrpc": "2.0", "id": self._id, "method": method, "params": params or {}}
+            fut.request_id = self._id
+            self._pending[self._id] = fut
+            assert self.proc.stdin
+            try:
+                if self.framing == "length":
+                    wire.write_frame(self.proc.stdin, wire.encode(req, self.codec))
+                else:
+                    self.proc.stdin.write(json.dumps(req, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.proc.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError) as e:
+                self._pending.pop(self._id, None)
+                raise RuntimeError(f"MCP server not reachable: {e}")
+        return fut
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None and not self._closed
+
+    def ping(self, timeout: Optional[float] = None) -> bool:
+        """Round-trip a ping request; False if the server is gone or too slow"""
+        try:
+            resp = self.submit("ping").result(timeout=timeout)
+        except Exception:
+            return False
+        return bool((resp.get("result") or {}).get("ok"))
+
+    def submit_tool(self, tool: str, args: Dict[str, Any]) -> Future:
+        return self.submit("call_tool", {"tool": tool, "args": args})
+
+    def cancel(self, request_id: int) -> None:
+        """Ask the server to cancel a request (kills its ripgrep children) and stop waiting for it"""
+        with self._lock:
+            fut = self._pending.pop(request_id, None)
+        if fut is not None and not fut.done():
+            fut.set_exception(RuntimeError("Request cancelled"))
+        try:
+            self.submit("cancel", {"id": request_id})
+        except RuntimeError:
+            pass
+
+    def call_tool(self, tool: str, args: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.finish_tool(tool, args, self.submit_tool(tool, args), timeout=timeout)
+
+    def call_tools(self, calls: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run several tool calls in one call_tools request
+
+        calls: [{"tool": ..., "args": {...}}, ...]. Returns one entry per call,
+        in order: {"result": ...} or {"error": {"code", "message"}}. Waits at
+        most timeout seconds (default: the longest deadline among the tools).
+        """
+        fut = self.submit("call_tools", {"calls": calls})
+        deadlines = [self.tool_timeouts.get(c.get("tool")) for c in calls if isinstance(c, dict)]
+        deadline = timeout if timeout is not None else max((d for d in deadlines if d), default=None)
+        try:
+            resp = fut.result(timeout=deadline)
+        except FutureTimeout:
+            self.cancel(getattr(fut, "request_id", None))
+            raise MCPTimeoutError(f"call_tools timed out after {deadline:g}s")
+        if "error" in resp:
+            raise RuntimeError(resp["error"].get("message", "Unknown error"))
+        items = (resp.get("result") or {}).get("results", [])
+        if self.logger is not None:
+            for call, item in zip(calls, items):
+                if "result" in item and isinstance(call, dict):
+                    try:
+                        self.logger.log_tool(call.get("tool"), call.get("args") or {}, item["result"] or {})
+                    except Exception:
+                        pass
+        return items
+
+    def finish_tool(self, tool: str, args: Dict[str, Any], fut: Future, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait for a submitted tool call, then log and print it like call_tool
+
+        Waits at most timeout seconds (default: the tool's deadline from
+        tool_timeouts); on expiry the call is cancelled and MCPTimeoutError raised.
+        """
+        deadline = timeout if timeout is not None else self.tool_timeouts.get(tool)
+        try:
+            resp = fut.result(timeout=deadline)
+        except FutureTimeout:
+            self.cancel(getattr(fut, "request_id", None))
+            raise MCPTimeoutError(f"{tool} timed out after {deadline:g}s")
         if "error" in resp:
             raise RuntimeError(resp["error"].get("message", "Unknown error"))
         result = resp.get("result", {})
@@ -87,6 +321,16 @@ class MCPClient:
                     range_str = f"bytes {start_byte}-{end_byte}"
                 
                 return f"tool: {tool}\npath: {path}\nresult: {text}\n{range_str}"
+            if tool == "read_file_ranges":
+                snippets = (result or {}).get("snippets", [])
+                errors = (result or {}).get("errors", [])
+                lines: List[str] = [f"tool: {tool}", f"requested: {len(args.get('ranges') or [])}, snippets: {len(snippets)}, errors: {len(errors)}"]
+                for snip in snippets[:10]:
+                    first, last = snip.get("line_range", [None, None])
+                    lines.append(f"  {snip.get('path')}:{first}-{last} (lines {snip.get('lines')})")
+                for err in errors[:5]:
+                    lines.append(f"  {err.get('path')}: {err.get('error')}")
+                return "\n".join(lines)
             if tool == "search_rg":
                 matches = (result or {}).get("matches", [])
                 q = args.get("query")
@@ -142,10 +386,14 @@ class MCPClient:
             pass
         return result
 
-    def close(self):
+    def close(self, timeout: float = 2.0):
         try:
             if self.proc.stdin:
                 self.proc.stdin.close()
+            # EOF lets the server finish in-flight calls and flush its log
+            self.proc.wait(timeout=timeout)
+        except Exception:
+            pass
         finally:
             try:
                 self.proc.terminate()
@@ -153,6 +401,93 @@ class MCPClient:
                 pass
 
 
+class InProcessMCPClient(MCPClient):
+    """
+    MCPClient with the same interface that runs mcp_server.server.handle_call
+    in this process on a thread pool instead of talking to a subprocess.
+
+    Arguments and results are passed as Python objects, which skips the JSON
+    encode/decode on both sides of the stdio pipe. The tools read their
+    configuration (LEGAL_DOC_ROOT, configs/config.yaml) from this process.
+    """
+
+    # Ids are shared by all in-process clients: the tools' cancellation
+    # registry is process-wide
+    _ids = itertools.count(1)
+
+    def __init__(self, logger: Optional[SessionLogger] = None, max_workers: int = 8, tool_timeouts: Optional[Dict[str, float]] = None):
+        # Imported lazily so the stdio client does not load the tool stack
+        from mcp_server import server as mcp_server, tools as mcp_tools
+
+        self._server = mcp_server
+        self._tools = mcp_tools
+        self.logger = logger
+        self.tool_timeouts = {**DEFAULT_TOOL_TIMEOUTS, **(tool_timeouts or {})}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-inproc")
+        # request id -> executor Future of calls queued or running (as the
+        # server's in-flight set, so cancel can reach calls not started yet)
+        self._inflight: Dict[int, Future] = {}
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed
+
+    def submit(self, method: str, params: Optional[Dict[str, Any]] = None) -> Future:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MCP client is closed")
+            req = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or {}}
+            fut = self._executor.submit(self._run, req)
+            self._inflight[req["id"]] = fut
+        fut.request_id = req["id"]
+        return fut
+
+    def _run(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self._server.handle_call(req)
+        finally:
+            with self._lock:
+                self._inflight.pop(req["id"], None)
+                self._tools.release_call(req["id"])
+
+    def cancel(self, request_id: int) -> None:
+        # Run inline: the pool may be busy with the very call being cancelled
+        with self._lock:
+            fut = self._inflight.get(request_id)
+            if fut is None:
+                # Already answered (or never seen): nothing to cancel
+                return
+            if fut.cancel():
+                # Still queued: it will never run
+                self._inflight.pop(request_id, None)
+                return
+            # Started: _run releases the flag when the call is done
+            self._tools.cancel_call(request_id, queued=True)
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+
+def make_mcp_client(
+    server_cmd: Optional[List[str]] = None,
+    env: Optional[dict] = None,
+    logger: Optional[SessionLogger] = None,
+    transport: Optional[str] = None,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+    framing: Optional[str] = None,
+) -> MCPClient:
+    """Create an MCP client for the given transport ("stdio" or "inprocess", default $MCP_TRANSPORT)"""
+    transport = (transport or os.environ.get("MCP_TRANSPORT") or "stdio").lower()
+    if transport == "inprocess":
+        return InProcessMCPClient(logger=logger, tool_timeouts=tool_timeouts)
+    if transport != "stdio":
+        raise ValueError(f"Unknown MCP transport: {transport}")
+    return MCPClient(server_cmd=server_cmd, env=env, logger=logger, tool_timeouts=tool_timeouts, framing=framing)
+
+
 @dataclass
 class Hit:
     path: str
@@ -191,9 +526,7 @@ def call_llm(
         raise RuntimeError(f"LLM request failed: {e}")
     try:
         if completion.usage:
-            tokens_sent = completion.usage.prompt_tokens
-            tokens_received = completion.usage.completion_tokens
-            print(f"[TOKENS] {tokens_sent} sent, {tokens_received} received")
+            print(f"[TOKENS] {format_token_usage(completion.usage)}")
         return completion.choices[0].message.content or ""
     except Exception as e:
         raise RuntimeError(f"LLM response parse error: {e}")
@@ -201,7 +534,7 @@ def call_llm(
 
 TOOL_SUMMARY = (
     "Verfügbare Werkzeuge (Function Calling):\n"
-    "1) elasticsearch_search (BEVORZUGT): Argumente {query: Suchbegriff(e), document_type?: 'all'|'gesetze'|'urteile', max_results?: Zahl}. Rückgabe {total_hits, matches: [{title, document_type, file_path, score, content_preview, line_matches, metadata}]}. Schnelle Volltextsuche über gesamten Rechtskorpus mit Relevanz-Ranking.\n"
+    "1) elasticsearch_search (BEVORZUGT): Argumente {query: Suchbegriff(e), document_type?: 'all'|'gesetze'|'urteile', max_results?: Zahl}. Rückgabe: Trefferzahl und je Treffer Pfad, Dokumenttyp, Titel, Metadaten und Fundstellen mit Zeilennummern. Schnelle Volltextsuche über gesamten Rechtskorpus mit Relevanz-Ranking.\n"
 #    "2) search_rg (ripgrep): Argumente {query: Schlagwort, file_list?: Zeichenkette[], max_results?: Zahl, context_lines?: Zahl, regex?: bool, case_sensitive?: bool}. Rückgabe {matches: [{file, line, text, context, section, byte_range}]}. Präzise Suche in spezifischen Dateien.\n"
 #    "2) read_file_range: Argumente {path, start, end, context?, max_lines?}. Rückgabe: Textausschnitt um den Treffer (max. 20 Zeilen standardmäßig).\n"
 #    "3) file_search: Argumente {query: Zeichenkette mit AND/OR und Klammern, glob?: Zeichenkette, max_results?: Zahl}. Rückgabe {files: Zeichenkette[]}. Dateinamen-basierte Suche.\n"
@@ -217,8 +550,10 @@ SYSTEM_PROMPT = (
     "- Verwende elasticsearch_search mit präzisen rechtlichen Suchbegriffen (z.B. 'Kündigungsfrist', 'BGB § 573', 'fristlose Kündigung').\n"
     "- Nutze document_type Parameter: 'all' (Standard), 'gesetze' (nur Gesetze), 'urteile' (nur Rechtsprechung).\n"
     "- Bei Gesetzen: Suche sowohl mit Vollname als auch Abkürzung (z.B. 'BGB' und 'Bürgerliches Gesetzbuch').\n"
-    "- Elasticsearch liefert title, document_type, content_preview, line_matches und metadata - nutze diese Informationen.\n"
+    "- Elasticsearch liefert je Treffer Pfad (file_path), Dokumenttyp, Titel, Metadaten und Fundstellen - nutze diese Informationen.\n"
+    "- In Werkzeugergebnissen beginnt jeder Treffer bzw. Textausschnitt mit '=== Pfad'; 'N>' markiert die Trefferzeile N, 'N:' eine Kontextzeile.\n"
     "- Für detaillierte Textausschnitte: Verwende read_file_range mit den file_path und line_number Angaben aus elasticsearch_search.\n"
+    "- Mehrere Textstellen (z.B. alle line_matches mehrerer Treffer) liest du in EINEM Aufruf mit read_file_ranges; überlappende Fenster werden zusammengefasst.\n"
     "- search_rg nur als Ergänzung für präzise Suchen in spezifischen Dateien, wenn elasticsearch_search nicht ausreicht.\n"
     "- Verwende mehrere Suchstrategien: Einzelwörter, exakte Phrasen, und verwandte Begriffe.\n"
     "- Wenn ausreichend, erzeuge final_answer mit kurzer Textstelle und Zitation (Pfad + Zeilennummer).\n"
@@ -263,6 +598,7 @@ def _build_tools_spec() -> List[Dict[str, Any]]:
                         "document_type": {"type": "string", "enum": ["all", "gesetze", "urteile"], "description": "Type of documents: 'all' (default), 'gesetze' (laws only), 'urteile' (court decisions only)"},
                         "max_results": {"type": "integer", "minimum": 3, "maximum": 50, "description": "Maximum number of results (default 10)"},
                         "context_lines": {"type": "integer", "minimum": 0, "maximum": 10, "description": "Number of lines before and after each match to include (default 2)"},
+                        "passages": {"type": "boolean", "description": "Search section/paragraph/Randnummer passages grouped by document instead of whole documents (more precise line hits, default false)"},
                     },
                     "required": ["query"],
                 },
@@ -336,21 +672,197 @@ def _build_tools_spec() -> List[Dict[str, Any]]:
                 },
             },
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "read_file_ranges",
+                "description": "Read many line windows in one call (e.g. all line_matches of several elasticsearch_search hits). Overlapping windows in a file are merged into one snippet; each file is opened once.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "ranges": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "path": {"type": "string", "description": "File path relative to document root"},
+                                    "line_number": {"type": "integer", "minimum": 1, "description": "Line number to read around (1-based)"},
+                                    "context_lines": {"type": "integer", "minimum": 0, "description": "Lines before and after to include (default 2)"},
+                                },
+                                "required": ["path", "line_number"],
+                            },
+                            "description": "Windows to read",
+                        },
+                        "max_lines": {"type": "integer", "minimum": 1, "description": "Maximum lines per merged snippet (default: no limit)"},
+                    },
+                    "required": ["ranges"],
+                },
+            },
+        },
     ]
 
 
-def build_dispatch_functions(mcp: MCPClient, cfg: dict) -> Dict[str, Any]:
-    """Build dispatcher functions for MCP tools"""
+# Built once: SYSTEM_PROMPT and the tools spec form the prompt prefix shared by
+# every LLM call of every session. Keeping it byte-identical lets providers
+# with prompt caching (OpenAI, DeepSeek, Anthropic/Gemini via OpenRouter,
+# vLLM/SGLang prefix caching) reuse it instead of recomputing it.
+TOOLS_SPEC: List[Dict[str, Any]] = _build_tools_spec()
+
+# OpenRouter models that only cache at explicit cache_control breakpoints
+EXPLICIT_CACHE_MODELS = ("anthropic/", "google/gemini")
+
+
+def system_message(provider: str, model: str, prompt_cache: bool = True) -> Dict[str, Any]:
+    """System message that starts every agent conversation.
+
+    Models with explicit prompt caching get a cache breakpoint after the
+    system prompt, which covers the tools spec in front of it as well.
+    """
+    if prompt_cache and provider == "openrouter" and (model or "").startswith(EXPLICIT_CACHE_MODELS):
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+        }
+    return {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Prompt tokens the provider served from its prompt cache (0 if not reported)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens")
+    else:
+        cached = getattr(details, "cached_tokens", None)
+    if cached is None:
+        # DeepSeek-style usage
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    try:
+        return int(cached or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_token_usage(usage: Any) -> str:
+    """'X sent, Y received[, Z cached]' as parsed by web_server.api"""
+    text = f"{usage.prompt_tokens} sent, {usage.completion_tokens} received"
+    cached = cached_prompt_tokens(usage)
+    return f"{text}, {cached} cached" if cached else text
+
+
+def _canonical_args(value: Any) -> Any:
+    """Arguments with None dropped and whitespace in strings collapsed, for comparing calls"""
+    if isinstance(value, dict):
+        return {k: _canonical_args(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_args(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class ToolCallMemo:
+    """Per-session memo of tool calls.
+
+    A call repeating an earlier one (same tool, same arguments after
+    defaults are applied) is not sent to the MCP server; the LLM gets a
+    short reference to the step that already holds the result. Once that
+    step is older than max_age (its result has been compacted, see
+    ContextCompactor) the remembered result is sent again in full instead.
+    A repeat of a call that is still running (same step, or concurrently)
+    waits for it and gets its result or error.
+    """
+
+    def __init__(self, max_age: Optional[int] = None):
+        self.step = 0
+        self.max_age = max_age
+        self.hits = 0
+        # key -> [step, Future of the rendered result]
+        self._calls: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(tool: str, params: Dict[str, Any]) -> str:
+        return tool + ":" + json.dumps(_canonical_args(params), sort_keys=True, ensure_ascii=False)
+
+    def lookup(self, tool: str, params: Dict[str, Any]) -> Optional[str]:
+        """Text to return instead of calling the tool, or None (the caller runs it and must record or forget it).
+
+        Raises the error of a still running identical call that fails.
+        """
+        key = self.key(tool, params)
+        with self._lock:
+            entry = self._calls.get(key)
+            if entry is None:
+                self._calls[key] = [self.step, Future()]
+                return None
+            self.hits += 1
+            step, future = entry
+        if not future.done():
+            # The first call has no result in any step yet: share its outcome
+            return future.result()
+        text = future.result()
+        with self._lock:
+            if self.max_age is not None and self.step - step > self.max_age:
+                entry[0] = self.step
+                return text
+        return f"[Bereits abgerufen: {tool} mit denselben Argumenten in Schritt {step}, Ergebnis siehe dort.]"
+
+    def record(self, tool: str, params: Dict[str, Any], text: str) -> None:
+        with self._lock:
+            entry = self._calls.get(self.key(tool, params))
+        if entry is not None and not entry[1].done():
+            entry[1].set_result(text)
+
+    def forget(self, tool: str, params: Dict[str, Any], text: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        """Failed calls are not memoized, so a retry reaches the server; waiting repeats get text or error"""
+        with self._lock:
+            entry = self._calls.pop(self.key(tool, params), None)
+        if entry is None or entry[1].done():
+            return
+        if error is not None:
+            entry[1].set_exception(error)
+        else:
+            entry[1].set_result(text)
+
+
+def build_dispatch_functions(mcp: MCPClient, cfg: dict, memo: Optional[ToolCallMemo] = None) -> Dict[str, Any]:
+    """Build dispatcher functions for MCP tools.
+
+    Results are rendered for the LLM by client.render (compact text by
+    default, raw JSON with tool_result_format: json). With a memo, repeated
+    identical calls within the session are answered from it.
+    """
+    result_format = cfg.get("tool_result_format", "compact")
+    result_fields = cfg.get("tool_result_fields")
+
+    def _call(tool: str, params: Dict[str, Any]) -> str:
+        if memo is not None:
+            seen = memo.lookup(tool, params)
+            if seen is not None:
+                return seen
+        try:
+            res = mcp.call_tool(tool, params)
+            text = render_tool_result(tool, res, fmt=result_format, fields=result_fields)
+        except Exception as e:
+            if memo is not None:
+                memo.forget(tool, params, error=e)
+            raise
+        if memo is not None:
+            if isinstance(res, dict) and res.get("error"):
+                memo.forget(tool, params, text=text)
+            else:
+                memo.record(tool, params, text)
+        return text
+
     def dispatch_file_search(query: str, glob: Optional[str] = None, max_results: Optional[int] = None) -> str:
-        res = mcp.call_tool("file_search", {
+        return _call("file_search", {
             "query": query,
             "glob": glob or cfg.get("glob", "**/*.{txt,md}"),
             "max_results": max_results or cfg.get("max_results", 30),
         })
-        return json.dumps(res, ensure_ascii=False)
 
     def dispatch_search_rg(query: str, file_list: Optional[List[str]] = None, max_results: Optional[int] = None, context_lines: Optional[int] = None, regex: Optional[bool] = None, case_sensitive: Optional[bool] = None) -> str:
-        res = mcp.call_tool("search_rg", {
+        return _call("search_rg", {
             "query": query,
             "file_list": file_list,
             "max_results": max_results or 10,
@@ -358,13 +870,11 @@ def build_dispatch_functions(mcp: MCPClient, cfg: dict) -> Dict[str, Any]:
             "regex": regex or False,
             "case_sensitive": case_sensitive or False,
         })
-        return json.dumps(res, ensure_ascii=False)
 
     def dispatch_list_paths(subdir: Optional[str] = None) -> str:
-        res = mcp.call_tool("list_paths", {
+        return _call("list_paths", {
             "subdir": subdir,
         })
-        return json.dumps(res, ensure_ascii=False)
 
     def dispatch_read_file_range(path: str, start: int = None, end: int = None, context: Optional[int] = None, max_lines: Optional[int] = None, line_number: Optional[int] = None, context_lines: Optional[int] = None) -> str:
         params = {"path": path}
@@ -390,27 +900,156 @@ def build_dispatch_functions(mcp: MCPClient, cfg: dict) -> Dict[str, Any]:
             else:
                 params["max_lines"] = 0
         
-        res = mcp.call_tool("read_file_range", params)
-        return json.dumps(res, ensure_ascii=False)
+        return _call("read_file_range", params)
+
+    def dispatch_read_file_ranges(ranges: List[Dict[str, Any]], max_lines: Optional[int] = None) -> str:
+        params: Dict[str, Any] = {"ranges": ranges or []}
+        if max_lines is not None:
+            params["max_lines"] = int(max_lines)
+        return _call("read_file_ranges", params)
 
-    def dispatch_elasticsearch_search(query: str, document_type: str = "all", max_results: int = 10, context_lines: int = 2) -> str:
-        res = mcp.call_tool("elasticsearch_search", {
+    def dispatch_elasticsearch_search(query: str, document_type: str = "all", max_results: int = 10, context_lines: int = 2, passages: bool = False) -> str:
+        return _call("elasticsearch_search", {
             "query": query,
             "document_type": document_type,
             "max_results": max_results,
             "context_lines": context_lines,
+            "passages": bool(passages),
         })
-        return json.dumps(res, ensure_ascii=False)
 
     return {
         "file_search": dispatch_file_search,
         "list_paths": dispatch_list_paths,
         "search_rg": dispatch_search_rg,
         "read_file_range": dispatch_read_file_range,
+        "read_file_ranges": dispatch_read_file_ranges,
         "elasticsearch_search": dispatch_elasticsearch_search,
     }
 
 
+# Stream chat completions token by token (set llm_stream: false in
+# configs/config.yaml or LLM_STREAM=0 for providers without streaming)
+LLM_STREAM = os.environ.get("LLM_STREAM", "1").lower() not in ("0", "false", "no")
+
+
+def iter_chat_completion(client: OpenAI, stream: bool = True, **create_kwargs) -> Iterator[Tuple[str, Any]]:
+    """Call chat.completions.create and yield events while the answer arrives.
+
+    Yields ("content", text) and ("reasoning", text) deltas as they stream in,
+    then exactly one ("response", resp). resp looks like a non-streaming
+    completion (resp.choices[0].message with content, reasoning_content,
+    tool_calls, function_call; resp.usage), with tool_call fragments
+    assembled by index. With stream=False the request is made without
+    streaming and only the final event is yielded.
+    """
+    if not stream:
+        yield "response", client.chat.completions.create(**create_kwargs)
+        return
+    try:
+        chunks = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **create_kwargs)
+    except Exception as e:
+        # Some OpenAI-compatible servers reject stream_options
+        if "stream_options" not in str(e):
+            raise
+        chunks = client.chat.completions.create(stream=True, **create_kwargs)
+
+    content: List[str] = []
+    reasoning: List[str] = []
+    calls: Dict[int, Dict[str, Any]] = {}
+    fc: Dict[str, str] = {}
+    usage = None
+    finish_reason = None
+    for chunk in chunks:
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+        if not getattr(chunk, "choices", None):
+            continue
+        choice = chunk.choices[0]
+        finish_reason = getattr(choice, "finish_reason", None) or finish_reason
+        delta = getattr(choice, "delta", None)
+        if delta is None:
+            continue
+        text = getattr(delta, "content", None)
+        if text:
+            content.append(text)
+            yield "content", text
+        thought = getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None)
+        if thought:
+            reasoning.append(thought)
+            yield "reasoning", thought
+        for position, tc in enumerate(getattr(delta, "tool_calls", None) or []):
+            # Servers that send whole calls in one chunk may omit the index
+            index = tc.index if getattr(tc, "index", None) is not None else len(calls) + position
+            slot = calls.setdefault(index, {"id": None, "name": "", "arguments": ""})
+            if getattr(tc, "id", None):
+                slot["id"] = tc.id
+            fn = getattr(tc, "function", None)
+            if fn is not None:
+                if getattr(fn, "name", None):
+                    slot["name"] += fn.name
+                if getattr(fn, "arguments", None):
+                    slot["arguments"] += fn.arguments
+        legacy = getattr(delta, "function_call", None)
+        if legacy is not None:
+            fc["name"] = fc.get("name", "") + (getattr(legacy, "name", None) or "")
+            fc["arguments"] = fc.get("arguments", "") + (getattr(legacy, "arguments", None) or "")
+
+    tool_calls = [
+        SimpleNamespace(
+            id=slot["id"] or f"call_{index}",
+            type="function",
+            function=SimpleNamespace(name=slot["name"], arguments=slot["arguments"] or "{}"),
+        )
+        for index, slot in sorted(calls.items())
+    ]
+    message = SimpleNamespace(
+        role="assistant",
+        content="".join(content) or None,
+        reasoning_content="".join(reasoning) or None,
+        tool_calls=tool_calls or None,
+        function_call=SimpleNamespace(name=fc.get("name", ""), arguments=fc.get("arguments") or "{}") if fc else None,
+    )
+    yield "response", SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+        usage=usage,
+    )
+
+
+def iter_tool_results(
+    tool_calls: List[Any],
+    dispatch: Dict[str, Any],
+    max_concurrency: int = DEFAULT_TOOL_CONCURRENCY,
+) -> Iterator[Tuple[int, str, Optional[Exception]]]:
+    """Run one step's tool calls concurrently and yield (index, result_text, error) as each finishes.
+
+    Results arrive in completion order; callers use the index to append the
+    tool messages in the order of tool_calls. error is the exception a
+    dispatcher raised (result_text then holds it as {"error": ...}).
+    """
+    def run_one(tc: Any) -> Tuple[str, Optional[Exception]]:
+        name = tc.function.name
+        try:
+            args = json.loads(tc.function.arguments or "{}")
+        except Exception:
+            args = {}
+        fn = dispatch.get(name)
+        if not fn:
+            return json.dumps({"error": f"Unknown tool: {name}"}, ensure_ascii=False), None
+        try:
+            return fn(**args), None
+        except Exception as e:
+            return json.dumps({"error": str(e)}, ensure_ascii=False), e
+
+    if len(tool_calls) <= 1 or max_concurrency <= 1:
+        for i, tc in enumerate(tool_calls):
+            yield (i, *run_one(tc))
+        return
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(tool_calls)), thread_name_prefix="agent-tool") as pool:
+        futures = {pool.submit(run_one, tc): i for i, tc in enumerate(tool_calls)}
+        for fut in as_completed(futures):
+            yield (futures[fut], *fut.result())
+
+
 def run_agent(
     query: str,
     mcp: MCPClient,
@@ -421,8 +1060,11 @@ def run_agent(
     site_title: Optional[str],
     provider: str = "openrouter",
     tools_mode: str = "auto",
+    budget: Optional[StepBudget] = None,
 ) -> str:
-    tools = _build_tools_spec() if tools_mode != "off" else []
+    tools = TOOLS_SPEC if tools_mode != "off" else []
+    if budget is None:
+        budget = StepBudget.from_config(cfg, "cli")
     extra_headers: Dict[str, str] = {}
     if referer:
         extra_headers["HTTP-Referer"] = referer
@@ -430,21 +1072,29 @@ def run_agent(
         extra_headers["X-Title"] = site_title
 
     # Get dispatcher functions
-    DISPATCH = build_dispatch_functions(mcp, cfg)
+    compactor = ContextCompactor.from_config(cfg)
+    memo = ToolCallMemo(max_age=compactor.keep_steps if compactor is not None else None) if cfg.get("memoize_tool_calls", True) else None
+    DISPATCH = build_dispatch_functions(mcp, cfg, memo)
 
     messages: List[Dict[str, Any]] = [
-        {"role": "system", "content": SYSTEM_PROMPT},
+        system_message(provider, model, bool(cfg.get("prompt_cache", True))),
         {"role": "user", "content": f"Question: {query}"},
     ]
 
 
     steps = 0
-    max_steps = 100  # Further reduced to prevent hanging
+    # Set once the budget is used up: one last call without tools for the final answer
+    wrap_up = False
     while True:
         print ("STEP", steps)
-        if steps >= max_steps:
-
-            # Provide fallback answer based on LLM knowledge with clear disclaimer
+        if not wrap_up and budget.check() is not None:
+            print(f"[BUDGET] Stop before step {steps + 1} - {budget.reason_text()}")
+            if budget.seen:
+                messages.append(budget.wrap_up_message())
+                wrap_up = True
+        if not wrap_up and budget.stop_reason is not None:
+            print(f"[BUDGET] {json.dumps(budget.stats(), ensure_ascii=False)}")
+            # Nothing found to answer from: fallback answer based on LLM knowledge with clear disclaimer
             fallback_messages = [
                 {"role": "system", "content": "Du bist ein Experte für deutsches Recht. Beantworte die folgende Frage basierend auf deinem allgemeinen Rechtswissen. WICHTIG: Beginne deine Antwort mit einem deutlichen Hinweis, dass diese Antwort NICHT auf spezifischen Rechtsquellen oder aktuellen Gesetzen basiert, sondern auf allgemeinem Rechtswissen."},
                 {"role": "user", "content": f"Frage: {query}"}
@@ -463,9 +1113,9 @@ def run_agent(
                     tokens_received = fallback_resp.usage.completion_tokens
                     print(f"[TOKENS] Fallback - {tokens_sent} sent, {tokens_received} received")
                 fallback_answer = fallback_resp.choices[0].message.content or ""
-                return f"⚠️ **HINWEIS: Diese Antwort basiert NICHT auf spezifischen Rechtsquellen, sondern auf allgemeinem Rechtswissen, da die maximale Anzahl von Rechercheschritten erreicht wurde.**\n\n{fallback_answer}"
+                return f"⚠️ **HINWEIS: Diese Antwort basiert NICHT auf spezifischen Rechtsquellen, sondern auf allgemeinem Rechtswissen, da die Recherche ohne Quellen beendet wurde ({budget.reason_text()}).**\n\n{fallback_answer}"
             except Exception as e:
-                return f"Konnte keine zufriedenstellende Antwort finden. Die maximale Anzahl von Rechercheschritten wurde erreicht und auch die Fallback-Antwort konnte nicht generiert werden: {e}"
+                return f"Konnte keine zufriedenstellende Antwort finden. Die Recherche wurde ohne Quellen beendet ({budget.reason_text()}) und auch die Fallback-Antwort konnte nicht generiert werden: {e}"
 #        print("\nSTEP", steps)
         used_any_tool = any(m.get("role") == "tool" for m in messages)
         # Ollama's OpenAI-compatible API may not support non-standard values like "required".
@@ -475,34 +1125,54 @@ def run_agent(
 #            tool_choice_val = "auto" if used_any_tool else "required"
 
         steps += 1
+        budget.start_step()
+        if memo is not None:
+            memo.step = steps
+        if compactor is not None:
+            compacted = compactor.compact(messages, steps)
+            if compacted["tokens_removed"]:
+                print(f"[COMPACT] Step {steps} - {compacted['tokens_before']} -> {compacted['tokens_after']} tokens")
 #        print (messages)
         try:
             create_kwargs = dict(
                 model=model,
                 messages=messages,
                 tools=tools,
-                tool_choice="auto", #tool_choice_val,
+                tool_choice="none" if wrap_up else "auto", #tool_choice_val,
                 extra_headers=extra_headers or None,
                 timeout=120,  # Add 30 second timeout
             )
-            resp = client.chat.completions.create(**create_kwargs)
+            resp = None
+            streamed = False
+            for kind, value in iter_chat_completion(client, stream=bool(cfg.get("llm_stream", LLM_STREAM)), **create_kwargs):
+                if kind == "response":
+                    resp = value
+                else:
+                    # Show tokens as they arrive instead of after the whole completion
+                    sys.stdout.write(value)
+                    sys.stdout.flush()
+                    streamed = True
+            if streamed:
+                print()
             if resp.usage:
-                tokens_sent = resp.usage.prompt_tokens
-                tokens_received = resp.usage.completion_tokens
-                print(f"[TOKENS] Step {steps} - {tokens_sent} sent, {tokens_received} received")
+                print(f"[TOKENS] Step {steps} - {format_token_usage(resp.usage)}")
+                budget.record_usage(resp.usage)
 #            print ("RESP", resp)
         except Exception as e:
             return f"LLM create failed: {e}"
 
         # Guard against empty or malformed responses
         if not getattr(resp, "choices", None) or not resp.choices:
+            if wrap_up:
+                print(f"[BUDGET] {json.dumps(budget.stats(), ensure_ascii=False)}")
+                return f"Konnte keine zufriedenstellende Antwort finden: die Recherche wurde beendet ({budget.reason_text()})."
             # Retry next loop iteration
             time.sleep(0.2)
             continue
 
         msg = resp.choices[0].message
         out_text = getattr(msg, "content", None) or getattr(msg, "reasoning_content", None) or getattr(msg, "reasoning", None) or ""
-        if out_text:
+        if out_text and not streamed:
             print(out_text, "\n")
         tool_calls = getattr(msg, "tool_calls", None)
 #        print (tool_calls)
@@ -513,7 +1183,7 @@ def run_agent(
                 "type": "function",
                 "function": {"name": fc.name, "arguments": fc.arguments or "{}"},
             }]
-        if tool_calls:
+        if tool_calls and not wrap_up:
             # Build assistant message with properly stringified function.arguments
             assistant_msg: Dict[str, Any] = {
                 "role": "assistant",
@@ -533,29 +1203,33 @@ def run_agent(
                     "function": {"name": tc.function.name, "arguments": args_val},
                 })
             messages.append(assistant_msg)
-            for tc in tool_calls:
-                name = tc.function.name
-                try:
-                    args = json.loads(tc.function.arguments or "{}")
-                except Exception:
-                    args = {}
-                fn = DISPATCH.get(name)
-                if not fn:
-                    result_text = json.dumps({"error": f"Unknown tool: {name}"}, ensure_ascii=False)
-                else:
-                    try:
-                        result_text = fn(**args)
-                    except Exception as e:
-                        result_text = json.dumps({"error": str(e)}, ensure_ascii=False)
-                messages.append({
+            # Tool calls of this step run concurrently; messages keep the tool_calls order
+            results: List[str] = [""] * len(tool_calls)
+            for i, result_text, _ in iter_tool_results(tool_calls, DISPATCH, int(cfg.get("tool_concurrency", DEFAULT_TOOL_CONCURRENCY))):
+                results[i] = result_text
+            for tc, result_text in zip(tool_calls, results):
+                tool_msg = {
                     "role": "tool",
                     "tool_call_id": tc.id,
                     "content": result_text,
-                })
+                }
+                if compactor is not None:
+                    compactor.add_tool_message(tool_msg, steps)
+                messages.append(tool_msg)
+            new_documents = budget.record_results([tc.function.name for tc in tool_calls], results)
+            print(f"[BUDGET] Step {steps} - {new_documents} new documents, {budget.tokens} tokens, {budget.elapsed():.1f}s")
             continue
 
         # Otherwise we're done
-        return "<final>" + (msg.content or "") + "</final>"
+        if compactor is not None and compactor.tokens_saved:
+            print(f"[COMPACT] Session - {compactor.tokens_saved} prompt tokens saved")
+        if memo is not None and memo.hits:
+            print(f"[MEMO] Session - {memo.hits} repeated tool calls answered from memory")
+        print(f"[BUDGET] {json.dumps(budget.stats(), ensure_ascii=False)}")
+        answer = msg.content or ""
+        if wrap_up and not answer:
+            return f"Konnte keine zufriedenstellende Antwort finden: die Recherche wurde beendet ({budget.reason_text()})."
+        return "<final>" + answer + "</final>"
 
 
 def main():
@@ -571,6 +1245,7 @@ def main():
     parser.add_argument("--referer", default=os.environ.get("OPENROUTER_SITE_URL"), help="HTTP-Referer header (your site URL)")
     parser.add_argument("--site-title", default=os.environ.get("OPENROUTER_SITE_TITLE"), help="X-Title header (your site title)")
     parser.add_argument("--provider", choices=["openrouter", "nebius", "ollama"], default=os.environ.get("LLM_PROVIDER", "nebius"), help="LLM backend: nebius (default), openrouter, or ollama")
+    parser.add_argument("--transport", choices=["stdio", "inprocess"], default=os.environ.get("MCP_TRANSPORT", "stdio"), help="MCP tool transport: stdio subprocess (default) or inprocess (direct calls, no JSON hop)")
     
     args = parser.parse_args()
 
@@ -626,6 +1301,9 @@ def main():
     env = os.environ.copy()
     env["PYTHONPATH"] = env.get("PYTHONPATH") or str(Path.cwd())
     env.setdefault("LEGAL_DOC_ROOT", cfg.get("legal_doc_root", "./data/"))
+    if args.transport == "inprocess":
+        # The tools read their sandbox root from this process's environment
+        os.environ.setdefault("LEGAL_DOC_ROOT", env["LEGAL_DOC_ROOT"])
 
     # Initialize session logger
     session_logger: Optional[SessionLogger] = None
@@ -635,7 +1313,7 @@ def main():
     except Exception as e:
         print(f"[log] Could not initialize session log: {e}")
 
-    mcp = MCPClient(server_cmd=server_cmd, env=env, logger=session_logger)
+    mcp = make_mcp_client(server_cmd=server_cmd, env=env, logger=session_logger, transport=args.transport, tool_timeouts=cfg.get("tool_timeouts"))
     try:
         client = OpenAI(base_url=resolved_base_url, api_key=resolved_api_key)
         if session_logger is not None:
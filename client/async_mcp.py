@@ -0,0 +1,239 @@
+"""Asyncio MCP client: per-tool deadlines, server-side cancellation, auto restart."""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from client.agent_cli import DEFAULT_TOOL_TIMEOUTS, MCPTimeoutError
+from client.session_log import SessionLogger
+
+# asyncio's default StreamReader limit (64 KiB) is far below the size of a
+# large elasticsearch_search or read_file_range response line
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+class MCPServerError(RuntimeError):
+    pass
+
+
+class AsyncMCPClient:
+    """
+    Talks line-delimited JSON-RPC to mcp_server/server.py over asyncio
+    subprocess streams.
+
+    - Any number of calls may be in flight; responses are matched by id.
+    - Every call_tool has a deadline (tool_timeouts, or the timeout argument).
+      On expiry, or if the awaiting task is cancelled, a "cancel" request is
+      sent so the server kills the call's ripgrep children.
+    - If the server dies, pending calls fail with its exit code and last
+      stderr lines, and the next call restarts it (up to max_restarts).
+      Tools are read-only, so a call that failed because of a crash is
+      retried once on the fresh server.
+
+    Usage:
+        async with AsyncMCPClient(env=env) as mcp:
+            result = await mcp.call_tool("elasticsearch_search", {"query": "Mietminderung"})
+    """
+
+    def __init__(
+        self,
+        server_cmd: Optional[List[str]] = None,
+        cwd: Optional[Path] = None,
+        env: Optional[dict] = None,
+        logger: Optional[SessionLogger] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        max_restarts: int = 3,
+    ):
+        self.server_cmd = server_cmd or [sys.executable, "-u", "mcp_server/server.py"]
+        self.cwd = cwd or Path.cwd()
+        self.env = env
+        self.logger = logger
+        self.tool_timeouts = {**DEFAULT_TOOL_TIMEOUTS, **(tool_timeouts or {})}
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self._id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._stderr_reader: Optional[asyncio.Task] = None
+        self._stderr_tail: deque = deque(maxlen=20)
+        self._start_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._closing = False
+
+    async def __aenter__(self) -> "AsyncMCPClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self) -> None:
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.server_cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(self.cwd),
+            env=self.env,
+            limit=STREAM_LIMIT,
+        )
+        self._stderr_tail.clear()
+        self._reader = asyncio.create_task(self._read_responses(self.proc))
+        self._stderr_reader = asyncio.create_task(self._drain_stderr(self.proc))
+
+    async def _ensure_started(self) -> None:
+        async with self._start_lock:
+            if self.alive:
+                return
+            if self.proc is not None:
+                if self.restarts >= self.max_restarts:
+                    raise MCPServerError(f"MCP server crashed {self.restarts} times, giving up")
+                self.restarts += 1
+            await self.start()
+
+    async def _read_responses(self, proc: asyncio.subprocess.Process) -> None:
+        assert proc.stdout
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            try:
+                resp = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            fut = self._pending.pop(resp.get("id"), None)
+            if fut is not None and not fut.done():
+                fut.set_result(resp)
+        code = await proc.wait()
+        if self._closing:
+            message = "MCP client closed"
+        else:
+            message = f"MCP server exited (code {code})"
+            tail = [l for l in list(self._stderr_tail)[-3:] if l]
+            if tail:
+                message += ": " + " | ".join(tail)
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for fut in pending:
+            if not fut.done():
+                fut.set_exception(MCPServerError(message))
+
+    async def _drain_stderr(self, proc: asyncio.subprocess.Process) -> None:
+        assert proc.stderr
+        while True:
+            line = await proc.stderr.readline()
+            if not line:
+                break
+            self._stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+
+    async def _send(self, method: str, params: Dict[str, Any]) -> tuple[int, asyncio.Future]:
+        await self._ensure_started()
+        assert self.proc and self.proc.stdin
+        self._id += 1
+        req_id = self._id
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        data = (json.dumps({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params}, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            async with self._write_lock:
+                self.proc.stdin.write(data)
+                await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            self._pending.pop(req_id, None)
+            raise MCPServerError(f"MCP server not reachable: {e}")
+        return req_id, fut
+
+    async def _cancel_remote(self, req_id: int) -> None:
+        self._pending.pop(req_id, None)
+        if not self.alive:
+            return
+        try:
+            await self._send("cancel", {"id": req_id})
+        except Exception:
+            pass
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        try:
+            _, fut = await self._send("ping", {})
+            resp = await asyncio.wait_for(fut, timeout)
+        except Exception:
+            return False
+        return bool((resp.get("result") or {}).get("ok"))
+
+    async def call_tool(self, tool: str, args: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        try:
+            return await self._call_tool_once(tool, args, timeout)
+        except MCPServerError:
+            if self._closing or self.restarts >= self.max_restarts:
+                raise
+            # Server crashed underneath the call: retry once on a fresh server
+            return await self._call_tool_once(tool, args, timeout)
+
+    async def _call_tool_once(self, tool: str, args: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        deadline = timeout if timeout is not None else self.tool_timeouts.get(tool)
+        req_id, fut = await self._send("call_tool", {"tool": tool, "args": args})
+        try:
+            resp = await asyncio.wait_for(asyncio.shield(fut), deadline)
+        except asyncio.TimeoutError:
+            await self._cancel_remote(req_id)
+            raise MCPTimeoutError(f"{tool} timed out after {deadline:g}s")
+        except asyncio.CancelledError:
+            # Caller gave up (e.g. client disconnected): stop the work server-side too
+            await asyncio.shield(self._cancel_remote(req_id))
+            raise
+        if "error" in resp:
+            raise RuntimeError(resp["error"].get("message", "Unknown error"))
+        result = resp.get("result", {})
+        if self.logger is not None:
+            try:
+                self.logger.log_tool(tool, args, result or {})
+            except Exception:
+                pass
+        return result
+
+    async def call_tools(self, calls: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """One call_tools request; per call {"result": ...} or {"error": {...}}, in order"""
+        deadlines = [self.tool_timeouts.get(c.get("tool")) for c in calls if isinstance(c, dict)]
+        deadline = timeout if timeout is not None else max((d for d in deadlines if d), default=None)
+        req_id, fut = await self._send("call_tools", {"calls": calls})
+        try:
+            resp = await asyncio.wait_for(asyncio.shield(fut), deadline)
+        except asyncio.TimeoutError:
+            await self._cancel_remote(req_id)
+            raise MCPTimeoutError(f"call_tools timed out after {deadline:g}s")
+        except asyncio.CancelledError:
+            await asyncio.shield(self._cancel_remote(req_id))
+            raise
+        if "error" in resp:
+            raise RuntimeError(resp["error"].get("message", "Unknown error"))
+        return (resp.get("result") or {}).get("results", [])
+
+    async def close(self, timeout: float = 5.0) -> None:
+        self._closing = True
+        proc = self.proc
+        if proc is None:
+            return
+        try:
+            if proc.stdin and not proc.stdin.is_closing():
+                proc.stdin.close()
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+        except ProcessLookupError:
+            pass
+        for task in (self._reader, self._stderr_reader):
+            if task is not None:
+                try:
+                    await asyncio.wait_for(task, timeout)
+                except Exception:
+                    pass
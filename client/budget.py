@@ -0,0 +1,182 @@
+"""Per-request step, token and time budget for the agent loop.
+
+run_agent and stream_agent_response ask StepBudget before every LLM call
+whether to go on. Research stops when
+
+- max_steps LLM calls have been made,
+- the next call would push the request past max_tokens (prompt plus
+  completion tokens; the next prompt is at least as long as the last one),
+- the next step would end after max_seconds (judged by the average step
+  duration so far), or
+- stale_steps consecutive steps with tool calls brought no new documents:
+  search hits not returned before (a file holds many decisions or
+  paragraphs, so hits are told apart as in client.render.hit_key), or text
+  ranges not read before.
+
+The agent then gets one last call without tools and answers from the sources
+it has collected, instead of searching on or falling back to an answer
+without sources. Limits are set per endpoint in configs/config.yaml
+(step_budget); 0 disables a limit. stats() is the telemetry written to the
+interaction log: what was used, new documents per step and which limit
+stopped the request.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from client.render import block_key, hit_key, split_blocks
+
+# step_budget in configs/config.yaml overrides single values, first for all
+# endpoints ("default"), then per endpoint (cli, stream, ask, test, batch)
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    "default": {"max_steps": 30, "max_tokens": 300000, "max_seconds": 600, "stale_steps": 3},
+    "stream": {"max_seconds": 300},
+}
+
+STOP_REASONS = {
+    "max_steps": "maximale Anzahl Rechercheschritte erreicht",
+    "max_tokens": "Token-Budget erschöpft",
+    "max_seconds": "Zeitbudget erschöpft",
+    "no_new_documents": "die letzten Suchen haben keine neuen Dokumente mehr gefunden",
+}
+
+WRAP_UP_PROMPT = (
+    "Die Recherche wird hier beendet ({reason}). Rufe keine Werkzeuge mehr auf. "
+    "Beantworte die Frage jetzt abschließend auf Grundlage der bisher gefundenen Quellen "
+    "und nenne sie. Weise darauf hin, welche Aspekte offen geblieben sind."
+)
+
+
+def result_documents(tool: str, content: str) -> Set[str]:
+    """Documents (hit_key for search hits, path and line range for reads) in one tool result, JSON or client.render text"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+    if isinstance(data, dict):
+        docs = {hit_key(m) for m in data.get("matches") or [] if isinstance(m, dict) and (m.get("file_path") or m.get("file"))}
+        docs.update(f"{s.get('path')} {s.get('line_range')}" for s in data.get("snippets") or [] if isinstance(s, dict))
+        docs.update(str(f) for f in data.get("files") or [])
+        if data.get("path") and "text" in data:
+            docs.add(f"{data['path']} {data.get('line_range') or [data.get('start'), data.get('end')]}")
+        docs.discard("")
+        return docs
+    if tool in ("file_search", "list_paths"):
+        return {line for line in (content or "").split("\n")[1:] if line.strip()}
+    docs = set()
+    for block in split_blocks(content or "")[1]:
+        docs.add(block[0] if tool.startswith("read_file") else block_key(block))
+    docs.discard("")
+    return docs
+
+
+class StepBudget:
+    """Stateful per request: counts steps, tokens, time and new documents, and decides when to stop"""
+
+    def __init__(
+        self,
+        endpoint: str = "cli",
+        max_steps: int = 30,
+        max_tokens: int = 0,
+        max_seconds: float = 0,
+        stale_steps: int = 0,
+    ):
+        self.endpoint = endpoint
+        self.max_steps = max_steps
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.stale_steps = stale_steps
+        self.started = time.monotonic()
+        self.steps = 0
+        self.tokens = 0
+        self.last_prompt_tokens = 0
+        self.new_documents: List[int] = []
+        self.stale = 0
+        self.stop_reason: Optional[str] = None
+        self.stop_step: Optional[int] = None
+        self.seen: Set[str] = set()
+
+    @classmethod
+    def from_config(cls, cfg: dict, endpoint: str) -> "StepBudget":
+        limits = dict(DEFAULT_LIMITS["default"])
+        limits.update(DEFAULT_LIMITS.get(endpoint, {}))
+        configured = cfg.get("step_budget") or {}
+        limits.update(configured.get("default") or {})
+        limits.update(configured.get(endpoint) or {})
+        return cls(
+            endpoint=endpoint,
+            max_steps=int(limits.get("max_steps") or 0),
+            max_tokens=int(limits.get("max_tokens") or 0),
+            max_seconds=float(limits.get("max_seconds") or 0),
+            stale_steps=int(limits.get("stale_steps") or 0),
+        )
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def start_step(self) -> None:
+        self.steps += 1
+
+    def record_usage(self, usage: Any) -> None:
+        if not usage:
+            return
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        self.last_prompt_tokens = prompt
+        self.tokens += prompt + (getattr(usage, "completion_tokens", 0) or 0)
+
+    def record_results(self, tools: List[str], contents: List[str]) -> int:
+        """Register the tool results of the current step; returns how many documents were new"""
+        new = 0
+        for tool, content in zip(tools, contents):
+            for doc in result_documents(tool, content):
+                if doc not in self.seen:
+                    self.seen.add(doc)
+                    new += 1
+        self.new_documents.append(new)
+        self.stale = 0 if new else self.stale + 1
+        return new
+
+    def check(self) -> Optional[str]:
+        """Reason to stop before the next LLM call, or None; the first reason found is kept"""
+        if self.stop_reason is not None:
+            return self.stop_reason
+        reason = None
+        if self.max_steps and self.steps >= self.max_steps:
+            reason = "max_steps"
+        elif self.max_tokens and self.tokens + self.last_prompt_tokens > self.max_tokens:
+            reason = "max_tokens"
+        elif self.max_seconds and self.steps and self.elapsed() * (self.steps + 1) / self.steps > self.max_seconds:
+            reason = "max_seconds"
+        elif self.stale_steps and self.stale >= self.stale_steps:
+            reason = "no_new_documents"
+        if reason is not None:
+            self.stop_reason = reason
+            self.stop_step = self.steps
+        return reason
+
+    def reason_text(self) -> str:
+        return STOP_REASONS.get(self.stop_reason or "", self.stop_reason or "")
+
+    def wrap_up_message(self) -> Dict[str, str]:
+        """User message asking for the final answer from the sources collected so far"""
+        return {"role": "user", "content": WRAP_UP_PROMPT.format(reason=self.reason_text())}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "steps": self.steps,
+            "tokens": self.tokens,
+            "elapsed_ms": int(self.elapsed() * 1000),
+            "documents": len(self.seen),
+            "new_documents_per_step": list(self.new_documents),
+            "stop_reason": self.stop_reason,
+            "stop_step": self.stop_step,
+            "limits": {
+                "max_steps": self.max_steps,
+                "max_tokens": self.max_tokens,
+                "max_seconds": self.max_seconds,
+                "stale_steps": self.stale_steps,
+            },
+        }
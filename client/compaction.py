@@ -0,0 +1,271 @@
+"""Keeps the agent's message history within a prompt-token budget.
+
+Every tool result is re-sent to the LLM on each later step, so the prompt
+grows with every search. ContextCompactor works on the run_agent /
+stream_agent_response `messages` list in place and understands both the
+compact text of client.render and raw JSON results:
+
+- new elasticsearch_search results: hits already returned by an earlier
+  search (same file and case number or title, see client.render.hit_key)
+  are reduced to a reference to that step
+- tool results from before the last keep_steps steps are replaced by a
+  short summary (titles, paths and line numbers for searches; path, line
+  range and the start of the text for reads)
+- if the estimated prompt is still above budget_tokens, recent results are
+  summarized as well (oldest first), then cut hard
+
+A result is summarized at most once and cut at most once, so the prompt
+prefix stays byte-stable between steps except when the budget forces a
+change. A summary can still be cut hard later if the prompt is over budget
+even with everything summarized. Token counts use tiktoken when it is
+installed and a characters/4 estimate otherwise.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from client.render import SEEN_MARK, block_key, hit_key, split_blocks
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional dependency (or encoding download unavailable)
+    _ENCODING = None
+
+# Per-message framing overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_PREVIEW_CHARS = 300
+HARD_CUT_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        # Content parts (e.g. a system prompt with a cache breakpoint)
+        content = "".join(part.get("text") or "" for part in content if isinstance(part, dict))
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+    for tc in message.get("tool_calls") or []:
+        fn = tc.get("function") or {}
+        tokens += estimate_tokens(fn.get("name") or "") + estimate_tokens(fn.get("arguments") or "")
+    return tokens
+
+
+def messages_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+
+def _loads(content: str) -> Any:
+    try:
+        return json.loads(content)
+    except (TypeError, ValueError):
+        return None
+
+
+def summarize_tool_result(content: str, step: int) -> str:
+    """Short stand-in for an old tool result (German, like the rest of the prompt)"""
+    data = _loads(content)
+    head = f"[Gekürzt: Ergebnis aus Schritt {step}"
+    if isinstance(data, dict) and isinstance(data.get("matches"), list):
+        lines = [f"{head}, {data.get('total_hits', len(data['matches']))} Treffer]"]
+        for match in data["matches"]:
+            if match.get("seen_in_step"):
+                continue
+            path = match.get("file_path") or match.get("file") or ""
+            title = (match.get("title") or "")[:80]
+            line_numbers = [lm.get("line_number") for lm in match.get("line_matches") or [] if lm.get("line_number")]
+            if match.get("line"):
+                line_numbers.append(match["line"])
+            where = f" Zeilen {','.join(str(n) for n in line_numbers[:5])}" if line_numbers else ""
+            lines.append(f"- {title} | {path}{where}".rstrip())
+        return "\n".join(lines)
+    if isinstance(data, dict) and isinstance(data.get("snippets"), list):
+        lines = [f"{head}, {len(data['snippets'])} Textstellen]"]
+        for snip in data["snippets"]:
+            text = " ".join((snip.get("text") or "").split())
+            lines.append(f"- {snip.get('path')} Zeilen {snip.get('line_range')}: {text[:SUMMARY_PREVIEW_CHARS // 2]}")
+        return "\n".join(lines)
+    if isinstance(data, dict) and "text" in data:
+        where = data.get("line_range") or [data.get("start"), data.get("end")]
+        text = " ".join((data.get("text") or "").split())
+        cut = "…" if len(text) > SUMMARY_PREVIEW_CHARS else ""
+        return f"{head}] {data.get('path')} {where}: {text[:SUMMARY_PREVIEW_CHARS]}{cut}"
+    if isinstance(data, dict) and isinstance(data.get("files"), list):
+        files = data["files"]
+        more = f" (+{len(files) - 10})" if len(files) > 10 else ""
+        return f"{head}, {len(files)} Dateien] " + ", ".join(files[:10]) + more
+    if data is None:
+        summary = _summarize_blocks(content, head)
+        if summary is not None:
+            return summary
+    return f"{head}] " + _cut(content, SUMMARY_PREVIEW_CHARS)
+
+
+def _summarize_blocks(content: str, head: str) -> Optional[str]:
+    """Summary of a client.render result: header line of every block plus its first hit line or text"""
+    head_lines, blocks = split_blocks(content)
+    if not blocks:
+        return None
+    lines = [f"{head}] {' '.join(head_lines)}".rstrip()]
+    for block in blocks:
+        if SEEN_MARK in block[0]:
+            continue
+        body = [line for line in block[1:] if line.strip()]
+        hit = next((line for line in body if re.match(r"\d+>", line)), None)
+        if hit is not None:
+            lines.append(f"{block[0]}\n{_cut(hit, SUMMARY_PREVIEW_CHARS // 2)}")
+        elif body and not re.match(r"\d+:|Abschnitte: |Vorschau: ", body[0]):
+            text = " ".join(" ".join(body).split())
+            lines.append(f"{block[0]}\n{_cut(text, SUMMARY_PREVIEW_CHARS // 2)}")
+        else:
+            lines.append(block[0])
+    return "\n".join(lines)
+
+
+def _cut(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"…[gekürzt, {len(text) - limit} Zeichen]"
+
+
+class ContextCompactor:
+    """Stateful per session: remembers which files were already shown and what was saved"""
+
+    def __init__(self, budget_tokens: int = 32000, keep_steps: int = 2, dedupe: bool = True):
+        self.budget_tokens = budget_tokens
+        self.keep_steps = keep_steps
+        self.dedupe = dedupe
+        self.tokens_saved = 0
+        self.compactions = 0
+        # Tokens the current history is shorter than the uncompacted one
+        self._removed = 0
+        # hit_key / block_key of every search hit shown -> step it was first shown in
+        self._seen_hits: Dict[str, int] = {}
+        # id(tool message) -> step the result arrived in; ids of summarized and
+        # of hard cut messages (tool_call_ids are not unique across steps with
+        # every provider)
+        self._steps: Dict[int, int] = {}
+        self._summarized: set = set()
+        self._cut: set = set()
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> Optional["ContextCompactor"]:
+        """None when compaction is switched off (context_budget_tokens: 0)"""
+        budget = int(cfg.get("context_budget_tokens", 32000) or 0)
+        if budget <= 0:
+            return None
+        return cls(budget_tokens=budget, keep_steps=int(cfg.get("compact_keep_steps", 2)))
+
+    def add_tool_message(self, message: Dict[str, Any], step: int) -> None:
+        """Register a fresh tool message; search hits already shown earlier are reduced to a reference"""
+        self._steps[id(message)] = step
+        message["content"] = self._dedupe(message.get("content") or "", step)
+
+    def _dedupe(self, content: str, step: int) -> str:
+        if not self.dedupe:
+            return content
+        data = _loads(content)
+        if data is None and content.startswith("elasticsearch_search:"):
+            return self._dedupe_blocks(content, step)
+        if not isinstance(data, dict) or not isinstance(data.get("matches"), list):
+            return content
+        changed = False
+        matches = []
+        for match in data["matches"]:
+            if not isinstance(match, dict) or not match.get("file_path"):
+                matches.append(match)
+                continue
+            first = self._seen_hits.setdefault(hit_key(match), step)
+            if first < step:
+                seen = {"title": match.get("title"), "file_path": match["file_path"], "seen_in_step": first}
+                if (match.get("metadata") or {}).get("case_number"):
+                    seen["metadata"] = {"case_number": match["metadata"]["case_number"]}
+                matches.append(seen)
+                changed = True
+            else:
+                matches.append(match)
+        if not changed:
+            return content
+        data["matches"] = matches
+        compacted = json.dumps(data, ensure_ascii=False)
+        self._removed += max(0, estimate_tokens(content) - estimate_tokens(compacted))
+        return compacted
+
+    def _dedupe_blocks(self, content: str, step: int) -> str:
+        head, blocks = split_blocks(content)
+        changed = False
+        lines = list(head)
+        for block in blocks:
+            first = self._seen_hits.setdefault(block_key(block), step)
+            if first < step:
+                # The header (path, title, case number) stays, the lines are dropped
+                lines.append(f"{block[0]} | {SEEN_MARK} {first}")
+                changed = True
+            else:
+                lines.extend(block)
+        if not changed:
+            return content
+        compacted = "\n".join(lines)
+        self._removed += max(0, estimate_tokens(content) - estimate_tokens(compacted))
+        return compacted
+
+    def compact(self, messages: List[Dict[str, Any]], step: int) -> Dict[str, int]:
+        """Shorten old tool results in place before the LLM call of `step`.
+
+        Returns token counts for this pass; tokens_saved in stats() adds up,
+        over all calls of the session, how much smaller each prompt was than
+        it would have been without compaction.
+        """
+        before = messages_tokens(messages)
+        tool_messages = [m for m in messages if m.get("role") == "tool" and id(m) not in self._summarized]
+        # 1) everything from before the last keep_steps steps
+        for message in tool_messages:
+            arrived = self._steps.get(id(message), 0)
+            if step - arrived > self.keep_steps:
+                self._summarize(message, arrived)
+        # 2) over budget: summarize newer results too, oldest first, the latest step last
+        total = messages_tokens(messages)
+        for message in tool_messages:
+            if total <= self.budget_tokens:
+                break
+            if id(message) in self._summarized:
+                continue
+            old = message_tokens(message)
+            self._summarize(message, self._steps.get(id(message), 0))
+            total -= old - message_tokens(message)
+        # 3) still over budget: hard cut the longest tool messages not cut before
+        if total > self.budget_tokens:
+            uncut = (m for m in messages if m.get("role") == "tool" and id(m) not in self._cut)
+            for message in sorted(uncut, key=lambda m: -len(m.get("content") or "")):
+                if total <= self.budget_tokens or len(message.get("content") or "") <= HARD_CUT_CHARS:
+                    break
+                old = message_tokens(message)
+                message["content"] = _cut(message["content"], HARD_CUT_CHARS)
+                self._cut.add(id(message))
+                total -= old - message_tokens(message)
+        after = messages_tokens(messages)
+        if after < before:
+            self.compactions += 1
+        self._removed += before - after
+        # This prompt is smaller by everything removed so far
+        self.tokens_saved += self._removed
+        return {"tokens_before": before, "tokens_after": after, "tokens_removed": before - after}
+
+    def _summarize(self, message: Dict[str, Any], arrived: int) -> None:
+        summary = summarize_tool_result(message.get("content") or "", arrived)
+        if len(summary) < len(message.get("content") or ""):
+            message["content"] = summary
+        self._summarized.add(id(message))
+
+    def stats(self) -> Dict[str, int]:
+        return {"tokens_saved": self.tokens_saved, "compactions": self.compactions}
@@ -0,0 +1,278 @@
+"""Renders MCP tool results as compact text for the LLM.
+
+The raw tool results are JSON objects made for programs: every context line
+of a search hit is an object with line_number/is_match, windows of the same
+hit overlap, and search_info repeats the arguments the model just sent.
+render_tool_result turns them into dense text blocks, one per hit or
+snippet:
+
+    elasticsearch_search: 10 von 1234 Treffern
+    === gesetze/bgb/bgb.md | gesetz | BGB § 573c Fristen der ordentlichen Kündigung
+    Abschnitte: § 573c (Z. 4410-4431)
+    4412> (1) Die Kündigung ist spätestens am dritten Werktag ...
+    4413: Die Kündigungsfrist für den Vermieter verlängert sich ...
+
+"N>" marks a matching line, "N:" a context line, blank lines are dropped
+and overlapping windows are merged. Which parts of a hit are shown is set
+per tool with tool_result_fields in configs/config.yaml;
+tool_result_format: json restores the raw JSON.
+
+Benchmark on recorded sessions (JSON lines of logs/session_*.log):
+
+    python -m client.render logs/session_*.log
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Markdown headings in file text start with "#", so blocks use a different marker
+BLOCK_PREFIX = "=== "
+# Reference left by ContextCompactor for a hit already shown in an earlier step
+SEEN_MARK = "bereits in Schritt"
+PREVIEW_CHARS = 200
+LINE_CHARS = 200
+
+# Parts of a hit rendered by default; file_path (search_rg: file:line) is always shown.
+# elasticsearch_search: document_type, title, score, metadata, passages, lines,
+#   preview (content_preview, only for hits without line matches)
+# search_rg: section, context, byte_range
+DEFAULT_FIELDS: Dict[str, List[str]] = {
+    "elasticsearch_search": ["document_type", "title", "metadata", "passages", "lines", "preview"],
+    "search_rg": ["section", "context"],
+}
+
+_TAG_RE = re.compile(r"</?em>")
+
+
+def render_tool_result(tool: str, result: Any, fmt: str = "compact", fields: Optional[Dict[str, List[str]]] = None) -> str:
+    """Text handed to the LLM as the tool message for `result`"""
+    if fmt == "json" or not isinstance(result, dict):
+        return json.dumps(result, ensure_ascii=False)
+    selected = (fields or {}).get(tool) or DEFAULT_FIELDS.get(tool, [])
+    if result.get("error") and not result.get("matches") and not result.get("snippets"):
+        return _render_error(result)
+    if tool == "elasticsearch_search":
+        return _render_es(result, selected)
+    if tool == "search_rg":
+        return _render_rg(result, selected)
+    if tool == "read_file_range":
+        return _render_snippet(result)
+    if tool == "read_file_ranges":
+        return _render_ranges(result)
+    if tool in ("file_search", "list_paths"):
+        files = result.get("files") or []
+        return "\n".join([f"{len(files)} Dateien"] + list(files))
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
+def _render_error(result: Dict[str, Any]) -> str:
+    lines = [f"Fehler: {result['error']}"]
+    if result.get("suggestion"):
+        lines.append(f"Hinweis: {result['suggestion']}")
+    return "\n".join(lines)
+
+
+def _one_line(text: Any, limit: int) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _numbered(rows: Dict[int, Tuple[str, bool]]) -> List[str]:
+    out = []
+    for number in sorted(rows):
+        text, is_match = rows[number]
+        if text.strip():
+            out.append(f"{number}{'>' if is_match else ':'} {_one_line(text, LINE_CHARS)}")
+    return out
+
+
+def _render_es(result: Dict[str, Any], fields: List[str]) -> str:
+    matches = result.get("matches") or []
+    lines = [f"elasticsearch_search: {len(matches)} von {result.get('total_hits', len(matches))} Treffern"]
+    if result.get("error"):
+        lines.append(f"Fehler: {result['error']}")
+    for match in matches:
+        head = [match.get("file_path") or ""]
+        if "document_type" in fields and match.get("document_type"):
+            head.append(str(match["document_type"]))
+        if "title" in fields and match.get("title"):
+            head.append(_one_line(match["title"], LINE_CHARS))
+        metadata = match.get("metadata") or {}
+        if "metadata" in fields:
+            head.extend(str(metadata[key]) for key in ("jurabk", "court", "date", "case_number") if metadata.get(key))
+        if "score" in fields and match.get("score") is not None:
+            head.append(f"score {match['score']:.2f}")
+        lines.append(BLOCK_PREFIX + " | ".join(head))
+        if "passages" in fields and metadata.get("passages"):
+            parts = []
+            for passage in metadata["passages"]:
+                label = _one_line(passage.get("heading") or "", 80)
+                if passage.get("randnummer"):
+                    label += f" (Rn. {passage['randnummer']})"
+                parts.append(f"{label} (Z. {passage.get('start_line')}-{passage.get('end_line')})".strip())
+            lines.append("Abschnitte: " + "; ".join(parts))
+        rows: Dict[int, Tuple[str, bool]] = {}
+        if "lines" in fields:
+            for line_match in match.get("line_matches") or []:
+                for ctx in line_match.get("context") or []:
+                    number = ctx.get("line_number")
+                    if number is None:
+                        continue
+                    _, was_match = rows.get(number, ("", False))
+                    rows[number] = (ctx.get("text") or "", was_match or bool(ctx.get("is_match")))
+            lines.extend(_numbered(rows))
+        if "preview" in fields and not rows and match.get("content_preview"):
+            lines.append("Vorschau: " + _one_line(_TAG_RE.sub("", match["content_preview"]), PREVIEW_CHARS))
+    return "\n".join(lines)
+
+
+def _render_rg(result: Dict[str, Any], fields: List[str]) -> str:
+    matches = result.get("matches") or []
+    lines = [f"search_rg: {len(matches)} Treffer"]
+    for match in matches:
+        head = [f"{match.get('file')}:{match.get('line')}"]
+        if "section" in fields and match.get("section"):
+            head.append(_one_line(match["section"], 120))
+        if "byte_range" in fields and match.get("byte_range"):
+            head.append("Bytes {}-{}".format(*match["byte_range"]))
+        lines.append(BLOCK_PREFIX + " | ".join(head))
+        rows: Dict[int, Tuple[str, bool]] = {}
+        if "context" in fields:
+            for ctx in match.get("context") or []:
+                if ctx.get("line") is not None:
+                    rows[ctx["line"]] = (ctx.get("text") or "", False)
+        if match.get("line") is not None:
+            rows[match["line"]] = (match.get("text") or "", True)
+        lines.extend(_numbered(rows))
+    return "\n".join(lines)
+
+
+def _snippet_header(snippet: Dict[str, Any]) -> str:
+    line_range = snippet.get("line_range")
+    if line_range:
+        return f"{BLOCK_PREFIX}{snippet.get('path')} Zeilen {line_range[0]}-{line_range[1]}"
+    return f"{BLOCK_PREFIX}{snippet.get('path')} Bytes {snippet.get('start')}-{snippet.get('end')}"
+
+
+def _render_snippet(result: Dict[str, Any]) -> str:
+    return _snippet_header(result) + "\n" + (result.get("text") or "").strip("\n")
+
+
+def _render_ranges(result: Dict[str, Any]) -> str:
+    parts = [_render_snippet(snippet) for snippet in result.get("snippets") or []]
+    for err in result.get("errors") or []:
+        parts.append(f"Fehler: {err.get('path')}: {err.get('error')}")
+    return "\n".join(parts)
+
+
+def split_blocks(text: str) -> Tuple[List[str], List[List[str]]]:
+    """Head lines and per-hit/snippet blocks of a rendered result (no blocks for other text)"""
+    head: List[str] = []
+    blocks: List[List[str]] = []
+    for line in text.split("\n"):
+        if line.startswith(BLOCK_PREFIX):
+            blocks.append([line])
+        elif blocks:
+            blocks[-1].append(line)
+        else:
+            head.append(line)
+    return head, blocks
+
+
+def block_path(block: List[str]) -> str:
+    """File path of a block (first field of its header line)"""
+    first = block[0][len(BLOCK_PREFIX):].split(" | ", 1)[0]
+    return first.split(" ", 1)[0]
+
+
+def hit_key(match: Dict[str, Any]) -> str:
+    """Identity of a search hit in a raw result.
+
+    One file holds many documents (a year of decisions, every paragraph of a
+    law), so the file path alone does not identify a hit: the case number and
+    title are added, or the matched line numbers for hits without either.
+    """
+    metadata = match.get("metadata") or {}
+    parts = [str(match.get("file_path") or match.get("file") or "")]
+    if metadata.get("case_number"):
+        parts.append(str(metadata["case_number"]))
+    if match.get("title") and match["title"] != "Untitled":
+        parts.append(str(match["title"]))
+    if len(parts) == 1:
+        lines = [lm.get("match_line") or lm.get("line_number") for lm in match.get("line_matches") or []]
+        lines.append(match.get("line"))
+        parts.append(",".join(str(n) for n in sorted(n for n in lines if n)))
+    return " | ".join(parts)
+
+
+def block_key(block: List[str]) -> str:
+    """Identity of a rendered hit block: its header fields (without score and seen mark), as hit_key"""
+    fields = [f for f in block[0][len(BLOCK_PREFIX):].split(" | ") if not f.startswith(("score ", SEEN_MARK))]
+    if len(fields) <= 2:
+        # No title or case number rendered: the matched lines tell hits in one file apart
+        fields.append(",".join(line.split(">", 1)[0] for line in block[1:] if re.match(r"\d+>", line)))
+    return " | ".join(fields)
+
+
+def _iter_logged_tool_calls(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("JSON: "):
+                line = line[len("JSON: "):]
+            elif not line.startswith("{"):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("tool") and isinstance(entry.get("result"), dict):
+                yield entry
+
+
+def benchmark(paths: List[Path], fields: Optional[Dict[str, List[str]]] = None) -> Dict[str, Dict[str, int]]:
+    """Token counts per tool for the logged results: raw JSON (as sent before) vs compact text"""
+    from client.compaction import estimate_tokens
+
+    totals: Dict[str, Dict[str, int]] = {}
+    for path in paths:
+        for entry in _iter_logged_tool_calls(path):
+            row = totals.setdefault(entry["tool"], {"calls": 0, "json_tokens": 0, "compact_tokens": 0})
+            row["calls"] += 1
+            row["json_tokens"] += estimate_tokens(render_tool_result(entry["tool"], entry["result"], fmt="json"))
+            row["compact_tokens"] += estimate_tokens(render_tool_result(entry["tool"], entry["result"], fields=fields))
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Count tool-result tokens of recorded sessions, raw JSON vs compact rendering")
+    parser.add_argument("logs", nargs="+", help="Session logs (logs/session_*.log)")
+    parser.add_argument("--fields", help='JSON object overriding tool_result_fields, e.g. {"elasticsearch_search": ["title", "lines"]}')
+    parser.add_argument("--json", action="store_true", help="Print the counts as JSON")
+    args = parser.parse_args(argv)
+
+    totals = benchmark([Path(p) for p in args.logs], json.loads(args.fields) if args.fields else None)
+    if args.json:
+        print(json.dumps(totals, indent=2))
+        return 0
+    if not totals:
+        print("No tool results found in the given logs.", file=sys.stderr)
+        return 1
+    print(f"{'tool':<22} {'calls':>6} {'json':>10} {'compact':>10} {'saved':>7}")
+    all_json = all_compact = 0
+    for tool, row in sorted(totals.items()):
+        all_json += row["json_tokens"]
+        all_compact += row["compact_tokens"]
+        saved = 1 - row["compact_tokens"] / row["json_tokens"] if row["json_tokens"] else 0.0
+        print(f"{tool:<22} {row['calls']:>6} {row['json_tokens']:>10} {row['compact_tokens']:>10} {saved:>6.0%}")
+    saved = 1 - all_compact / all_json if all_json else 0.0
+    print(f"{'total':<22} {sum(r['calls'] for r in totals.values()):>6} {all_json:>10} {all_compact:>10} {saved:>6.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
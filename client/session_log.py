@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
@@ -22,34 +23,44 @@ class SessionLogger:
         name = session_name or f"session_{ts}.log"
         self.path = base / name
         self._fh = self.path.open("a", encoding="utf-8")
+        # Tool calls may complete concurrently; keep each entry contiguous
+        self._lock = threading.Lock()
 
     def _ts(self) -> str:
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     def log_tool(self, tool: str, args: Dict[str, Any], result: Dict[str, Any]) -> None:
-        self._fh.write(f"[{self._ts()}] TOOL {tool}\n")
-        self._fh.write(f"ARGS: {json.dumps(args, ensure_ascii=False)}\n")
-        self._fh.write(f"RESULT: {json.dumps(result, ensure_ascii=False)[:4000]}\n")
-        self._fh.write("-" * 60 + "\n")
-        self._fh.write("JSON: " + json.dumps({
-            "ts": self._ts(),
-            "type": "tool",
-            "tool": tool,
-            "args": args,
-            "result": result,
-        }, ensure_ascii=False) + "\n")
-        self._fh.flush()
+        entry = (
+            f"[{self._ts()}] TOOL {tool}\n"
+            f"ARGS: {json.dumps(args, ensure_ascii=False)}\n"
+            f"RESULT: {json.dumps(result, ensure_ascii=False)[:4000]}\n"
+            + "-" * 60 + "\n"
+            + "JSON: " + json.dumps({
+                "ts": self._ts(),
+                "type": "tool",
+                "tool": tool,
+                "args": args,
+                "result": result,
+            }, ensure_ascii=False) + "\n"
+        )
+        with self._lock:
+            self._fh.write(entry)
+            self._fh.flush()
 
     def log_message(self, role: str, content: str) -> None:
-        self._fh.write(f"[{self._ts()}] {role.upper()}\n{content}\n")
-        self._fh.write("-" * 60 + "\n")
-        self._fh.write("JSON: " + json.dumps({
-            "ts": self._ts(),
-            "type": "message",
-            "role": role,
-            "content": content,
-        }, ensure_ascii=False) + "\n")
-        self._fh.flush()
+        entry = (
+            f"[{self._ts()}] {role.upper()}\n{content}\n"
+            + "-" * 60 + "\n"
+            + "JSON: " + json.dumps({
+                "ts": self._ts(),
+                "type": "message",
+                "role": role,
+                "content": content,
+            }, ensure_ascii=False) + "\n"
+        )
+        with self._lock:
+            self._fh.write(entry)
+            self._fh.flush()
 
     def close(self) -> None:
         try:
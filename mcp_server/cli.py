@@ -1,9 +1,13 @@
 import argparse
 import json
+import os
 import sys
-from typing import Any, Dict
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
 
-from mcp_server import tools
+from mcp_server import framing, tools
 
 
 def _print_json(data: Dict[str, Any]) -> None:
@@ -20,6 +24,7 @@ def cmd_search(args: argparse.Namespace) -> None:
         context_lines=args.context_lines,
         es_host=args.es_host,
         es_port=args.es_port,
+        passages=args.passages,
     )
     wrapped = {
         "tool": "elasticsearch_search",
@@ -30,6 +35,7 @@ def cmd_search(args: argparse.Namespace) -> None:
             "context_lines": args.context_lines,
             "es_host": args.es_host,
             "es_port": args.es_port,
+            "passages": args.passages,
         },
         "result": result,
     }
@@ -51,6 +57,20 @@ def cmd_read(args: argparse.Namespace) -> None:
     _print_json(wrapped)
 
 
+def cmd_ranges(args: argparse.Namespace) -> None:
+    ranges = []
+    for spec in args.window:
+        # path:line[:context]
+        path, _, rest = spec.partition(":")
+        line, _, context_lines = rest.partition(":")
+        item: Dict[str, Any] = {"path": path, "line_number": int(line)}
+        if context_lines:
+            item["context_lines"] = int(context_lines)
+        ranges.append(item)
+    result = tools.read_file_ranges(ranges=ranges, max_lines=args.max_lines)
+    _print_json({"tool": "read_file_ranges", "args": {"ranges": ranges, "max_lines": args.max_lines}, "result": result})
+
+
 def cmd_list(args: argparse.Namespace) -> None:
     result = tools.list_paths(subdir=args.subdir)
     wrapped = {
@@ -81,6 +101,112 @@ def cmd_filesearch(args: argparse.Namespace) -> None:
     _print_json(wrapped)
 
 
+def _write_bench_corpus(root: Path, lines: int) -> str:
+    target = root / "gesetze" / "bench"
+    target.mkdir(parents=True, exist_ok=True)
+    text = "Der Vermieter kann das Mietverhältnis nach § 573 BGB ordentlich kündigen, wenn er ein berechtigtes Interesse hat – Rn. {i}"
+    (target / "index.md").write_text("\n".join(text.format(i=i) for i in range(lines)) + "\n", encoding="utf-8")
+    return "gesetze/bench/index.md"
+
+
+def cmd_bench_transport(args: argparse.Namespace) -> None:
+    """Time read_file_range round trips per wire format and payload size"""
+    from client.agent_cli import MCPClient  # client side of the transport under test
+
+    modes: List[str] = ["line"] + [f"length:{codec}" for codec in framing.available_codecs()]
+    sizes = [int(n) for n in args.context_lines.split(",")]
+    report: Dict[str, Any] = {"modes": {}, "calls": args.calls}
+    with tempfile.TemporaryDirectory(prefix="legalgenius-transport-bench-") as tmp:
+        rel = _write_bench_corpus(Path(tmp), lines=2 * max(sizes) + 10)
+        env = os.environ.copy()
+        env["LEGAL_DOC_ROOT"] = tmp
+        env["PYTHONPATH"] = env.get("PYTHONPATH") or str(Path.cwd())
+        for mode in modes:
+            mcp = MCPClient(env=env, framing=mode)
+            label = "line/json" if mcp.framing == "line" else f"length/{mcp.codec}"
+            rows = {}
+            try:
+                for context_lines in sizes:
+                    call_args = {"path": rel, "line_number": max(sizes) + 1, "context_lines": context_lines, "max_lines": 0}
+                    payload = mcp.submit_tool("read_file_range", call_args).result()
+                    size_bytes = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+                    started = time.perf_counter()
+                    for _ in range(args.calls):
+                        mcp.submit_tool("read_file_range", call_args).result()
+                    elapsed = time.perf_counter() - started
+                    rows[str(context_lines)] = {
+                        "payload_kb": round(size_bytes / 1024, 1),
+                        "ms_per_call": round(elapsed * 1000 / args.calls, 3),
+                        "mb_per_s": round(size_bytes * args.calls / elapsed / (1024 * 1024), 1),
+                    }
+            finally:
+                mcp.close()
+            report["modes"][label] = rows
+
+    print(f"{'mode':<16} {'context':>8} {'payload KB':>11} {'ms/call':>9} {'MB/s':>8}")
+    for label, rows in report["modes"].items():
+        for context_lines, row in rows.items():
+            print(f"{label:<16} {context_lines:>8} {row['payload_kb']:>11} {row['ms_per_call']:>9} {row['mb_per_s']:>8}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def cmd_bench_startup(args: argparse.Namespace) -> None:
+    """Time server spawn -> first ping -> warm -> first tool calls, cold vs --preload"""
+    from client.agent_cli import MCPClient
+
+    report: Dict[str, Any] = {"runs": args.runs, "modes": {}}
+    with tempfile.TemporaryDirectory(prefix="legalgenius-startup-bench-") as tmp:
+        rel = _write_bench_corpus(Path(tmp), lines=200)
+        env = os.environ.copy()
+        env["LEGAL_DOC_ROOT"] = tmp
+        env["PYTHONPATH"] = env.get("PYTHONPATH") or str(Path.cwd())
+        # Every run must measure a first, uncached search
+        env["MCP_SHARED_CACHE"] = "off"
+        for mode in ("cold", "preload"):
+            env["MCP_PRELOAD"] = "1" if mode == "preload" else "0"
+            samples: Dict[str, List[float]] = {"ping_ms": [], "warm_ms": [], "search_ms": [], "read_ms": []}
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                mcp = MCPClient(env=env)
+                try:
+                    mcp.submit("ping").result(timeout=30)
+                    samples["ping_ms"].append((time.perf_counter() - started) * 1000)
+                    if mode == "preload":
+                        # Poll readiness the way a pool would before routing traffic
+                        while not (mcp.submit("ping").result(timeout=30).get("result") or {}).get("warm"):
+                            time.sleep(0.005)
+                    samples["warm_ms"].append((time.perf_counter() - started) * 1000)
+                    t0 = time.perf_counter()
+                    mcp.submit_tool("elasticsearch_search", {"query": "Kündigung", "max_results": 1}).result(timeout=60)
+                    samples["search_ms"].append((time.perf_counter() - t0) * 1000)
+                    t0 = time.perf_counter()
+                    mcp.submit_tool("read_file_range", {"path": rel, "line_number": 100, "context_lines": 5}).result(timeout=60)
+                    samples["read_ms"].append((time.perf_counter() - t0) * 1000)
+                finally:
+                    mcp.close()
+            report["modes"][mode] = {key: round(sorted(vals)[len(vals) // 2], 1) for key, vals in samples.items() if vals}
+
+    print(f"{'mode':<8} {'ping ms':>8} {'warm ms':>8} {'1st search ms':>14} {'1st read ms':>12}")
+    for mode, row in report["modes"].items():
+        print(f"{mode:<8} {row['ping_ms']:>8} {row['warm_ms']:>8} {row['search_ms']:>14} {row['read_ms']:>12}")
+    print("(medians; search hits Elasticsearch if it is running, otherwise measures the error path)")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def cmd_cache(args: argparse.Namespace) -> None:
+    from mcp_server.shared_cache import SharedCache
+
+    cache = SharedCache.from_env()
+    if cache is None:
+        _print_json({"error": "shared cache disabled (MCP_SHARED_CACHE=off)"})
+        return
+    if args.clear:
+        cache.clear(None if args.clear == "all" else args.clear)
+    _print_json(cache.stats())
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="CLI to test mcp_server.tools",
@@ -94,6 +220,7 @@ def build_parser() -> argparse.ArgumentParser:
     p_search.add_argument("--context-lines", type=int, default=2, help="Lines of context to include around matches (default 2)")
     p_search.add_argument("--es-host", default="localhost", help="Elasticsearch host (default localhost)")
     p_search.add_argument("--es-port", type=int, default=9200, help="Elasticsearch port (default 9200)")
+    p_search.add_argument("--passages", action="store_true", help="Search the legal_passages index and group hits by parent document")
     p_search.set_defaults(func=cmd_search)
 
     p_read = sub.add_parser("read", help="Read a byte range from a file with optional context")
@@ -103,6 +230,11 @@ def build_parser() -> argparse.ArgumentParser:
     p_read.add_argument("--context", type=int, default=None, help="Extra bytes of context to include on both sides")
     p_read.set_defaults(func=cmd_read)
 
+    p_ranges = sub.add_parser("ranges", help="Read many line windows at once (overlapping windows per file are merged)")
+    p_ranges.add_argument("window", nargs="+", help="path:line or path:line:context_lines")
+    p_ranges.add_argument("--max-lines", type=int, default=None, help="Cap lines per merged snippet")
+    p_ranges.set_defaults(func=cmd_ranges)
+
     p_list = sub.add_parser("list", help="List allowed files under a subdirectory")
     p_list.add_argument("--subdir", default=".", help="Subdirectory under the legal doc root")
     p_list.set_defaults(func=cmd_list)
@@ -114,6 +246,21 @@ def build_parser() -> argparse.ArgumentParser:
     p_fsearch.add_argument("--max-results", type=int, default=None, help="Max files to return")
     p_fsearch.set_defaults(func=cmd_filesearch)
 
+    p_bench = sub.add_parser("bench-transport", help="Benchmark line-delimited JSON against length-prefixed framing per codec")
+    p_bench.add_argument("--calls", type=int, default=200, help="Round trips per mode and payload size (default 200)")
+    p_bench.add_argument("--context-lines", default="10,1000,20000", help="Comma-separated read_file_range context sizes (default 10,1000,20000)")
+    p_bench.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    p_bench.set_defaults(func=cmd_bench_transport)
+
+    p_startup = sub.add_parser("bench-startup", help="Benchmark server startup and first tool calls, cold vs --preload")
+    p_startup.add_argument("--runs", type=int, default=5, help="Server starts per mode (default 5)")
+    p_startup.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    p_startup.set_defaults(func=cmd_bench_startup)
+
+    p_cache = sub.add_parser("cache", help="Show (or clear) the cross-process cache of offsets, header tables and search results")
+    p_cache.add_argument("--clear", nargs="?", const="all", default=None, help="Clear all entries, or one namespace: offsets, headers, search (e.g. after re-indexing)")
+    p_cache.set_defaults(func=cmd_cache)
+
     return parser
 
 
@@ -0,0 +1,112 @@
+"""
+Wire formats for the MCP stdio transport.
+
+Default mode is line-delimited JSON (one request/response per line). A client
+may switch a connection to length-prefixed frames by sending, as a normal
+JSON line:
+
+    {"jsonrpc": "2.0", "id": 0, "method": "negotiate",
+     "params": {"framing": "length", "codecs": ["msgpack", "orjson", "json"]}}
+
+The server answers on the same line channel with the codec it picked (the
+first one in the client's list it can load) and both sides then exchange
+frames: a 4-byte big-endian payload length followed by the encoded message.
+Servers that do not know "negotiate" answer "Method not found" and the client
+stays on line-delimited JSON.
+
+orjson and msgpack are optional (pip install legalgenius[transport]); plain
+json is always available.
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+FRAME_HEADER = struct.Struct(">I")
+# Refuse absurd frame sizes instead of trying to allocate them
+MAX_FRAME_BYTES = 512 * 1024 * 1024
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+_CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (_json_dumps, json.loads),
+}
+if orjson is not None:
+    _CODECS["orjson"] = (orjson.dumps, orjson.loads)
+if msgpack is not None:
+    _CODECS["msgpack"] = (
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+    )
+
+# Client preference order: most compact/fastest first
+PREFERRED_CODECS = ["msgpack", "orjson", "json"]
+
+
+def available_codecs() -> List[str]:
+    return [name for name in PREFERRED_CODECS if name in _CODECS]
+
+
+def choose_codec(offered: Optional[List[str]]) -> str:
+    """Pick the first offered codec this side can load (json as last resort)"""
+    for name in offered or []:
+        if name in _CODECS:
+            return name
+    return "json"
+
+
+def encode(obj: Any, codec: str = "json") -> bytes:
+    return _CODECS[codec][0](obj)
+
+
+def decode(data: bytes, codec: str = "json") -> Any:
+    return _CODECS[codec][1](data)
+
+
+def write_frame(stream: BinaryIO, payload: bytes) -> None:
+    stream.write(FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def read_frame(stream: BinaryIO) -> Optional[bytes]:
+    """Read one frame; None on a clean EOF between frames"""
+    header = _read_exact(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes exceeds limit")
+    payload = _read_exact(stream, size)
+    if payload is None:
+        raise EOFError("Stream ended inside a frame")
+    return payload
+
+
+def _read_exact(stream: BinaryIO, size: int) -> Optional[bytes]:
+    if size == 0:
+        return b""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise EOFError("Stream ended inside a frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
@@ -0,0 +1,190 @@
+"""
+Background writer for the MCP server's tool-call log (logs/session_<ts>.jsonl).
+
+Tool calls only build a small bounded summary of their result and enqueue it;
+a daemon thread serializes records, appends them in batches and rotates the
+file. When the queue is full records are dropped (and counted) instead of
+blocking the tool call.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Limits for summarize_result
+SUMMARY_MAX_CHARS = 2000
+SUMMARY_MAX_DEPTH = 3
+SUMMARY_MAX_ITEMS = 3
+SUMMARY_MAX_KEYS = 20
+SUMMARY_STRING_CHARS = 200
+
+
+def summarize_result(result: Any, max_chars: int = SUMMARY_MAX_CHARS) -> Any:
+    """Bounded summary of a tool result without serializing it.
+
+    Scalars are kept, strings are cut, lists become {"len", "head"} with the
+    first few items summarized, and nesting stops at SUMMARY_MAX_DEPTH. The
+    total string content is capped at roughly max_chars, so the cost does not
+    depend on the size of the result.
+    """
+    budget = [max_chars]
+    return _summarize(result, 0, budget)
+
+
+def _summarize(value: Any, depth: int, budget: List[int]) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        keep = max(0, min(len(value), SUMMARY_STRING_CHARS, budget[0]))
+        budget[0] -= keep
+        return value if keep == len(value) else value[:keep] + f"...(+{len(value) - keep} chars)"
+    if depth >= SUMMARY_MAX_DEPTH or budget[0] <= 0:
+        if isinstance(value, (list, tuple, dict)):
+            return {"len": len(value)}
+        return type(value).__name__
+    if isinstance(value, dict):
+        out: Dict[str, Any] = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i >= SUMMARY_MAX_KEYS or budget[0] <= 0:
+                out["..."] = f"+{len(value) - i} keys"
+                break
+            out[str(key)] = _summarize(item, depth + 1, budget)
+        return out
+    if isinstance(value, (list, tuple)):
+        head = [_summarize(item, depth + 1, budget) for item in value[:SUMMARY_MAX_ITEMS]]
+        if len(value) <= SUMMARY_MAX_ITEMS:
+            return head
+        return {"len": len(value), "head": head}
+    return type(value).__name__
+
+
+class ToolCallLogWriter:
+    """Bounded queue + daemon thread appending JSONL records with size-based rotation"""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        path: Path,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_bytes: int = 20 * 1024 * 1024,
+        backups: int = 5,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, path: Path) -> "ToolCallLogWriter":
+        return cls(
+            path,
+            max_queue=int(os.environ.get("MCP_LOG_QUEUE", "1000")),
+            max_bytes=int(os.environ.get("MCP_LOG_MAX_BYTES", str(20 * 1024 * 1024))),
+            backups=int(os.environ.get("MCP_LOG_BACKUPS", "5")),
+        )
+
+    def submit(self, tool: str, args: Dict[str, Any], result: Any) -> None:
+        """Enqueue a tool call record; never blocks"""
+        record = {"tool": tool, "args": args, "result": summarize_result(result), "ts": time.time()}
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mcp-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except Exception:
+                continue
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            lines.append(json.dumps({"dropped": dropped, "ts": time.time()}))
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._rotate_if_needed(len(data))
+            with self.path.open("ab") as f:
+                f.write(data)
+        except OSError:
+            pass
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        if not self.max_bytes:
+            return
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+        # session_x.jsonl -> session_x.jsonl.1 -> ... -> .<backups> (oldest dropped)
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush queued records and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
@@ -1,24 +1,45 @@
+import argparse
+import os
 import sys
 import json
+import signal
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from mcp_server import tools
+from mcp_server import framing, tools
+from mcp_server.log_writer import ToolCallLogWriter
 
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 SESSION_PATH = LOG_DIR / f"session_{int(time.time())}.jsonl"
+# Tool calls are I/O bound (ripgrep subprocesses, Elasticsearch HTTP), so a
+# thread pool is enough to overlap requests that arrive back to back.
+MAX_WORKERS = int(os.environ.get("MCP_SERVER_WORKERS", "8"))
+# call_tools: items of one batch run on their own pool (a batch already holds
+# a MAX_WORKERS thread, so sharing that pool could deadlock)
+BATCH_WORKERS = int(os.environ.get("MCP_BATCH_WORKERS", "4"))
+MAX_BATCH_CALLS = int(os.environ.get("MCP_MAX_BATCH_CALLS", "64"))
+
+# Tool calls only enqueue a bounded summary; a background thread writes the file
+_log_writer = ToolCallLogWriter.from_env(SESSION_PATH)
+_stdout_lock = threading.Lock()
+# ids of call_tool requests submitted to the pool and not yet answered
+_inflight: set = set()
+_inflight_lock = threading.Lock()
+# Wire format of this connection; switched by a "negotiate" request
+_wire = {"framing": "line", "codec": "json"}
+_started_at = time.time()
+_batch_pool: ThreadPoolExecutor | None = None
+_batch_pool_lock = threading.Lock()
+# Readiness: "cold" (nothing preloaded), "warming" (preload running) or "warm"
+_warm = {"status": "cold", "preload_ms": None, "elasticsearch": None}
 
 
 def log_tool_call(tool: str, args: Dict[str, Any], result: Dict[str, Any]):
-    truncated = result
-    as_text = json.dumps(result, ensure_ascii=False)
-    if len(as_text) > 2000:
-        truncated = json.loads(as_text[:2000] + "...") if False else {"truncated": True}
-    record = {"tool": tool, "args": args, "result": truncated, "ts": time.time()}
-    with SESSION_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _log_writer.submit(tool, args, result)
 
 
 def handle_call(request: Dict[str, Any]) -> Dict[str, Any]:
@@ -30,42 +51,253 @@ def handle_call(request: Dict[str, Any]) -> Dict[str, Any]:
         tool_name = params.get("tool")
         args = params.get("args") or {}
         try:
-            if tool_name == "search_rg":
-                result = tools.search_rg(**args)
-            elif tool_name == "read_file_range":
-                result = tools.read_file_range(**args)
-            elif tool_name == "list_paths":
-                result = tools.list_paths(**args)
-            elif tool_name == "file_search":
-                result = tools.file_search(**args)
-            elif tool_name == "elasticsearch_search":
-                result = tools.elasticsearch_search(**args)
-            else:
-                raise ValueError(f"Unknown tool: {tool_name}")
+            with tools.tool_call_scope(req_id):
+                result = _run_tool(tool_name, args)
             log_tool_call(tool_name, args, result)
             return {"jsonrpc": "2.0", "id": req_id, "result": result}
+        except tools.CallCancelled:
+            return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32800, "message": "Request cancelled"}}
         except Exception as e:
             return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32000, "message": str(e)}}
 
+    elif method == "call_tools":
+        calls = params.get("calls")
+        if not isinstance(calls, list):
+            return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32602, "message": "call_tools expects params.calls to be a list"}}
+        if len(calls) > MAX_BATCH_CALLS:
+            return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32602, "message": f"call_tools accepts at most {MAX_BATCH_CALLS} calls"}}
+        try:
+            with tools.tool_call_scope(req_id):
+                results = _run_batch(req_id, calls)
+            return {"jsonrpc": "2.0", "id": req_id, "result": {"results": results}}
+        except tools.CallCancelled:
+            return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32800, "message": "Request cancelled"}}
+
+    elif method == "cancel":
+        # Best effort: kills ripgrep children and stops long scans of the target call
+        target = params.get("id")
+        return {"jsonrpc": "2.0", "id": req_id, "result": {"cancelled": tools.cancel_call(target)}}
+
     elif method == "ping":
-        return {"jsonrpc": "2.0", "id": req_id, "result": {"ok": True}}
+        return {"jsonrpc": "2.0", "id": req_id, "result": {
+            "ok": True,
+            "warm": _warm["status"] == "warm",
+            "status": _warm["status"],
+            "preload_ms": _warm["preload_ms"],
+            "elasticsearch": _warm["elasticsearch"],
+            "uptime_s": round(time.time() - _started_at, 3),
+            "state": tools.warm_state(),
+        }}
 
     return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32601, "message": "Method not found"}}
 
 
-def main():
-    # Simple line-delimited JSON-RPC over stdio
-    for line in sys.stdin:
-        line = line.strip()
-        if not line:
+def preload() -> None:
+    """Warm-up phase: load config/sandbox, import requests, open the ES connection pool"""
+    _warm["status"] = "warming"
+    started = time.perf_counter()
+    try:
+        state = tools.preload()
+        _warm["elasticsearch"] = state.get("elasticsearch")
+    except Exception as e:
+        print(f"[mcp] preload failed: {e}", file=sys.stderr)
+    _warm["preload_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _warm["status"] = "warm"
+
+
+def _run_tool(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    if tool_name == "search_rg":
+        return tools.search_rg(**args)
+    elif tool_name == "read_file_range":
+        return tools.read_file_range(**args)
+    elif tool_name == "read_file_ranges":
+        return tools.read_file_ranges(**args)
+    elif tool_name == "list_paths":
+        return tools.list_paths(**args)
+    elif tool_name == "file_search":
+        return tools.file_search(**args)
+    elif tool_name == "elasticsearch_search":
+        return tools.elasticsearch_search(**args)
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+
+def _get_batch_pool() -> ThreadPoolExecutor:
+    global _batch_pool
+    if _batch_pool is None:
+        with _batch_pool_lock:
+            if _batch_pool is None:
+                _batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="mcp-batch")
+    return _batch_pool
+
+
+def _batch_item(result: Any) -> Dict[str, Any]:
+    if isinstance(result, tools.CallCancelled):
+        return {"error": {"code": -32800, "message": "Request cancelled"}}
+    if isinstance(result, Exception):
+        return {"error": {"code": -32000, "message": str(result)}}
+    return {"result": result}
+
+
+def _run_batch(req_id: Any, calls: List[Any]) -> List[Dict[str, Any]]:
+    """Execute a call_tools batch; one {"result"} or {"error"} entry per call, in request order.
+
+    All tools are read-only, so items run concurrently. read_file_range calls
+    on the same path form one task that maps the file once.
+    """
+    results: List[Dict[str, Any] | None] = [None] * len(calls)
+    tasks: List[tuple] = []
+    ranges_by_path: Dict[str, List[int]] = {}
+    for i, call in enumerate(calls):
+        if not isinstance(call, dict) or not isinstance(call.get("args") or {}, dict):
+            results[i] = {"error": {"code": -32602, "message": "Each call needs a tool name and an args object"}}
             continue
+        args = call.get("args") or {}
+        if call.get("tool") == "read_file_range" and isinstance(args.get("path"), str):
+            ranges_by_path.setdefault(args["path"], []).append(i)
+        else:
+            tasks.append(("tool", [i]))
+    tasks.extend(("ranges", indices) for indices in ranges_by_path.values())
+
+    def run(kind: str, indices: List[int]) -> List[Any]:
+        with tools.attach_call_scope(req_id):
+            if kind == "ranges":
+                path = calls[indices[0]]["args"]["path"]
+                return tools.read_file_range_group(path, [calls[i]["args"] for i in indices])
+            call = calls[indices[0]]
+            try:
+                return [_run_tool(call.get("tool"), call.get("args") or {})]
+            except Exception as e:
+                return [e]
+
+    futures = [(indices, _get_batch_pool().submit(run, kind, indices)) for kind, indices in tasks]
+    for indices, fut in futures:
         try:
-            req = json.loads(line)
-        except json.JSONDecodeError:
-            continue
+            outcome = fut.result()
+        except Exception as e:
+            outcome = [e for _ in indices]
+        for i, result in zip(indices, outcome):
+            results[i] = _batch_item(result)
+            if "result" in results[i]:
+                log_tool_call(calls[i].get("tool"), calls[i].get("args") or {}, result)
+    if any(isinstance(item, dict) and item.get("error", {}).get("code") == -32800 for item in results):
+        raise tools.CallCancelled(f"Call {req_id} cancelled")
+    return results
+
+
+def write_response(resp: Dict[str, Any]) -> None:
+    out = sys.stdout.buffer
+    with _stdout_lock:
+        if _wire["framing"] == "length":
+            framing.write_frame(out, framing.encode(resp, _wire["codec"]))
+        else:
+            out.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+            out.flush()
+
+
+def _negotiate(req: Dict[str, Any]) -> None:
+    """Answer on the line channel, then switch the connection to frames"""
+    params = req.get("params") or {}
+    if params.get("framing") != "length":
+        write_response({"jsonrpc": "2.0", "id": req.get("id"), "result": dict(_wire)})
+        return
+    codec = framing.choose_codec(params.get("codecs"))
+    with _stdout_lock:
+        resp = {"jsonrpc": "2.0", "id": req.get("id"), "result": {"framing": "length", "codec": codec}}
+        out = sys.stdout.buffer
+        out.write(json.dumps(resp).encode("utf-8") + b"\n")
+        out.flush()
+        _wire["framing"] = "length"
+        _wire["codec"] = codec
+
+
+def _read_request(stdin) -> Any:
+    """Next request from stdin in the current wire format; None at EOF, {} if unreadable"""
+    if _wire["framing"] == "length":
+        payload = framing.read_frame(stdin)
+        if payload is None:
+            return None
+        try:
+            return framing.decode(payload, _wire["codec"])
+        except Exception:
+            return {}
+    line = stdin.readline()
+    if not line:
+        return None
+    line = line.strip()
+    if not line:
+        return {}
+    try:
+        return json.loads(line)
+    except ValueError:
+        return {}
+
+
+def _handle_and_respond(req: Dict[str, Any]) -> None:
+    try:
         resp = handle_call(req)
-        sys.stdout.write(json.dumps(resp, ensure_ascii=False) + "\n")
-        sys.stdout.flush()
+    except Exception as e:
+        resp = {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32603, "message": str(e)}}
+    finally:
+        with _inflight_lock:
+            _inflight.discard(req.get("id"))
+            tools.release_call(req.get("id"))
+    write_response(resp)
+
+
+def _cancel_inflight(req: Dict[str, Any]) -> Dict[str, Any]:
+    target = (req.get("params") or {}).get("id")
+    # Under the lock a queued or running call cannot finish in between, so its
+    # flag is always released by _handle_and_respond
+    with _inflight_lock:
+        if target not in _inflight:
+            # Already answered (or never seen): nothing to cancel
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": {"cancelled": False}}
+        cancelled = tools.cancel_call(target, queued=True)
+    return {"jsonrpc": "2.0", "id": req.get("id"), "result": {"cancelled": cancelled}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LegalGenius MCP tool server (JSON-RPC over stdio)")
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        default=os.environ.get("MCP_PRELOAD", "").lower() in ("1", "true", "yes"),
+        help="Warm up in the background right after start (also MCP_PRELOAD=1); ping reports the warm state",
+    )
+    args = parser.parse_args(argv)
+    if args.preload:
+        threading.Thread(target=preload, name="mcp-preload", daemon=True).start()
+
+    # JSON-RPC over stdio, line-delimited JSON unless the client negotiates
+    # length-prefixed frames (see mcp_server/framing.py). Requests are
+    # dispatched on a thread pool and responses are written as they complete,
+    # so they may arrive out of order; clients match them by JSON-RPC id.
+    # ping, cancel and negotiate are answered inline so they are never stuck
+    # behind busy workers.
+    # Exit through SystemExit on SIGTERM so the log writer is flushed at exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    stdin = sys.stdin.buffer
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="mcp-call") as pool:
+        while True:
+            req = _read_request(stdin)
+            if req is None:
+                break
+            if not isinstance(req, dict) or not req:
+                continue
+            method = req.get("method")
+            if method == "negotiate":
+                _negotiate(req)
+                continue
+            if method == "ping":
+                write_response(handle_call(req))
+                continue
+            if method == "cancel":
+                write_response(_cancel_inflight(req))
+                continue
+            with _inflight_lock:
+                _inflight.add(req.get("id"))
+            pool.submit(_handle_and_respond, req)
+    _log_writer.close()
 
 
 if __name__ == "__main__":
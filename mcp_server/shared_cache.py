@@ -0,0 +1,207 @@
+"""
+Cache shared by all MCP server processes on a machine (CLI sessions, API
+workers, evaluate_cases.py runs).
+
+Entries live in one SQLite file (default logs/mcp_cache.sqlite, override
+with MCP_SHARED_CACHE=<path>, disable with MCP_SHARED_CACHE=off). The
+database runs in WAL mode: a writer publishes an entry in a single
+transaction, readers keep seeing the previous snapshot until that commit and
+are never blocked by it.
+
+Every entry carries a version string. For file-derived data (line offsets,
+header tables) it is the file's mtime and size, so edited files are rebuilt
+instead of served stale. Search results are versioned by their arguments and
+expire after a TTL.
+
+Cache errors (locked or read-only file, disk full) are treated as misses;
+a tool call never fails because of the cache.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+DEFAULT_PATH = Path("logs") / "mcp_cache.sqlite"
+# Prune oldest entries when the file grows beyond this
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+PRUNE_EVERY_PUTS = 200
+
+
+def file_version(path: Path) -> str:
+    """Version string for data derived from a file's content"""
+    st = path.stat()
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def pack_offsets(offsets: List[int]) -> bytes:
+    return array("Q", offsets).tobytes()
+
+
+def unpack_offsets(data: bytes) -> List[int]:
+    values = array("Q")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class SharedCache:
+    """Versioned key/value store in a WAL-mode SQLite file"""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._local = threading.local()
+        self._puts = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        # Only takes effect for a new file; lets prune() return freed pages to the OS
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedCache"]:
+        setting = os.environ.get("MCP_SHARED_CACHE", "")
+        if setting.lower() in ("off", "0", "false", "no"):
+            return None
+        max_mb = os.environ.get("MCP_SHARED_CACHE_MAX_MB")
+        max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES
+        try:
+            return cls(Path(setting) if setting else DEFAULT_PATH, max_bytes=max_bytes)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[mcp] shared cache disabled: {e}", file=sys.stderr)
+            return None
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, version: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        try:
+            row = self._conn().execute(
+                "SELECT version, value, created FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        if row is None or row[0] != version or (max_age is not None and time.time() - row[2] > max_age):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[1]
+
+    def put(self, namespace: str, key: str, version: str, value: bytes) -> None:
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, version, value, created) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, version, sqlite3.Binary(value), time.time()),
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self._puts += 1
+        if self._puts % PRUNE_EVERY_PUTS == 0:
+            self.prune()
+
+    def get_json(self, namespace: str, key: str, version: str, max_age: Optional[float] = None) -> Any:
+        data = self.get(namespace, key, version, max_age=max_age)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, namespace: str, key: str, version: str, value: Any) -> None:
+        self.put(namespace, key, version, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def size_bytes(self) -> int:
+        total = 0
+        for p in (self.path, self.path.with_name(self.path.name + "-wal")):
+            try:
+                total += p.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def live_bytes(self) -> Optional[int]:
+        """Bytes in pages that hold data (None if unreadable); deleted entries leave free pages that do not count"""
+        try:
+            conn = self._conn()
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        return (page_count - freelist) * page_size
+
+    def prune(self) -> None:
+        """Drop the oldest quarter of the entries if the stored data is over max_bytes.
+
+        The limit is checked against live_bytes(), not the file size: a file
+        without auto_vacuum never shrinks, and checking its size would empty
+        the cache a quarter at a time.
+        """
+        live = self.live_bytes() if self.max_bytes else None
+        if live is None or live <= self.max_bytes:
+            return
+        try:
+            conn = self._conn()
+            conn.execute(
+                "DELETE FROM entries WHERE rowid IN "
+                "(SELECT rowid FROM entries ORDER BY created LIMIT (SELECT COUNT(*) / 4 + 1 FROM entries))"
+            )
+            # No-op for files created before auto_vacuum was enabled
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error:
+            self.errors += 1
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        try:
+            conn = self._conn()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        namespaces: List[Tuple[str, int]] = []
+        try:
+            namespaces = self._conn().execute(
+                "SELECT namespace, COUNT(*) FROM entries GROUP BY namespace ORDER BY namespace"
+            ).fetchall()
+        except sqlite3.Error:
+            self.errors += 1
+        return {
+            "path": str(self.path),
+            "size_bytes": self.size_bytes(),
+            "live_bytes": self.live_bytes(),
+            "entries": dict(namespaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
@@ -12,9 +12,17 @@ Public APIs:
   Returns a decoded UTF-8 slice around the requested byte range with optional
   symmetric context (default defined in configuration).
 
+- read_file_ranges(ranges) -> dict with merged snippets
+  Many (path, line_number, context_lines) windows in one call; overlapping
+  windows on a file are merged and each file is opened once.
+
 - list_paths(subdir?) -> dict with file list
   Lists files below the sandbox root that match allowed extensions.
 
+Cancellation: tool calls run inside tool_call_scope(call_id); cancel_call(call_id)
+kills ripgrep children started by that call and makes long Python loops
+(file_search) stop with CallCancelled.
+
 Security: All filesystem access is restricted to the configured legal document
 root and limited to allowed extensions (.txt, .md). Path breakout attempts are
 rejected.
@@ -25,14 +33,22 @@ import re
 import json
 import subprocess
 import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Tuple
 import fnmatch
-import requests
+import bisect
+import mmap
+
+from mcp_server import shared_cache
 
-import yaml
+# requests and yaml are imported lazily: they dominate import time and a
+# server process may never reach Elasticsearch or have a config file
 
 ALLOWED_EXTENSIONS = {".txt", ".md"}
+MARKDOWN_HEADER_RE = re.compile(r"^\s{0,3}#{1,6}\s+\S")
 
 
 class Sandbox:
@@ -40,11 +56,13 @@ class Sandbox:
 
     Guarantees that all resolved paths stay within the configured root and
     provides utilities for listing files and translating line numbers to
-    absolute byte offsets for precise slicing.
+    absolute byte offsets for precise slicing. Offsets and header tables are
+    also published to the shared cache so other server processes reuse them.
     """
     def __init__(self, root: Path):
         self.root = root.resolve()
         self._line_offset_cache: Dict[Path, List[int]] = {}
+        self._header_cache: Dict[Path, List[List[Any]]] = {}
 
     def resolve_inside(self, relative_path: str) -> Path:
         candidate = (self.root / relative_path).resolve()
@@ -66,18 +84,50 @@ class Sandbox:
         # offsets[line_number] = byte_start_of_line
         if path in self._line_offset_cache:
             return self._line_offset_cache[path]
-        offsets: List[int] = [0]  # placeholder to align indices so we can use 1-based line numbers
-        byte_index = 0
-        with path.open("rb") as f:
-            for chunk in f.read().splitlines(keepends=True):
-                offsets.append(byte_index)
-                byte_index += len(chunk)
-        # Ensure at least one line
-        if len(offsets) == 1:
-            offsets.append(0)
+        shared = _get_shared_cache()
+        version = shared_cache.file_version(path) if shared is not None else ""
+        data = shared.get("offsets", str(path), version) if shared is not None else None
+        if data is not None:
+            offsets = shared_cache.unpack_offsets(data)
+        else:
+            offsets = [0]  # placeholder to align indices so we can use 1-based line numbers
+            byte_index = 0
+            with path.open("rb") as f:
+                for chunk in f.read().splitlines(keepends=True):
+                    offsets.append(byte_index)
+                    byte_index += len(chunk)
+            # Ensure at least one line
+            if len(offsets) == 1:
+                offsets.append(0)
+            if shared is not None:
+                shared.put("offsets", str(path), version, shared_cache.pack_offsets(offsets))
         self._line_offset_cache[path] = offsets
         return offsets
 
+    def header_table(self, path: Path) -> List[List[Any]]:
+        """[line_number, header] for every Markdown header in the file, in order"""
+        if path in self._header_cache:
+            return self._header_cache[path]
+        shared = _get_shared_cache()
+        version = shared_cache.file_version(path) if shared is not None else ""
+        table = shared.get_json("headers", str(path), version) if shared is not None else None
+        if table is None:
+            table = []
+            with path.open("r", encoding="utf-8", errors="ignore") as fh:
+                for i, line in enumerate(fh, start=1):
+                    if MARKDOWN_HEADER_RE.match(line):
+                        table.append([i, line.strip()])
+            if shared is not None:
+                shared.put_json("headers", str(path), version, table)
+        self._header_cache[path] = table
+        return table
+
+    def section_for_line(self, path: Path, line_number: int) -> str | None:
+        """Nearest Markdown header at or above line_number (1-based)"""
+        table = self.header_table(path)
+        i = bisect.bisect_right(table, [line_number, chr(0x10FFFF)])
+        return table[i - 1][1] if i > 0 else None
+
     def line_start_offset(self, path: Path, line_number: int) -> int:
         offsets = self._build_line_offset_cache(path)
         if line_number < 1:
@@ -95,6 +145,9 @@ class Config:
     - glob: Default glob for searching files
     - max_results: Default maximum number of search results
     - context_bytes: Default context size for read_file_range
+    - es_fuzziness: Fuzziness for Elasticsearch queries (e.g. "AUTO"); None
+      disables fuzzy expansion, which the stemming/decompounding analyzers
+      make unnecessary for most queries
     """
     def __init__(self, path: Path | None = None):
         # Defaults
@@ -102,15 +155,19 @@ class Config:
         self.glob = "**/*.{txt,md}"
         self.max_results = 50
         self.context_bytes = 300
+        self.es_fuzziness: str | None = None
 
         # Load from YAML if present
         if path and path.exists():
+            import yaml
+
             with path.open("r", encoding="utf-8") as f:
                 data = yaml.safe_load(f) or {}
             self.legal_doc_root = data.get("legal_doc_root", self.legal_doc_root)
             self.glob = data.get("glob", self.glob)
             self.max_results = int(data.get("max_results", self.max_results))
             self.context_bytes = int(data.get("context_bytes", self.context_bytes))
+            self.es_fuzziness = data.get("es_fuzziness", self.es_fuzziness)
 
         # Environment override takes precedence
         env_root = os.environ.get("LEGAL_DOC_ROOT")
@@ -126,16 +183,193 @@ def load_config() -> Config:
     return Config(cfg_path if cfg_path.exists() else None)
 
 
-_config = load_config()
-_sandbox = Sandbox(Path(_config.legal_doc_root))
+# Config and sandbox are created on first use (or by preload()), not at import
+_config: Config | None = None
+_sandbox: Sandbox | None = None
+_es_http = None
+_shared: shared_cache.SharedCache | None = None
+_shared_loaded = False
+_init_lock = threading.Lock()
+# Elasticsearch results are reused across processes for this many seconds (0 disables)
+SEARCH_CACHE_TTL = float(os.environ.get("MCP_SEARCH_CACHE_TTL", "300"))
+# Files of the top hits read ahead after each elasticsearch_search (0 disables)
+PREFETCH_TOP_K = int(os.environ.get("MCP_PREFETCH_TOP_K", "0"))
+# Lines kept in memory before and after every match line of a prefetched hit
+PREFETCH_LINES = int(os.environ.get("MCP_PREFETCH_LINES", "40"))
+PREFETCH_MAX_FILES = 64
+PREFETCH_MAX_BYTES_PER_FILE = 256 * 1024
+
+
+def _get_config() -> Config:
+    global _config
+    if _config is None:
+        with _init_lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+
+def _get_sandbox() -> Sandbox:
+    global _sandbox
+    if _sandbox is None:
+        config = _get_config()
+        with _init_lock:
+            if _sandbox is None:
+                _sandbox = Sandbox(Path(config.legal_doc_root))
+    return _sandbox
+
+
+def _get_shared_cache() -> shared_cache.SharedCache | None:
+    global _shared, _shared_loaded
+    if not _shared_loaded:
+        with _init_lock:
+            if not _shared_loaded:
+                _shared = shared_cache.SharedCache.from_env()
+                _shared_loaded = True
+    return _shared
+
+
+def _es_session():
+    """Shared requests.Session so Elasticsearch connections are pooled and reused"""
+    global _es_http
+    if _es_http is None:
+        with _init_lock:
+            if _es_http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _es_http = session
+    return _es_http
+
+
+def warm_state() -> Dict[str, Any]:
+    """What has been initialized in this process (reported by the server's ping)"""
+    return {
+        "config": _config is not None,
+        "sandbox": _sandbox is not None,
+        "es_session": _es_http is not None,
+        "line_offset_files": len(_sandbox._line_offset_cache) if _sandbox is not None else 0,
+        "shared_cache": (
+            {"path": str(_shared.path), "hits": _shared.hits, "misses": _shared.misses} if _shared is not None else None
+        ),
+        "prefetch": prefetch_stats() if PREFETCH_TOP_K > 0 else None,
+    }
+
+
+def preload(es_host: str = "localhost", es_port: int = 9200) -> Dict[str, Any]:
+    """Warm-up: load config and sandbox, import requests and open a pooled ES connection.
+
+    Elasticsearch being down is not an error here; the result records whether
+    the connection could be opened.
+    """
+    _get_sandbox()
+    _get_shared_cache()
+    shutil.which("rg")
+    es_ok = False
+    try:
+        es_ok = _es_session().get(f"http://{es_host}:{es_port}/", timeout=2).status_code == 200
+    except Exception:
+        es_ok = False
+    return {**warm_state(), "elasticsearch": es_ok}
+
+
+# ---- Cancellation ----
+
+class CallCancelled(Exception):
+    pass
+
+
+_call_state = threading.local()
+_calls_lock = threading.Lock()
+# call_id -> ripgrep processes started by that call
+_call_procs: Dict[Any, List[subprocess.Popen]] = {}
+_cancelled_calls: set = set()
+
+
+@contextmanager
+def tool_call_scope(call_id: Any):
+    """Associate tool work on this thread with call_id so cancel_call can reach it"""
+    with _calls_lock:
+        if call_id in _cancelled_calls:
+            _cancelled_calls.discard(call_id)
+            raise CallCancelled(f"Call {call_id} cancelled")
+        _call_procs[call_id] = []
+    _call_state.call_id = call_id
+    try:
+        yield
+    finally:
+        _call_state.call_id = None
+        with _calls_lock:
+            _call_procs.pop(call_id, None)
+            _cancelled_calls.discard(call_id)
+
+
+@contextmanager
+def attach_call_scope(call_id: Any):
+    """Run part of an already scoped call on another thread (e.g. a call_tools batch item)"""
+    previous = getattr(_call_state, "call_id", None)
+    _call_state.call_id = call_id
+    try:
+        _check_cancelled()
+        yield
+    finally:
+        _call_state.call_id = previous
+
+
+def cancel_call(call_id: Any, queued: bool = False) -> bool:
+    """Cancel a running or queued call: kill its ripgrep children and flag it.
+
+    Ids of finished or unknown calls are not flagged. queued says the caller
+    knows the call is waiting to start; it must then call release_call once
+    the call is done. Returns True if the call was running.
+    """
+    with _calls_lock:
+        running = call_id in _call_procs
+        if not (running or queued):
+            return False
+        _cancelled_calls.add(call_id)
+        procs = list(_call_procs.get(call_id) or [])
+    for proc in procs:
+        try:
+            proc.kill()
+        except Exception:
+            pass
+    return running
+
+
+def release_call(call_id: Any) -> None:
+    """Drop the cancel flag of a finished call (one cancelled while it was queued)"""
+    with _calls_lock:
+        _cancelled_calls.discard(call_id)
+
+
+def _check_cancelled() -> None:
+    call_id = getattr(_call_state, "call_id", None)
+    if call_id is not None and call_id in _cancelled_calls:
+        raise CallCancelled(f"Call {call_id} cancelled")
+
+
+def _popen_tracked(args: List[str], **kwargs) -> subprocess.Popen:
+    _check_cancelled()
+    proc = subprocess.Popen(args, **kwargs)
+    call_id = getattr(_call_state, "call_id", None)
+    if call_id is not None:
+        with _calls_lock:
+            if call_id in _call_procs:
+                _call_procs[call_id].append(proc)
+    return proc
 
 
 def _rg_json_stream(args: List[str]) -> List[dict]:
-    proc = subprocess.Popen(
+    proc = _popen_tracked(
         args,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        cwd=_sandbox.root,
+        cwd=_get_sandbox().root,
         text=True,
         encoding="utf-8",
     )
@@ -150,6 +384,7 @@ def _rg_json_stream(args: List[str]) -> List[dict]:
         except json.JSONDecodeError:
             continue
     proc.wait()
+    _check_cancelled()
     return results
 
 
@@ -233,7 +468,7 @@ def _parse_boolean_query_to_dnf(query: str) -> tuple[bool, List[List[str]]]:
 def nearest_header(lines: List[str], start_index: int) -> str | None:
     """Walk upward to find the nearest preceding Markdown header."""
     for i in range(start_index, -1, -1):
-        if re.match(r"^\s{0,3}#{1,6}\s+\S", lines[i]):
+        if MARKDOWN_HEADER_RE.match(lines[i]):
             return lines[i].strip()
     return None
 
@@ -300,7 +535,7 @@ def search_rg(
     if file_list:
         for rel in file_list:
             try:
-                abs_p = _sandbox.resolve_inside(rel)
+                abs_p = _get_sandbox().resolve_inside(rel)
                 if abs_p.is_file() and abs_p.suffix.lower() in ALLOWED_EXTENSIONS:
                     # Direct file
                     search_files.append(abs_p)
@@ -311,20 +546,20 @@ def search_rg(
                             search_files.append(p)
                 elif rel == "." or rel == "./":
                     # Explicit request for entire corpus
-                    for p in _sandbox.root.rglob("*"):
+                    for p in _get_sandbox().root.rglob("*"):
                         if p.is_file() and p.suffix.lower() in ALLOWED_EXTENSIONS:
                             search_files.append(p)
                 else:
                     # Handle glob patterns like 'urteile_markdown_by_year/*.md'
                     if "*" in rel or "?" in rel:
-                        for p in _sandbox.root.glob(rel):
+                        for p in _get_sandbox().root.glob(rel):
                             if p.is_file() and p.suffix.lower() in ALLOWED_EXTENSIONS:
                                 search_files.append(p)
             except (PermissionError, OSError):
                 continue
     else:
         # Fallback: search all files in sandbox
-        for p in _sandbox.root.rglob("*"):
+        for p in _get_sandbox().root.rglob("*"):
             if p.is_file() and p.suffix.lower() in ALLOWED_EXTENSIONS:
                 search_files.append(p)
     
@@ -334,14 +569,16 @@ def search_rg(
     args.append(search_pattern)
     args += [str(f) for f in search_files]
     
-    # Run ripgrep
-    proc = subprocess.run(args, capture_output=True, text=True, cwd=_sandbox.root)
+    # Run ripgrep (tracked so cancel_call can kill it)
+    proc = _popen_tracked(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=_get_sandbox().root)
+    rg_stdout, rg_stderr = proc.communicate()
+    _check_cancelled()
     if proc.returncode not in (0, 1):  # 1 means "no matches"
-        return {"error": proc.stderr.strip() or "ripgrep error", "matches": []}
+        return {"error": rg_stderr.strip() or "ripgrep error", "matches": []}
     
     # Parse JSON output
     raw_events = []
-    for line in proc.stdout.splitlines():
+    for line in rg_stdout.splitlines():
         if line.strip():
             try:
                 raw_events.append(json.loads(line))
@@ -384,15 +621,6 @@ def search_rg(
         if not per_file:
             continue
             
-        # Load file for header detection
-        if path not in file_cache:
-            try:
-                abs_path = _sandbox.resolve_inside(path)
-                with abs_path.open("r", encoding="utf-8", errors="ignore") as fh:
-                    file_cache[path] = fh.readlines()
-            except Exception:
-                file_cache[path] = []
-        
         # Process actual matches (not context-only lines)
         match_lines = [ln for ln, rec in per_file.items() if not rec.get("is_context_only")]
         match_lines.sort()
@@ -407,8 +635,14 @@ def search_rg(
                 if j in per_file:
                     txt = per_file[j].get("text", "")
                 else:
-                    # Fallback to file cache
-                    lines = file_cache.get(path, [])
+                    # Fallback to file cache (loaded only when rg left a gap)
+                    if path not in file_cache:
+                        try:
+                            with _get_sandbox().resolve_inside(path).open("r", encoding="utf-8", errors="ignore") as fh:
+                                file_cache[path] = fh.readlines()
+                        except Exception:
+                            file_cache[path] = []
+                    lines = file_cache[path]
                     idx = j - 1
                     if 0 <= idx < len(lines):
                         txt = lines[idx].rstrip("\n")
@@ -416,11 +650,11 @@ def search_rg(
                         continue
                 context_rows.append({"line": j, "text": txt})
             
-            # Find nearest header
-            section = None
-            lines_cache = file_cache.get(path, [])
-            if lines_cache:
-                section = nearest_header(lines_cache, ln - 2)  # 0-based index
+            # Find nearest header above the match (shared header table)
+            try:
+                section = _get_sandbox().section_for_line(_get_sandbox().resolve_inside(path), ln - 1)
+            except Exception:
+                section = None
             
             # Highlight query in main text
             main_text = per_file[ln]["text"]
@@ -435,13 +669,13 @@ def search_rg(
             
             # Convert absolute path to relative
             try:
-                abs_path = _sandbox.resolve_inside(path)
-                rel_path = abs_path.relative_to(_sandbox.root).as_posix()
+                abs_path = _get_sandbox().resolve_inside(path)
+                rel_path = abs_path.relative_to(_get_sandbox().root).as_posix()
             except Exception:
                 rel_path = path
             
             # Calculate byte range for this line
-            line_start_byte = _sandbox.line_start_offset(abs_path, ln)
+            line_start_byte = _get_sandbox().line_start_offset(abs_path, ln)
             line_end_byte = line_start_byte + len(main_text.encode("utf-8"))
             
             matches.append({
@@ -493,8 +727,8 @@ def file_search(
 
     Returns: { "files": [relative_paths...] }
     """
-    considered_glob = glob or _config.glob
-    limit = max_results or _config.max_results
+    considered_glob = glob or _get_config().glob
+    limit = max_results or _get_config().max_results
 
     used_boolean = False
     dnf: List[List[str]] = []
@@ -528,10 +762,12 @@ def file_search(
             else:
                 # Single word or phrase
                 term_sets = [[query]]
-    for file_path in _sandbox.root.rglob("*"):
+    root = _get_sandbox().root
+    for file_path in root.rglob("*"):
+        _check_cancelled()
         if not file_path.is_file() or file_path.suffix.lower() not in ALLOWED_EXTENSIONS:
             continue
-        rel = file_path.relative_to(_sandbox.root).as_posix()
+        rel = file_path.relative_to(root).as_posix()
         if patterns and not any(fnmatch.fnmatchcase(rel, p) for p in patterns):
             continue
         try:
@@ -572,8 +808,298 @@ def read_file_range(path: str, start: int | None = None, end: int | None = None,
     - context_lines: Number of lines to include before and after the target line (default 2)
     - max_lines: Maximum number of lines to return (default 20)
     """
-    abs_path = _sandbox.resolve_inside(path)
-    
+    abs_path = _get_sandbox().resolve_inside(path)
+    with _mapped(abs_path) as file_bytes:
+        return _read_range(path, abs_path, file_bytes, start, end, context, max_lines, line_number, context_lines)
+
+
+def read_file_ranges(ranges: List[Dict[str, Any]], max_lines: int | None = None) -> dict:
+    """Read many line windows at once, merging overlapping windows per file.
+
+    Parameters:
+    - ranges: List of {path, line_number, context_lines?} (context_lines
+      defaults to 2), e.g. the line_matches of elasticsearch_search hits
+    - max_lines: Optional cap on lines per merged snippet (None or 0 = no cap)
+
+    Windows on the same file that overlap or touch are merged into one
+    snippet. Each file is opened once and its snippets are read in file
+    order; files keep the order in which they first appear in ranges.
+
+    Returns: {
+        "snippets": [{path, line_range: [first, last], lines: [requested line numbers], text}],
+        "errors": [{path, error}]
+    }
+    """
+    windows: Dict[str, List[List[int]]] = {}
+    for item in ranges or []:
+        path = item.get("path")
+        if not path or item.get("line_number") is None:
+            continue
+        line_number = max(1, int(item["line_number"]))
+        context_lines = 2 if item.get("context_lines") is None else max(0, int(item["context_lines"]))
+        windows.setdefault(path, []).append([max(1, line_number - context_lines), line_number + context_lines, line_number])
+
+    snippets: List[Dict[str, Any]] = []
+    errors: List[Dict[str, str]] = []
+    for path, spans in windows.items():
+        _check_cancelled()
+        try:
+            abs_path = _get_sandbox().resolve_inside(path)
+            offsets = _get_sandbox()._build_line_offset_cache(abs_path)
+            with _mapped(abs_path) as file_bytes:
+                last_line = len(offsets) - 1
+                merged: List[List[Any]] = []
+                for first, last, requested in sorted(spans):
+                    if merged and first <= merged[-1][1] + 1:
+                        merged[-1][1] = max(merged[-1][1], last)
+                        merged[-1][2].append(requested)
+                    else:
+                        merged.append([first, last, [requested]])
+                for first, last, requested in merged:
+                    if first > last_line:
+                        continue
+                    last = min(last, last_line)
+                    if max_lines and last - first + 1 > max_lines:
+                        last = first + int(max_lines) - 1
+                    start_byte = offsets[first]
+                    end_byte = offsets[last + 1] if last + 1 <= last_line else len(file_bytes)
+                    snippets.append({
+                        "path": Path(path).as_posix(),
+                        "line_range": [first, last],
+                        "lines": sorted({n for n in requested if first <= n <= last}),
+                        "text": file_bytes[start_byte:end_byte].decode("utf-8", errors="replace"),
+                    })
+        except CallCancelled:
+            raise
+        except Exception as e:
+            errors.append({"path": path, "error": str(e)})
+    return {"snippets": snippets, "errors": errors}
+
+
+def read_file_range_group(path: str, calls: List[Dict[str, Any]]) -> List[Any]:
+    """Run several read_file_range calls on one file with one mapping and one offset table.
+
+    Returns one entry per call, in order: the result dict, or the exception
+    that call raised.
+    """
+    results: List[Any] = []
+    try:
+        abs_path = _get_sandbox().resolve_inside(path)
+        with _mapped(abs_path) as file_bytes:
+            for args in calls:
+                _check_cancelled()
+                params = {k: v for k, v in args.items() if k != "path"}
+                try:
+                    results.append(_read_range(path, abs_path, file_bytes, **params))
+                except Exception as e:
+                    results.append(e)
+    except CallCancelled:
+        raise
+    except Exception as e:
+        # Path rejected or file not readable: every call on it fails the same way
+        return [e for _ in calls]
+    return results
+
+
+@contextmanager
+def _mapped(abs_path: Path):
+    """Read-only view of a file: mmap for non-empty files, so a slice only pages in what it touches.
+
+    Files read ahead by the prefetcher are served from memory and only
+    mapped if a slice falls outside the prefetched regions.
+    """
+    prefetched = _prefetched_regions(abs_path)
+    if prefetched is not None:
+        view = _FileView(abs_path, *prefetched)
+        try:
+            yield view
+        finally:
+            view.close()
+        return
+    with abs_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+
+# ---- Speculative prefetch ----
+#
+# After elasticsearch_search the agent nearly always reads the top hits around
+# their match lines next. With MCP_PREFETCH_TOP_K > 0 a background thread
+# builds the line-offset tables of those files and keeps the bytes around
+# their match lines (and passage ranges) in memory, so the following
+# read_file_range / read_file_ranges calls neither rebuild the offsets nor
+# wait for the disk.
+
+_prefetch_pool = None
+_prefetch_lock = threading.Lock()
+# abs_path -> (file version, file size, [(start_byte, data)]), least recently used first
+_prefetched: "OrderedDict[Path, Tuple[str, int, List[Tuple[int, bytes]]]]" = OrderedDict()
+_prefetch_counts = {"scheduled": 0, "files": 0, "hits": 0, "misses": 0, "errors": 0}
+
+
+def prefetch_stats() -> Dict[str, Any]:
+    with _prefetch_lock:
+        return {
+            **_prefetch_counts,
+            "cached_files": len(_prefetched),
+            "cached_bytes": sum(len(data) for _, _, regions in _prefetched.values() for _, data in regions),
+        }
+
+
+def _prefetch_spans(match: Dict[str, Any]) -> List[List[int]]:
+    """Merged [first, last] line spans of a hit the agent is likely to read"""
+    spans = []
+    for line_match in match.get("line_matches") or []:
+        line = line_match.get("match_line")
+        if line:
+            spans.append([max(1, line - PREFETCH_LINES), line + PREFETCH_LINES])
+    for passage in (match.get("metadata") or {}).get("passages") or []:
+        if passage.get("start_line"):
+            first = passage["start_line"]
+            last = min(passage.get("end_line") or first, first + 2 * PREFETCH_LINES)
+            spans.append([max(1, first - PREFETCH_LINES), last + PREFETCH_LINES])
+    if not spans:
+        # Hit without line numbers: the agent starts at the top of the document
+        spans.append([1, 2 * PREFETCH_LINES])
+    merged: List[List[int]] = []
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def schedule_prefetch(result: Any, top_k: int | None = None) -> int:
+    """Read ahead the first top_k hits of a search result in the background; returns the number of files queued"""
+    global _prefetch_pool
+    top_k = PREFETCH_TOP_K if top_k is None else top_k
+    if top_k <= 0 or not isinstance(result, dict):
+        return 0
+    targets = [(m["file_path"], _prefetch_spans(m)) for m in (result.get("matches") or [])[:top_k] if m.get("file_path")]
+    if not targets:
+        return 0
+    with _prefetch_lock:
+        if _prefetch_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mcp-prefetch")
+        _prefetch_counts["scheduled"] += len(targets)
+    for path, spans in targets:
+        _prefetch_pool.submit(_prefetch_file, path, spans)
+    return len(targets)
+
+
+def _prefetch_file(path: str, spans: List[List[int]]) -> None:
+    try:
+        abs_path = _get_sandbox().resolve_inside(path)
+        version = shared_cache.file_version(abs_path)
+        with _prefetch_lock:
+            entry = _prefetched.get(abs_path)
+            regions = list(entry[2]) if entry is not None and entry[0] == version else []
+        offsets = _get_sandbox()._build_line_offset_cache(abs_path)
+        last_line = len(offsets) - 1
+        budget = PREFETCH_MAX_BYTES_PER_FILE - sum(len(data) for _, data in regions)
+        with abs_path.open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            for first, last in spans:
+                if first > last_line or budget <= 0:
+                    break
+                start = offsets[first]
+                end = min(offsets[last + 1] if last + 1 <= last_line else size, start + budget)
+                if end <= start or any(s <= start and end <= s + len(d) for s, d in regions):
+                    continue
+                f.seek(start)
+                data = f.read(end - start)
+                regions.append((start, data))
+                budget -= len(data)
+    except Exception:
+        with _prefetch_lock:
+            _prefetch_counts["errors"] += 1
+        return
+    if not regions:
+        return
+    with _prefetch_lock:
+        _prefetched[abs_path] = (version, size, regions)
+        _prefetched.move_to_end(abs_path)
+        while len(_prefetched) > PREFETCH_MAX_FILES:
+            _prefetched.popitem(last=False)
+        _prefetch_counts["files"] += 1
+
+
+def _prefetched_regions(abs_path: Path) -> Tuple[int, List[Tuple[int, bytes]]] | None:
+    """(file size, regions) read ahead for abs_path, None if absent or the file changed since"""
+    if not _prefetched:
+        return None
+    with _prefetch_lock:
+        entry = _prefetched.get(abs_path)
+    if entry is None:
+        return None
+    try:
+        current = shared_cache.file_version(abs_path)
+    except OSError:
+        current = None
+    with _prefetch_lock:
+        if current != entry[0]:
+            _prefetched.pop(abs_path, None)
+            return None
+        if abs_path in _prefetched:
+            _prefetched.move_to_end(abs_path)
+    return entry[1], entry[2]
+
+
+class _FileView:
+    """Slices of a file served from prefetched regions; the file is mapped only for a slice outside them"""
+
+    def __init__(self, abs_path: Path, size: int, regions: List[Tuple[int, bytes]]):
+        self._abs_path = abs_path
+        self._size = size
+        self._regions = regions
+        self._file = None
+        self._map = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, key: slice) -> bytes:
+        start, stop, _ = key.indices(self._size)
+        stop = max(start, stop)
+        for region_start, data in self._regions:
+            if region_start <= start and stop <= region_start + len(data):
+                with _prefetch_lock:
+                    _prefetch_counts["hits"] += 1
+                return data[start - region_start:stop - region_start]
+        with _prefetch_lock:
+            _prefetch_counts["misses"] += 1
+        if self._map is None:
+            self._file = self._abs_path.open("rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[start:stop]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _read_range(
+    path: str,
+    abs_path: Path,
+    file_bytes: Any,
+    start: int | None = None,
+    end: int | None = None,
+    context: int | None = None,
+    max_lines: int | None = 20,
+    line_number: int | None = None,
+    context_lines: int | None = None,
+) -> dict:
     # Determine which mode we're in
     if line_number is not None:
         # Line-based mode
@@ -585,12 +1111,8 @@ def read_file_range(path: str, start: int | None = None, end: int | None = None,
         end_line = line_number + context_lines
         
         # Convert to byte positions
-        start_byte = _sandbox.line_start_offset(abs_path, start_line)
-        end_byte = _sandbox.line_start_offset(abs_path, end_line + 1)  # +1 to include the end line
-        
-        # Read the file content
-        with abs_path.open("rb") as f:
-            file_bytes = f.read()
+        start_byte = _get_sandbox().line_start_offset(abs_path, start_line)
+        end_byte = _get_sandbox().line_start_offset(abs_path, end_line + 1)  # +1 to include the end line
         
         # Ensure we don't go beyond file boundaries
         start_byte = max(0, min(start_byte, len(file_bytes)))
@@ -619,12 +1141,10 @@ def read_file_range(path: str, start: int | None = None, end: int | None = None,
         if start is None or end is None:
             raise ValueError("Either provide line_number+context_lines OR start+end byte positions")
             
-        context = _config.context_bytes if context is None else int(context)
+        context = _get_config().context_bytes if context is None else int(context)
         start = max(0, int(start) - context)
         end = int(end) + context
         
-        with abs_path.open("rb") as f:
-            file_bytes = f.read()
         start = max(0, min(start, len(file_bytes)))
         end = max(start, min(end, len(file_bytes)))
         text = file_bytes[start:end].decode("utf-8", errors="replace")
@@ -647,17 +1167,196 @@ def read_file_range(path: str, start: int | None = None, end: int | None = None,
 
 def list_paths(subdir: str = ".") -> dict:
     """List files within the sandbox root under a subdirectory."""
-    files = _sandbox.list_paths(subdir)
+    files = _get_sandbox().list_paths(subdir)
     return {"files": files}
 
 
+def _line_matches(
+    content: str,
+    query_terms: List[str],
+    content_start_line: int | None,
+    context_lines: int,
+    scan_lines: int | None = 20,
+    limit: int = 3,
+) -> List[dict]:
+    """Find lines containing any query term and build context windows around them.
+
+    Line numbers are translated to file lines via content_start_line. Only the
+    first scan_lines lines are inspected (None scans everything).
+    """
+    lines = content.split('\n')
+    matching_line_indices = []
+    for i, line in enumerate(lines[:scan_lines] if scan_lines else lines):
+        line_lower = line.lower()
+        if any(term in line_lower for term in query_terms):
+            matching_line_indices.append(i)
+            if len(matching_line_indices) >= limit:  # Limit matches per document
+                break
+
+    line_matches = []
+    for match_idx in matching_line_indices:
+        start_idx = max(0, match_idx - context_lines)
+        end_idx = min(len(lines), match_idx + context_lines + 1)
+
+        context_lines_list = []
+        for ctx_idx in range(start_idx, end_idx):
+            actual_line_num = content_start_line + ctx_idx if content_start_line else ctx_idx + 1
+            context_lines_list.append({
+                "line_number": actual_line_num,
+                "text": lines[ctx_idx].strip()[:200],
+                "is_match": ctx_idx == match_idx
+            })
+
+        line_matches.append({
+            "match_line": content_start_line + match_idx if content_start_line else match_idx + 1,
+            "context": context_lines_list
+        })
+    return line_matches
+
+
+def _multi_match(query: str, fields: List[str]) -> dict:
+    """best_fields multi_match, fuzzy only when Config.es_fuzziness is set"""
+    multi_match = {
+        "query": query,
+        "fields": fields,
+        "type": "best_fields",
+        "operator": "or"
+    }
+    if _get_config().es_fuzziness:
+        multi_match["fuzziness"] = _get_config().es_fuzziness
+    return {"multi_match": multi_match}
+
+
+def _hit_metadata(source: dict) -> dict:
+    metadata = {}
+    for key in ("date", "court", "case_number", "jurabk"):
+        if source.get(key):
+            metadata[key] = source[key]
+    return metadata
+
+
+def _passage_search(
+    es_url: str,
+    query: str,
+    document_type: str,
+    max_results: int,
+    context_lines: int,
+) -> dict:
+    """Search the legal_passages index and group hits by parent document.
+
+    Each returned match represents one parent document (collapsed on
+    parent_id) with up to three of its best-scoring passages; line_matches
+    point at exact file lines taken from the passage line ranges.
+    """
+    multi_match = _multi_match(query, ["parent_title^3", "heading^2", "content^1"])
+    filters = []
+    if document_type == "gesetze":
+        filters.append({"term": {"document_type": "gesetz"}})
+    elif document_type == "urteile":
+        filters.append({"term": {"document_type": "urteil"}})
+
+    passage_source = ["parent_id", "parent_title", "heading", "randnummer", "content", "start_line", "end_line"]
+    search_query = {
+        "query": {"bool": {"must": multi_match, "filter": filters}},
+        "collapse": {
+            "field": "parent_id",
+            "inner_hits": {
+                "name": "passages",
+                "size": 3,
+                "_source": passage_source,
+                "highlight": {
+                    "fields": {"content": {"number_of_fragments": 1, "fragment_size": 200}},
+                    "pre_tags": ["<em>"],
+                    "post_tags": ["</em>"]
+                }
+            }
+        },
+        "size": min(max_results, 50),  # Cap at 50 for performance
+        "_source": ["parent_id", "parent_title", "document_type", "file_path", "date", "court", "case_number", "jurabk"]
+    }
+
+    response = _es_session().post(
+        f"{es_url}/legal_passages/_search",
+        json=search_query,
+        headers={'Content-Type': 'application/json'},
+        timeout=10
+    )
+    if response.status_code != 200:
+        return {
+            "error": f"Elasticsearch error: {response.status_code} - {response.text}",
+            "total_hits": 0,
+            "matches": []
+        }
+
+    result = response.json()
+    hits = result.get('hits', {})
+    query_terms = query.lower().split()
+
+    matches = []
+    for hit in hits.get('hits', []):
+        source = hit['_source']
+        inner = hit.get('inner_hits', {}).get('passages', {}).get('hits', {}).get('hits', []) or [hit]
+
+        line_matches = []
+        passages = []
+        previews = []
+        for passage_hit in inner:
+            passage = passage_hit.get('_source', {})
+            start_line = passage.get('start_line') or 1
+            passage_matches = _line_matches(passage.get('content', ''), query_terms, start_line, context_lines, scan_lines=None, limit=1)
+            if not passage_matches:
+                # Matched via analysis (stemming/fuzziness): point at the passage start
+                passage_matches = _line_matches(passage.get('content', ''), [""], start_line, context_lines, scan_lines=1, limit=1)
+            line_matches.extend(passage_matches)
+            passages.append({
+                "start_line": start_line,
+                "end_line": passage.get('end_line'),
+                "heading": passage.get('heading'),
+                "randnummer": passage.get('randnummer'),
+                "score": passage_hit.get('_score'),
+            })
+            highlight = passage_hit.get('highlight', {}).get('content')
+            if highlight:
+                previews.append(highlight[0])
+
+        content_preview = ' ... '.join(previews[:2])
+        if not content_preview and inner:
+            first = inner[0].get('_source', {}).get('content', '')
+            content_preview = first[:300] + ("..." if len(first) > 300 else "")
+
+        metadata = _hit_metadata(source)
+        metadata['passages'] = passages
+        matches.append({
+            "title": source.get('parent_title') or 'Untitled',
+            "document_type": source.get('document_type', 'unknown'),
+            "file_path": source.get('file_path', ''),
+            "score": hit['_score'],
+            "content_preview": content_preview,
+            "line_matches": line_matches,
+            "metadata": metadata
+        })
+
+    return {
+        "total_hits": hits.get('total', {}).get('value', 0),
+        "matches": matches,
+        "search_info": {
+            "query": query,
+            "document_type": document_type,
+            "indices_searched": "legal_passages",
+            "max_results": max_results,
+            "passages": True
+        }
+    }
+
+
 def elasticsearch_search(
     query: str,
     document_type: str = "all",
     max_results: int = 10,
     context_lines: int = 2,
     es_host: str = "localhost",
-    es_port: int = 9200
+    es_port: int = 9200,
+    passages: bool = False
 ) -> dict:
     """Search legal documents using Elasticsearch for fast, comprehensive results.
 
@@ -674,6 +1373,10 @@ def elasticsearch_search(
     - context_lines: Number of lines before and after each match to include (default 2)
     - es_host: Elasticsearch host (default localhost)
     - es_port: Elasticsearch port (default 9200)
+    - passages: Search the legal_passages index (sections, paragraphs,
+      Randnummern) instead of whole documents and group hits by parent
+      document. Faster and more precise for long laws and decisions; each
+      match lists its best passages with exact line ranges in metadata.
 
     Returns: {
         "total_hits": int,
@@ -695,8 +1398,62 @@ def elasticsearch_search(
     - Legal term searches across the entire corpus
     - Cross-referencing between legislation and jurisprudence
     - Comprehensive legal research
+
+    Successful results are kept in the shared cache for SEARCH_CACHE_TTL
+    seconds, so repeated queries from any server process skip Elasticsearch.
+    With MCP_PREFETCH_TOP_K set, the files of the top hits are read ahead
+    in the background (see schedule_prefetch).
     """
+    shared = _get_shared_cache() if SEARCH_CACHE_TTL > 0 else None
+    if shared is None:
+        result = _elasticsearch_search(query, document_type, max_results, context_lines, es_host, es_port, passages)
+        schedule_prefetch(result)
+        return result
+    key = json.dumps(
+        [query, document_type, max_results, context_lines, es_host, es_port, passages, _get_config().es_fuzziness],
+        ensure_ascii=False,
+    )
+    cached = shared.get_json("search", key, "1", max_age=SEARCH_CACHE_TTL)
+    if cached is not None:
+        schedule_prefetch(cached)
+        return cached
+    result = _elasticsearch_search(query, document_type, max_results, context_lines, es_host, es_port, passages)
+    if "error" not in result:
+        shared.put_json("search", key, "1", result)
+    schedule_prefetch(result)
+    return result
+
+
+def _elasticsearch_search(
+    query: str,
+    document_type: str = "all",
+    max_results: int = 10,
+    context_lines: int = 2,
+    es_host: str = "localhost",
+    es_port: int = 9200,
+    passages: bool = False
+) -> dict:
+    """elasticsearch_search without the shared result cache"""
+    import requests  # cached after the shared session has been created
+
     es_url = f"http://{es_host}:{es_port}"
+
+    if passages:
+        try:
+            return _passage_search(es_url, query, document_type, max_results, context_lines)
+        except requests.exceptions.RequestException as e:
+            return {
+                "error": f"Connection error to Elasticsearch: {str(e)}",
+                "total_hits": 0,
+                "matches": [],
+                "suggestion": "Please ensure Elasticsearch is running on localhost:9200"
+            }
+        except Exception as e:
+            return {
+                "error": f"Search error: {str(e)}",
+                "total_hits": 0,
+                "matches": []
+            }
     
     # Determine which indices to search
     if document_type == "gesetze":
@@ -708,15 +1465,7 @@ def elasticsearch_search(
     
     # Build Elasticsearch query
     search_query = {
-        "query": {
-            "multi_match": {
-                "query": query,
-                "fields": ["title^3", "content^1"],
-                "type": "best_fields",
-                "fuzziness": "AUTO",
-                "operator": "or"
-            }
-        },
+        "query": _multi_match(query, ["title^3", "content^1"]),
         "highlight": {
             "fields": {
                 "title": {"number_of_fragments": 1, "fragment_size": 100},
@@ -730,7 +1479,7 @@ def elasticsearch_search(
     }
     
     try:
-        response = requests.post(
+        response = _es_session().post(
             f"{es_url}/{indices}/_search",
             json=search_query,
             headers={'Content-Type': 'application/json'},
@@ -756,37 +1505,7 @@ def elasticsearch_search(
             line_matches = []
             content = source.get('content', '')
             if content:
-                lines = content.split('\n')
-                query_terms = query.lower().split()
-                content_start_line = source.get('content_start_line', 1)
-                
-                matching_line_indices = []
-                for i, line in enumerate(lines[:20], 0):  # Check first 20 lines for performance
-                    line_lower = line.lower()
-                    if any(term in line_lower for term in query_terms):
-                        matching_line_indices.append(i)
-                        if len(matching_line_indices) >= 3:  # Limit matches per document
-                            break
-                
-                # Build context around each matching line
-                for match_idx in matching_line_indices:
-                    start_idx = max(0, match_idx - context_lines)
-                    end_idx = min(len(lines), match_idx + context_lines + 1)
-                    
-                    context_lines_list = []
-                    for ctx_idx in range(start_idx, end_idx):
-                        actual_line_num = content_start_line + ctx_idx if content_start_line else ctx_idx + 1
-                        is_match_line = (ctx_idx == match_idx)
-                        context_lines_list.append({
-                            "line_number": actual_line_num,
-                            "text": lines[ctx_idx].strip()[:200],
-                            "is_match": is_match_line
-                        })
-                    
-                    line_matches.append({
-                        "match_line": content_start_line + match_idx if content_start_line else match_idx + 1,
-                        "context": context_lines_list
-                    })
+                line_matches = _line_matches(content, query.lower().split(), source.get('content_start_line', 1), context_lines)
             
             # Create content preview from highlights or first part of content
             content_preview = ""
@@ -800,15 +1519,7 @@ def elasticsearch_search(
                 content_preview = content[:300] + ("..." if len(content) > 300 else "")
             
             # Build metadata
-            metadata = {}
-            if source.get('date'):
-                metadata['date'] = source['date']
-            if source.get('court'):
-                metadata['court'] = source['court']  
-            if source.get('case_number'):
-                metadata['case_number'] = source['case_number']
-            if source.get('jurabk'):
-                metadata['jurabk'] = source['jurabk']
+            metadata = _hit_metadata(source)
                 
             matches.append({
                 "title": source.get('title', 'Untitled'),
@@ -9,17 +9,229 @@ using requests library for better compatibility.
 import os
 import re
 import json
+import time
 import requests
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 import argparse
 from datetime import datetime
+import random
+import sys
+import tempfile
+import threading
 import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ---- Precompiled extraction patterns ----
+# Compiled once at import; the parsing hot paths below never pass inline
+# pattern strings to re.* per line or per case.
+
+# "### 1 ZR 23/19 ..." case headers in yearly Urteile files
+CASE_HEADER_RE = re.compile(r'###\s+([^/\n]+/\d+)')
+# "- Urteil | BGH | ..." metadata line of a standard case
+COURT_LINE_RE = re.compile(r'Urteil \| ([^|]+) \|')
+ISO_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+YEAR_RE = re.compile(r'(\d{4})')
+AUSFERTIGUNG_DATE_RE = re.compile(r'Ausfertigungsdatum\s*:?\s*(\d{4}-\d{2}-\d{2})')
+FUNDSTELLE_RE = re.compile(r'Fundstelle\s*:?\s*(.+)')
+# "12. Februar 2018"
+GERMAN_DATE_RE = re.compile(r'(\d{1,2})\.\s*(\w+)\s+(\d{4})')
+MONTH_NUMBERS = {
+    'Januar': '01', 'Februar': '02', 'März': '03', 'April': '04',
+    'Mai': '05', 'Juni': '06', 'Juli': '07', 'August': '08',
+    'September': '09', 'Oktober': '10', 'November': '11', 'Dezember': '12'
+}
+BGH_CASE_NUMBER_RE = re.compile(r'(IX|VIII|VII|VI|V|IV|III|II|I)\s+(ZR|AR|BR)\s+(\d+/\d+)')
+# Summary line of a BGH decision (must be followed by a "Tenor" line)
+BGH_SUMMARY_LINE_RE = re.compile(r'[^.\n]{50,200}(?:Testament|Gebühr|BGH|Revision)[^.\n]*\.?', re.IGNORECASE)
+# Single scanner for all section marker lines of a decision; BGH summaries
+# and section splits are both derived from its matches
+SECTION_MARKER_RE = re.compile(
+    r'^([^\S\n]*)(tenor|von rechts wegen|tatbestand|entscheidungsgründe)[^\S\n]*$',
+    re.MULTILINE | re.IGNORECASE,
+)
+# Section keywords in the order they are tried for splitting decisions
+SECTION_SPLIT_KEYWORDS = ['Tenor', 'Von Rechts wegen', 'Tatbestand', 'Entscheidungsgründe']
+SECTION_KEY_TERMS = ['Testament', 'Gebühr', 'Urteil', 'Beschluss', 'Revision']
+COURT_RES = [
+    re.compile(r'BGH|Bundesgerichtshof', re.IGNORECASE),
+    re.compile(r'OLG\s+\w+|Oberlandesgericht\s+\w+', re.IGNORECASE),
+    re.compile(r'LG\s+\w+|Landgericht\s+\w+', re.IGNORECASE),
+    re.compile(r'AG\s+\w+|Amtsgericht\s+\w+', re.IGNORECASE),
+]
+MARKDOWN_HEADER_RE = re.compile(r'^\s{0,3}#{1,6}\s+(\S.*)$')
+
+
+def german_date_to_iso(match: re.Match) -> Optional[str]:
+    """Convert a GERMAN_DATE_RE match to YYYY-MM-DD (None for unknown months)"""
+    month = MONTH_NUMBERS.get(match.group(2))
+    if month is None:
+        return None
+    return f"{match.group(3)}-{month}-{match.group(1).zfill(2)}"
+
+
+# Bump whenever analysis settings or mappings change; ensure_index_exists
+# recreates indices carrying an older version so the run reindexes them.
+MAPPING_VERSION = 2
+
+# Seconds to wait for index management calls (HEAD/GET/PUT/DELETE of an index)
+ES_ADMIN_TIMEOUT = 30
+
+# Parts of frequent legal compounds (lowercase). The decompounder adds them as
+# extra tokens next to the full word, so "Kündigungsfrist" also matches
+# "Frist" and "Kündigung" without fuzzy expansion at query time.
+LEGAL_COMPOUND_PARTS = [
+    "abmahnung", "anfechtung", "anspruch", "antrag", "arbeit", "auskunft",
+    "bau", "beitrag", "berufung", "beschwerde", "besitz", "betrieb", "bürgschaft",
+    "darlehen", "dienst", "ehe", "eigentum", "einkommen", "erbe", "erbschaft",
+    "ersatz", "frist", "gebühr", "geber", "gehalt", "gericht", "gesellschaft",
+    "gesetz", "gewähr", "grund", "haftung", "handel", "kauf", "kind", "klage",
+    "kosten", "kündigung", "leistung", "lohn", "mangel", "miete", "mieter",
+    "nehmer", "ordnung", "pacht", "pflicht", "pflichtteil", "prozess", "recht",
+    "rente", "revision", "schaden", "schuld", "schutz", "sozial", "steuer",
+    "strafe", "teil", "testament", "unterhalt", "urlaub", "verfahren",
+    "verjährung", "verkehr", "vermieter", "vermögen", "versicherung",
+    "vertrag", "vollmacht", "vollstreckung", "wohnung", "zahlung", "zins",
+]
+
+
+def build_analysis_settings(hyphenation_patterns_path: Optional[str] = None) -> Dict[str, Any]:
+    """German analysis chain for legal text.
+
+    Index time: lowercase -> German stopwords -> compound splitting ->
+    german_normalization (ä/ö/ü/ß folding) -> light_german stemmer.
+    Search time uses the same chain without decompounding so that compound
+    queries stay precise. When hyphenation_patterns_path (relative to the ES
+    config dir, e.g. "analysis/de_DR.xml") is given, a hyphenation decompounder
+    is used, otherwise a dictionary decompounder over LEGAL_COMPOUND_PARTS.
+    """
+    decompounder: Dict[str, Any] = {
+        "type": "dictionary_decompounder",
+        "word_list": LEGAL_COMPOUND_PARTS,
+        "min_subword_size": 3,
+        "only_longest_match": True,
+    }
+    if hyphenation_patterns_path:
+        decompounder["type"] = "hyphenation_decompounder"
+        decompounder["hyphenation_patterns_path"] = hyphenation_patterns_path
+    return {
+        "filter": {
+            "german_stop": {"type": "stop", "stopwords": "_german_"},
+            "german_decompounder": decompounder,
+            "german_light_stemmer": {"type": "stemmer", "language": "light_german"},
+        },
+        "analyzer": {
+            "german": {
+                "type": "custom",
+                "tokenizer": "standard",
+                "filter": ["lowercase", "german_stop", "german_decompounder", "german_normalization", "german_light_stemmer"],
+            },
+            "german_search": {
+                "type": "custom",
+                "tokenizer": "standard",
+                "filter": ["lowercase", "german_stop", "german_normalization", "german_light_stemmer"],
+            },
+        },
+    }
+
+
+GERMAN_TEXT = {"type": "text", "analyzer": "german", "search_analyzer": "german_search"}
+
+# Field mappings for whole documents (legal_gesetze, legal_urteile)
+DOCUMENT_PROPERTIES = {
+    "doc_id": {"type": "keyword"},
+    "title": GERMAN_TEXT,
+    "content": GERMAN_TEXT,
+    "jurabk": {"type": "keyword"},
+    "slug": {"type": "keyword"},
+    "document_type": {"type": "keyword"},
+    "file_path": {"type": "keyword"},
+    "date": {"type": "date", "format": "yyyy-MM-dd||epoch_millis"},
+    "fundstelle": {"type": "text"},
+    "court": {"type": "text"},
+    "case_number": {"type": "keyword"},
+    "year": {"type": "integer"},
+    "content_start_line": {"type": "integer"},
+    "indexed_at": {"type": "date"}
+}
+
+# Field mappings for section/paragraph/Randnummer chunks (legal_passages)
+PASSAGE_PROPERTIES = {
+    "parent_id": {"type": "keyword"},
+    "parent_title": GERMAN_TEXT,
+    "heading": GERMAN_TEXT,
+    "randnummer": {"type": "integer"},
+    "position": {"type": "integer"},
+    "content": GERMAN_TEXT,
+    "jurabk": {"type": "keyword"},
+    "document_type": {"type": "keyword"},
+    "file_path": {"type": "keyword"},
+    "date": {"type": "date", "format": "yyyy-MM-dd||epoch_millis"},
+    "court": {"type": "text"},
+    "case_number": {"type": "keyword"},
+    "year": {"type": "integer"},
+    "start_line": {"type": "integer"},
+    "end_line": {"type": "integer"},
+    "indexed_at": {"type": "date"}
+}
+
+# Passages are cut at headers/Randnummern once they reach PASSAGE_MIN_CHARS,
+# and at the next blank line once they exceed PASSAGE_MAX_CHARS.
+PASSAGE_MIN_CHARS = 300
+PASSAGE_MAX_CHARS = 2000
+PASSAGE_BATCH_SIZE = 500
+
+
+class StageTimings:
+    """Accumulates wall-clock seconds and item counts per indexing stage.
+
+    Stages used by the indexer: parse, passages, serialize, http. Bulk
+    responses also contribute ES-side ingestion time (es_took_ms).
+    """
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.input_bytes = 0
+        self.bulk_requests = 0
+        self.bulk_bytes = 0
+        self.es_took_ms = 0
+
+    @contextmanager
+    def stage(self, name: str, count: int = 1):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+            self.counts[name] += count
+
+    def timed_iter(self, name: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Yield from iterable, charging the time spent producing items to name"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds[name] += time.perf_counter() - started
+                return
+            self.seconds[name] += time.perf_counter() - started
+            self.counts[name] += 1
+            yield item
 
 
 class SimpleLegalDocumentIndexer:
-    def __init__(self, es_host: str = "localhost", es_port: int = 9200):
+    def __init__(self, es_host: str = "localhost", es_port: int = 9200, passage_index: Optional[str] = "legal_passages", hyphenation_patterns_path: Optional[str] = None):
         self.es_url = f"http://{es_host}:{es_port}"
+        # Index receiving passage chunks alongside whole documents (None disables)
+        self.passage_index = passage_index
+        self.hyphenation_patterns_path = hyphenation_patterns_path
+        # Per-stage timings (reported by --benchmark) and per-batch output toggle
+        self.timings = StageTimings()
+        self.verbose = True
         
         # Find the data directory - look in current directory first, then parent
         current_dir = Path(".").resolve()
@@ -39,51 +251,100 @@ class SimpleLegalDocumentIndexer:
             # Fallback to original behavior
             self.data_dir = Path("data")
         
-    def ensure_index_exists(self, index_name: str):
-        """Create index if it doesn't exist with appropriate mapping"""
+    def get_mapping_version(self, index_name: str) -> Optional[int]:
+        """Return the MAPPING_VERSION an existing index was created with (0 if unversioned).
+
+        None means the index does not exist; any other failure raises
+        RuntimeError, so callers never mistake an unreachable index for an
+        outdated one.
+        """
+        response = requests.get(f"{self.es_url}/{index_name}/_mapping", timeout=ES_ADMIN_TIMEOUT)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"Cannot read mapping of {index_name}: {response.status_code} - {response.text}")
+        for index_mapping in response.json().values():
+            meta = index_mapping.get("mappings", {}).get("_meta", {})
+            return int(meta.get("mapping_version", 0))
+        raise RuntimeError(f"Cannot read mapping of {index_name}: empty response")
+
+    def ensure_index_exists(self, index_name: str, properties: Optional[Dict[str, Any]] = None, allow_recreate: bool = True):
+        """Create index if it doesn't exist with appropriate mapping
+
+        An existing index whose mapping version is lower than MAPPING_VERSION
+        is deleted and recreated, so the current indexing run reindexes it with
+        the new analysis chain (with allow_recreate=False it raises instead).
+        Any Elasticsearch error while checking raises RuntimeError too, so a
+        live index is never dropped by accident.
+        """
         # Check if index exists
-        response = requests.head(f"{self.es_url}/{index_name}")
+        response = requests.head(f"{self.es_url}/{index_name}", timeout=ES_ADMIN_TIMEOUT)
         
-        if response.status_code == 404:
-            # Index doesn't exist, create it
-            mapping = {
-                "settings": {
-                    "number_of_shards": 1,
-                    "number_of_replicas": 0,
-                    "analysis": {
-                        "analyzer": {
-                            "german": {
-                                "type": "standard",
-                                "stopwords": "_german_"
-                            }
-                        }
-                    }
-                },
-                "mappings": {
-                    "properties": {
-                        "title": {"type": "text", "analyzer": "german"},
-                        "content": {"type": "text", "analyzer": "german"},
-                        "jurabk": {"type": "keyword"},
-                        "slug": {"type": "keyword"},
-                        "document_type": {"type": "keyword"},
-                        "file_path": {"type": "keyword"},
-                        "date": {"type": "date", "format": "yyyy-MM-dd||epoch_millis"},
-                        "fundstelle": {"type": "text"},
-                        "court": {"type": "text"},
-                        "case_number": {"type": "keyword"},
-                        "year": {"type": "integer"},
-                        "indexed_at": {"type": "date"}
-                    }
-                }
+        if response.status_code == 200:
+            current_version = self.get_mapping_version(index_name)
+            if current_version is None:
+                raise RuntimeError(f"Index {index_name} disappeared while checking its mapping")
+            if current_version >= MAPPING_VERSION:
+                print(f"Index {index_name} already exists")
+                return
+            if not allow_recreate:
+                raise RuntimeError(
+                    f"Index {index_name} has mapping version {current_version}, expected {MAPPING_VERSION}; "
+                    f"recreating it needs a full reindex (run without --gesetze-only/--urteile-only)"
+                )
+            print(f"Index {index_name} has mapping version {current_version}, expected {MAPPING_VERSION} - recreating for reindex")
+            response = requests.delete(f"{self.es_url}/{index_name}", timeout=ES_ADMIN_TIMEOUT)
+            if response.status_code != 200:
+                raise RuntimeError(f"Error deleting index {index_name}: {response.status_code} - {response.text}")
+        elif response.status_code != 404:
+            raise RuntimeError(f"Cannot check index {index_name}: HTTP {response.status_code}")
+
+        # Index doesn't exist, create it
+        mapping = {
+            "settings": {
+                "number_of_shards": 1,
+                "number_of_replicas": 0,
+                "analysis": build_analysis_settings(self.hyphenation_patterns_path)
+            },
+            "mappings": {
+                "_meta": {"mapping_version": MAPPING_VERSION},
+                "properties": properties or DOCUMENT_PROPERTIES
             }
-            
-            response = requests.put(f"{self.es_url}/{index_name}", json=mapping)
-            if response.status_code == 200:
-                print(f"Created index: {index_name}")
-            else:
-                print(f"Error creating index: {response.status_code} - {response.text}")
+        }
+        
+        response = requests.put(f"{self.es_url}/{index_name}", json=mapping, timeout=ES_ADMIN_TIMEOUT)
+        if response.status_code == 200:
+            print(f"Created index: {index_name}")
         else:
-            print(f"Index {index_name} already exists")
+            raise RuntimeError(f"Error creating index {index_name}: {response.status_code} - {response.text}")
+
+    def ensure_passage_index(self, full_reindex: bool):
+        """Ensure the passage index once per run.
+
+        It holds passages of Gesetze and Urteile, so it is only recreated for a
+        new mapping version when this run reindexes both.
+        """
+        if self.passage_index:
+            self.ensure_index_exists(self.passage_index, PASSAGE_PROPERTIES, allow_recreate=full_reindex)
+
+    def document_id(self, doc: Dict[str, Any]) -> str:
+        """Stable _id of a whole document, so re-runs overwrite instead of duplicating it.
+
+        Derived from the file (relative to the data directory), the case
+        number and the first content line; a year file holds many cases.
+        """
+        file_path = doc.get("file_path") or ""
+        try:
+            file_path = Path(file_path).resolve().relative_to(Path(self.data_dir).resolve()).as_posix()
+        except ValueError:
+            pass
+        key = f"{file_path}|{doc.get('case_number') or ''}|{doc.get('content_start_line') or ''}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+    @staticmethod
+    def passage_id(passage: Dict[str, Any]) -> str:
+        """Stable _id of a passage: its parent's doc_id and its position in the parent"""
+        return f"{passage['parent_id']}-{passage['position']}"
 
     def parse_frontmatter(self, content: str) -> tuple[Dict[str, Any], str]:
         """Parse YAML frontmatter from markdown content"""
@@ -126,15 +387,6 @@ class SimpleLegalDocumentIndexer:
                 return line.strip()[2:].strip()
         return None
 
-    def extract_date_from_content(self, content: str) -> Optional[str]:
-        """Extract date from content"""
-        # Look for date patterns like "Ausfertigungsdatum: 2002-02-15"
-        date_pattern = r'Ausfertigungsdatum\s*:?\s*(\d{4}-\d{2}-\d{2})'
-        match = re.search(date_pattern, content)
-        if match:
-            return match.group(1)
-        return None
-
     def process_gesetz_document(self, file_path: Path) -> Dict[str, Any]:
         """Process a Gesetz (law) document"""
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -149,6 +401,10 @@ class SimpleLegalDocumentIndexer:
         
         # Extract date
         date_str = self.extract_date_from_content(main_content)
+
+        # File line on which the (frontmatter-stripped) content begins
+        content_pos = content.find(main_content) if main_content else 0
+        content_start_line = content[:max(content_pos, 0)].count('\n') + 1
         
         doc = {
             "title": title or str(file_path.parent.name).upper(),
@@ -158,11 +414,12 @@ class SimpleLegalDocumentIndexer:
             "jurabk": frontmatter.get('jurabk', ''),
             "slug": frontmatter.get('slug', ''),
             "date": date_str,
+            "content_start_line": content_start_line,
             "indexed_at": datetime.now().isoformat()
         }
         
         # Extract Fundstelle
-        fundstelle_match = re.search(r'Fundstelle\s*:?\s*(.+)', main_content)
+        fundstelle_match = FUNDSTELLE_RE.search(main_content)
         if fundstelle_match:
             doc["fundstelle"] = fundstelle_match.group(1).strip()
         
@@ -170,202 +427,224 @@ class SimpleLegalDocumentIndexer:
 
     def process_urteil_document(self, file_path: Path) -> List[Dict[str, Any]]:
         """Process a Urteil (court decision) document which may contain multiple cases"""
+        return list(self.iter_urteil_documents(file_path))
+
+    def iter_urteil_documents(self, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """Stream case documents from a Urteil file in a single pass.
+
+        Walks the file line by line and yields each case as soon as the next
+        case header (or EOF) is reached, so memory stays proportional to a
+        single decision instead of the whole year file. content_start_line is
+        the exact 1-based file line on which the yielded content begins.
+        """
         with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+            line_num = 0
+            frontmatter: Dict[str, Any] = {}
+            preamble: List[str] = []
+            preamble_start = 1
 
-        frontmatter, main_content = self.parse_json_frontmatter(content)
-        
-        year = frontmatter.get('year')
-        if not year:
-            # Extract year from filename
-            year_match = re.search(r'(\d{4})', file_path.stem)
-            if year_match:
-                year = int(year_match.group(1))
-        
-        documents = []
-        
-        # Method 1: Split by standard case numbers (### pattern)
-        # Track line numbers by splitting content into lines first
-        all_lines = content.split('\n')
-        
-        # Find case boundaries and their line numbers
-        case_starts = []
-        for line_num, line in enumerate(all_lines):
-            if re.match(r'###\s+([^/\n]+/\d+)', line):
-                case_match = re.search(r'###\s+([^/\n]+/\d+)', line)
-                if case_match:
-                    case_starts.append({
-                        'line_num': line_num + 1,  # 1-indexed
-                        'case_number': case_match.group(1).strip()
-                    })
-        
-        standard_cases = re.split(r'\n###\s+([^/\n]+/\d+)', main_content)
-        
-        if len(standard_cases) > 1:
-            # Process standard format cases
-            for i in range(1, len(standard_cases), 2):
-                if i + 1 < len(standard_cases):
-                    case_number = standard_cases[i].strip()
-                    case_content = standard_cases[i + 1].strip()
-                    
-                    # Find the starting line number for this case
-                    content_start_line = None
-                    for case_start in case_starts:
-                        if case_start['case_number'] == case_number:
-                            content_start_line = case_start['line_num']
-                            break
-                    
-                    # Further split this content to handle BGH cases within
-                    bgf_docs = self.extract_bgf_cases_from_content(case_content, str(file_path), year)
-                    if bgf_docs:
-                        documents.extend(bgf_docs)
-                    else:
-                        # Standard case processing
-                        first_line = case_content.split('\n')[0] if case_content else ""
-                        court_match = re.search(r'Urteil \| ([^|]+) \|', first_line)
-                        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', first_line)
-                        
-                        doc = {
-                            "title": f"Urteil {case_number}",
-                            "content": case_content,
-                            "document_type": "urteil",
-                            "file_path": str(file_path),
-                            "case_number": case_number,
-                            "court": court_match.group(1).strip() if court_match else "",
-                            "date": date_match.group(1) if date_match else None,
-                            "year": year,
-                            "content_start_line": content_start_line,
-                            "indexed_at": datetime.now().isoformat()
-                        }
-                        documents.append(doc)
-        else:
-            # Method 2: Look for BGH cases and other patterns in the whole content
-            bgf_docs = self.extract_bgf_cases_from_content(main_content, str(file_path), year)
-            if bgf_docs:
-                documents.extend(bgf_docs)
-            else:
-                # Single document fallback (for per-decision Markdown files)
-                title_fallback = self.extract_title_from_content(main_content) or file_path.stem
-                doc = {
-                    "title": title_fallback,
-                    "content": main_content,
-                    "document_type": "urteil",
-                    "file_path": str(file_path),
-                    "year": year,
-                    "content_start_line": 1,  # Starts at line 1 for whole file
-                    "indexed_at": datetime.now().isoformat()
-                }
-                documents.append(doc)
-        
-        return documents
-    
-    def extract_bgf_cases_from_content(self, content: str, file_path: str, year: int) -> List[Dict[str, Any]]:
-        """Extract BGH and other special case formats from content"""
+            # JSON frontmatter between two '---' lines at the top of the file
+            first_line = f.readline()
+            line_num = 1
+            if first_line.startswith('---'):
+                frontmatter_lines = [first_line]
+                for raw in f:
+                    line_num += 1
+                    frontmatter_lines.append(raw)
+                    if raw.startswith('---'):
+                        break
+                try:
+                    frontmatter = json.loads(''.join(frontmatter_lines[1:-1]))
+                    preamble_start = line_num + 1
+                except json.JSONDecodeError:
+                    preamble = frontmatter_lines
+            elif first_line:
+                preamble.append(first_line)
+
+            year = frontmatter.get('year')
+            if not year:
+                # Extract year from filename
+                year_match = YEAR_RE.search(file_path.stem)
+                if year_match:
+                    year = int(year_match.group(1))
+
+            # Method 1: Split by standard case numbers (### pattern)
+            case_number: Optional[str] = None
+            case_lines: List[str] = []
+            case_header_line = 0
+            for raw in f:
+                line_num += 1
+                header_match = CASE_HEADER_RE.match(raw) if raw.startswith('###') else None
+                if header_match:
+                    if case_number is not None:
+                        yield from self._build_case_documents(case_number, ''.join(case_lines), case_header_line, str(file_path), year)
+                    # Text after the case number stays part of the case content
+                    case_number = header_match.group(1).strip()
+                    case_lines = [raw[header_match.end():]]
+                    case_header_line = line_num
+                    preamble = []
+                elif case_number is not None:
+                    case_lines.append(raw)
+                else:
+                    preamble.append(raw)
+
+            if case_number is not None:
+                yield from self._build_case_documents(case_number, ''.join(case_lines), case_header_line, str(file_path), year)
+                return
+
+        # Method 2: no case headers, look for BGH cases and other patterns in the whole content
+        raw_content = ''.join(preamble)
+        main_content = raw_content.strip()
+        main_start_line = preamble_start + self._leading_line_count(raw_content)
+        bgf_docs = self.extract_bgf_cases_from_content(main_content, str(file_path), year, main_start_line)
+        if bgf_docs:
+            yield from bgf_docs
+            return
+
+        # Single document fallback (for per-decision Markdown files)
+        title_fallback = self.extract_title_from_content(main_content) or file_path.stem
+        yield {
+            "title": title_fallback,
+            "content": main_content,
+            "document_type": "urteil",
+            "file_path": str(file_path),
+            "year": year,
+            "content_start_line": main_start_line,
+            "indexed_at": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _leading_line_count(text: str) -> int:
+        """Number of line breaks that strip() removes from the start of text"""
+        return text[:len(text) - len(text.lstrip())].count('\n')
+
+    def _build_case_documents(self, case_number: str, raw_content: str, header_line: int, file_path: str, year: Optional[int]) -> List[Dict[str, Any]]:
+        """Turn the raw text of one ### case into index documents"""
+        case_content = raw_content.strip()
+        content_start_line = header_line + self._leading_line_count(raw_content)
+
+        # Further split this content to handle BGH cases within
+        bgf_docs = self.extract_bgf_cases_from_content(case_content, file_path, year, content_start_line)
+        if bgf_docs:
+            return bgf_docs
+
+        # Standard case processing
+        first_line = case_content.split('\n', 1)[0] if case_content else ""
+        court_match = COURT_LINE_RE.search(first_line)
+        date_match = ISO_DATE_RE.search(first_line)
+
+        return [{
+            "title": f"Urteil {case_number}",
+            "content": case_content,
+            "document_type": "urteil",
+            "file_path": file_path,
+            "case_number": case_number,
+            "court": court_match.group(1).strip() if court_match else "",
+            "date": date_match.group(1) if date_match else None,
+            "year": year,
+            "content_start_line": content_start_line,
+            "indexed_at": datetime.now().isoformat()
+        }]
+
+    def extract_bgf_cases_from_content(self, content: str, file_path: str, year: int, first_line: int = 1) -> List[Dict[str, Any]]:
+        """Extract BGH and other special case formats from content
+
+        first_line is the file line on which content begins, so that the
+        content_start_line of extracted cases refers to the original file.
+        A single SECTION_MARKER_RE scan finds every marker line; BGH summary
+        detection and section splitting both work from those matches.
+        """
         documents = []
-        
-        # Split content into lines to track line numbers
-        all_lines = content.split('\n')
+        markers = list(SECTION_MARKER_RE.finditer(content))
+        if not markers:
+            return documents
         
         # Pattern 1: BGH cases with summary lines like "Der auftragsgemäße Entwurf..."
-        # Look for lines that are summaries followed by "Tenor"
-        summary_pattern = r'^([^.\n]{50,200}(?:Testament|Gebühr|BGH|Revision)[^.\n]*\.?)$\s*^\s*Tenor\s*$'
-        summary_matches = list(re.finditer(summary_pattern, content, re.MULTILINE | re.IGNORECASE))
-        
-        if summary_matches:
-            for i, match in enumerate(summary_matches):
-                summary_text = match.group(1).strip()
-                start_pos = match.start()
-                
-                # Find the end of this case (next summary or end of content)
-                if i + 1 < len(summary_matches):
-                    end_pos = summary_matches[i + 1].start()
-                else:
-                    end_pos = len(content)
-                
-                case_content = content[start_pos:end_pos].strip()
-                
-                # Calculate the starting line number in the original file
-                content_before_match = content[:start_pos]
-                start_line = content_before_match.count('\n') + 1
-                
-                # Extract case number from content if available
-                case_number_match = re.search(r'(IX|VIII|VII|VI|V|IV|III|II|I)\s+(ZR|AR|BR)\s+(\d+/\d+)', case_content)
-                case_number = case_number_match.group(0) if case_number_match else f"BGH-{i+1}"
-                
-                # Extract court info
-                court = "BGH" if "BGH" in case_content or "Bundesgerichtshof" in case_content else "Unbekanntes Gericht"
-                
-                # Extract date
-                date_match = re.search(r'(\d{1,2})\.\s*(\w+)\s+(\d{4})', case_content)
-                date_str = None
-                if date_match:
-                    try:
-                        month_names = {
-                            'Januar': '01', 'Februar': '02', 'März': '03', 'April': '04',
-                            'Mai': '05', 'Juni': '06', 'Juli': '07', 'August': '08',
-                            'September': '09', 'Oktober': '10', 'November': '11', 'Dezember': '12'
-                        }
-                        day = date_match.group(1).zfill(2)
-                        month_name = date_match.group(2)
-                        year_str = date_match.group(3)
-                        if month_name in month_names:
-                            date_str = f"{year_str}-{month_names[month_name]}-{day}"
-                    except:
-                        pass
-                
-                doc = {
-                    "title": summary_text[:100] + "..." if len(summary_text) > 100 else summary_text,
-                    "content": case_content,
-                    "document_type": "urteil",
-                    "file_path": file_path,
-                    "case_number": case_number,
-                    "court": court,
-                    "date": date_str,
-                    "year": year,
-                    "content_start_line": start_line,  # Store original line offset
-                    "indexed_at": datetime.now().isoformat()
-                }
-                documents.append(doc)
+        # A summary is the last non-blank line before a "Tenor" line
+        summary_spans = []
+        for marker in markers:
+            if marker.group(2).lower() != 'tenor':
+                continue
+            end = marker.start()
+            while end > 0 and content[end - 1].isspace():
+                end -= 1
+            if end == 0:
+                continue
+            start = content.rfind('\n', 0, end) + 1
+            line_end = content.find('\n', end)
+            if BGH_SUMMARY_LINE_RE.fullmatch(content, start, line_end):
+                summary_spans.append((start, content[start:line_end].strip()))
+        
+        for i, (start_pos, summary_text) in enumerate(summary_spans):
+            # Find the end of this case (next summary or end of content)
+            end_pos = summary_spans[i + 1][0] if i + 1 < len(summary_spans) else len(content)
+            case_content = content[start_pos:end_pos].strip()
+            
+            # Calculate the starting line number in the original file
+            start_line = first_line + content.count('\n', 0, start_pos)
+            
+            # Extract case number from content if available
+            case_number_match = BGH_CASE_NUMBER_RE.search(case_content)
+            case_number = case_number_match.group(0) if case_number_match else f"BGH-{i+1}"
+            
+            # Extract court info
+            court = "BGH" if "BGH" in case_content or "Bundesgerichtshof" in case_content else "Unbekanntes Gericht"
+            
+            # Extract date
+            date_match = GERMAN_DATE_RE.search(case_content)
+            date_str = german_date_to_iso(date_match) if date_match else None
+            
+            doc = {
+                "title": summary_text[:100] + "..." if len(summary_text) > 100 else summary_text,
+                "content": case_content,
+                "document_type": "urteil",
+                "file_path": file_path,
+                "case_number": case_number,
+                "court": court,
+                "date": date_str,
+                "year": year,
+                "content_start_line": start_line,  # Store original line offset
+                "indexed_at": datetime.now().isoformat()
+            }
+            documents.append(doc)
         
         # Pattern 2: Look for other case patterns (e.g., Roman numeral decisions)
         if not documents:
-            # Split by major sections that might indicate separate cases
-            section_patterns = [
-                r'\n(?=Tenor\s*\n)',  # Split at "Tenor"
-                r'\n(?=Von Rechts wegen\s*\n)',  # Split at "Von Rechts wegen"  
-                r'\n(?=Tatbestand\s*\n)',  # Split at "Tatbestand"
-                r'\n(?=Entscheidungsgründe\s*\n)'  # Split at "Entscheidungsgründe"
-            ]
+            # Split before unindented, exactly spelled section lines that are
+            # followed by a newline (same split points as re.split(r'\n(?=Tenor\s*\n)'))
+            split_points: Dict[str, List[int]] = defaultdict(list)
+            for marker in markers:
+                if marker.start() > 0 and not marker.group(1) and marker.end() < len(content):
+                    split_points[marker.group(2)].append(marker.start())
             
-            for pattern in section_patterns:
-                sections = re.split(pattern, content)
-                if len(sections) > 2:  # Found meaningful splits
-                    for j, section in enumerate(sections):
-                        if len(section.strip()) > 500:  # Only process substantial content
-                            # Look for key legal terms to determine if this is worth indexing
-                            key_terms = ['Testament', 'Gebühr', 'Urteil', 'Beschluss', 'Revision']
-                            if any(term in section for term in key_terms):
-                                title = self.extract_case_title_from_content(section)
-                                
-                                # Calculate approximate line offset for this section
-                                section_start_pos = content.find(section)
-                                content_before_section = content[:section_start_pos] if section_start_pos >= 0 else ""
-                                section_start_line = content_before_section.count('\n') + 1
-                                
-                                doc = {
-                                    "title": title or f"Rechtsentscheidung {j+1}",
-                                    "content": section.strip(),
-                                    "document_type": "urteil",
-                                    "file_path": file_path,
-                                    "case_number": f"Section-{j+1}",
-                                    "court": self.extract_court_from_content(section),
-                                    "date": self.extract_date_from_content(section),
-                                    "year": year,
-                                    "content_start_line": section_start_line,
-                                    "indexed_at": datetime.now().isoformat()
-                                }
-                                documents.append(doc)
-                    break  # Use first successful pattern
+            for keyword in SECTION_SPLIT_KEYWORDS:
+                points = split_points.get(keyword, [])
+                if len(points) < 2:  # Need at least three sections
+                    continue
+                starts = [0] + points
+                ends = [p - 1 for p in points] + [len(content)]
+                for j, (section_start_pos, section_end_pos) in enumerate(zip(starts, ends)):
+                    section = content[section_start_pos:section_end_pos]
+                    if len(section.strip()) > 500:  # Only process substantial content
+                        # Look for key legal terms to determine if this is worth indexing
+                        if any(term in section for term in SECTION_KEY_TERMS):
+                            title = self.extract_case_title_from_content(section)
+                            section_start_line = first_line + content.count('\n', 0, section_start_pos)
+                            
+                            doc = {
+                                "title": title or f"Rechtsentscheidung {j+1}",
+                                "content": section.strip(),
+                                "document_type": "urteil",
+                                "file_path": file_path,
+                                "case_number": f"Section-{j+1}",
+                                "court": self.extract_court_from_content(section),
+                                "date": self.extract_date_from_content(section),
+                                "year": year,
+                                "content_start_line": section_start_line,
+                                "indexed_at": datetime.now().isoformat()
+                            }
+                            documents.append(doc)
+                break  # Use first successful pattern
         
         return documents
     
@@ -386,84 +665,163 @@ class SimpleLegalDocumentIndexer:
     
     def extract_court_from_content(self, content: str) -> str:
         """Extract court name from content"""
-        court_patterns = [
-            r'BGH|Bundesgerichtshof',
-            r'OLG\s+\w+|Oberlandesgericht\s+\w+', 
-            r'LG\s+\w+|Landgericht\s+\w+',
-            r'AG\s+\w+|Amtsgericht\s+\w+'
-        ]
-        
-        for pattern in court_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for pattern in COURT_RES:
+            match = pattern.search(content)
             if match:
                 return match.group(0)
         
         return "Unbekanntes Gericht"
     
     def extract_date_from_content(self, content: str) -> Optional[str]:
-        """Extract date from content - reuse existing method"""
+        """Extract date from content"""
         # Look for date patterns like "Ausfertigungsdatum: 2002-02-15"
-        date_pattern = r'Ausfertigungsdatum\s*:?\s*(\d{4}-\d{2}-\d{2})'
-        match = re.search(date_pattern, content)
+        match = AUSFERTIGUNG_DATE_RE.search(content)
         if match:
             return match.group(1)
         
         # Look for German date format "12. Februar 2018"
-        german_date_match = re.search(r'(\d{1,2})\.\s*(\w+)\s+(\d{4})', content)
+        german_date_match = GERMAN_DATE_RE.search(content)
         if german_date_match:
-            try:
-                month_names = {
-                    'Januar': '01', 'Februar': '02', 'März': '03', 'April': '04',
-                    'Mai': '05', 'Juni': '06', 'Juli': '07', 'August': '08',
-                    'September': '09', 'Oktober': '10', 'November': '11', 'Dezember': '12'
-                }
-                day = german_date_match.group(1).zfill(2)
-                month_name = german_date_match.group(2)
-                year_str = german_date_match.group(3)
-                if month_name in month_names:
-                    return f"{year_str}-{month_names[month_name]}-{day}"
-            except:
-                pass
+            return german_date_to_iso(german_date_match)
         
         return None
 
+    def iter_passages(self, doc: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Split a document into section/paragraph/Randnummer-sized passages.
+
+        Passages break at Markdown headers and at standalone Randnummer lines
+        once they hold PASSAGE_MIN_CHARS, and at the next blank line once they
+        exceed PASSAGE_MAX_CHARS. Each passage references its parent via
+        parent_id (the parent's doc_id) and carries exact file line ranges.
+        """
+        content = doc.get("content") or ""
+        first_line = doc.get("content_start_line") or 1
+        parent_id = doc["doc_id"]
+
+        heading: Optional[str] = None
+        randnummer: Optional[int] = None
+        chunk: List[str] = []
+        chunk_start = first_line
+        chunk_heading: Optional[str] = None
+        chunk_randnummer: Optional[int] = None
+        chunk_size = 0
+        position = 0
+
+        def make_passage() -> Optional[Dict[str, Any]]:
+            # Trim blank lines on both ends so start/end_line point at text
+            lo, hi = 0, len(chunk)
+            while lo < hi and not chunk[lo].strip():
+                lo += 1
+            while hi > lo and not chunk[hi - 1].strip():
+                hi -= 1
+            if lo == hi:
+                return None
+            return {
+                "parent_id": parent_id,
+                "parent_title": doc.get("title"),
+                "heading": chunk_heading,
+                "randnummer": chunk_randnummer,
+                "position": position,
+                "content": '\n'.join(chunk[lo:hi]),
+                "jurabk": doc.get("jurabk"),
+                "document_type": doc.get("document_type"),
+                "file_path": doc.get("file_path"),
+                "date": doc.get("date"),
+                "court": doc.get("court"),
+                "case_number": doc.get("case_number"),
+                "year": doc.get("year"),
+                "start_line": chunk_start + lo,
+                "end_line": chunk_start + hi - 1,
+                "indexed_at": doc.get("indexed_at") or datetime.now().isoformat(),
+            }
+
+        for offset, line in enumerate(content.split('\n')):
+            stripped = line.strip()
+            header_match = MARKDOWN_HEADER_RE.match(line) if stripped.startswith('#') else None
+            is_randnummer = len(stripped) <= 4 and stripped.isdecimal()
+            boundary = bool(header_match or is_randnummer)
+            if chunk and ((boundary and chunk_size >= PASSAGE_MIN_CHARS)
+                          or (chunk_size >= PASSAGE_MAX_CHARS and not stripped)
+                          or chunk_size >= 2 * PASSAGE_MAX_CHARS):
+                passage = make_passage()
+                if passage:
+                    yield passage
+                    position += 1
+                chunk = []
+                chunk_size = 0
+
+            if header_match:
+                heading = header_match.group(1).strip()
+                randnummer = None
+            elif is_randnummer:
+                randnummer = int(stripped)
+
+            if not chunk:
+                chunk_start = first_line + offset
+                chunk_heading = heading
+                chunk_randnummer = randnummer
+            chunk.append(line)
+            chunk_size += len(line) + 1
+
+        if chunk:
+            passage = make_passage()
+            if passage:
+                yield passage
+
     def bulk_index_documents(self, documents: List[Dict[str, Any]], index_name: str):
         """Bulk index documents to Elasticsearch using requests"""
         if not documents:
             return
             
         # Prepare bulk request body
-        bulk_body = []
-        for doc in documents:
-            # Index action
-            bulk_body.append(json.dumps({"index": {"_index": index_name, "_id": str(uuid.uuid4())}}))
-            # Document
-            bulk_body.append(json.dumps(doc))
-        
-        bulk_data = '\n'.join(bulk_body) + '\n'
+        with self.timings.stage("serialize", len(documents)):
+            bulk_body = []
+            for doc in documents:
+                # Index action
+                if doc.get("doc_id"):
+                    doc_id = doc["doc_id"]
+                elif doc.get("parent_id"):
+                    doc_id = self.passage_id(doc)
+                else:
+                    doc_id = str(uuid.uuid4())
+                bulk_body.append(json.dumps({"index": {"_index": index_name, "_id": doc_id}}))
+                # Document
+                bulk_body.append(json.dumps(doc))
+            
+            bulk_data = ('\n'.join(bulk_body) + '\n').encode('utf-8')
         
         # Debug: Print request size
-        request_size_mb = len(bulk_data.encode('utf-8')) / (1024 * 1024)
-        print(f"Bulk request size: {request_size_mb:.2f} MB ({len(documents)} docs)")
+        request_size_mb = len(bulk_data) / (1024 * 1024)
+        if self.verbose:
+            print(f"Bulk request size: {request_size_mb:.2f} MB ({len(documents)} docs)")
+        self.timings.bulk_requests += 1
+        self.timings.bulk_bytes += len(bulk_data)
         
-        response = requests.post(
-            f"{self.es_url}/_bulk",
-            data=bulk_data,
-            headers={'Content-Type': 'application/json'}
-        )
+        with self.timings.stage("http", len(documents)):
+            response = requests.post(
+                f"{self.es_url}/_bulk",
+                data=bulk_data,
+                headers={'Content-Type': 'application/json'}
+            )
+            result = response.json() if response.status_code == 200 else None
         
-        if response.status_code == 200:
-            result = response.json()
+        if result is not None:
+            self.timings.es_took_ms += result.get('took', 0)
             if 'errors' in result and result['errors']:
                 print(f"Some errors occurred during bulk indexing")
                 for item in result['items']:
                     if 'index' in item and 'error' in item['index']:
                         print(f"Error: {item['index']['error']}")
-            else:
+            elif self.verbose:
                 print(f"Successfully indexed {len(documents)} documents to {index_name}")
         else:
             print(f"Error bulk indexing: {response.status_code} - {response.text}")
 
+    def index_passages(self, passages: List[Dict[str, Any]]):
+        """Bulk index passage chunks in PASSAGE_BATCH_SIZE slices"""
+        for i in range(0, len(passages), PASSAGE_BATCH_SIZE):
+            self.bulk_index_documents(passages[i:i + PASSAGE_BATCH_SIZE], self.passage_index)
+
     def index_gesetze(self, index_name: str = "legal_gesetze"):
         """Index all Gesetze documents"""
         self.ensure_index_exists(index_name)
@@ -476,6 +834,7 @@ class SimpleLegalDocumentIndexer:
             return
         
         documents = []
+        passages = []
         processed_count = 0
         
         print(f"Processing Gesetze from {gesetze_dir}...")
@@ -486,14 +845,23 @@ class SimpleLegalDocumentIndexer:
                 if file == "index.md":
                     file_path = Path(root) / file
                     try:
-                        doc = self.process_gesetz_document(file_path)
+                        with self.timings.stage("parse"):
+                            doc = self.process_gesetz_document(file_path)
+                        self.timings.input_bytes += file_path.stat().st_size
+                        doc["doc_id"] = self.document_id(doc)
                         documents.append(doc)
+                        if self.passage_index:
+                            with self.timings.stage("passages"):
+                                passages.extend(self.iter_passages(doc))
                         processed_count += 1
                         
                         # Index in batches
                         if len(documents) >= 50:
                             self.bulk_index_documents(documents, index_name)
                             documents = []
+                        if len(passages) >= PASSAGE_BATCH_SIZE:
+                            self.index_passages(passages)
+                            passages = []
                         
                         if processed_count % 100 == 0:
                             print(f"Processed {processed_count} Gesetze documents...")
@@ -504,6 +872,8 @@ class SimpleLegalDocumentIndexer:
         # Index remaining documents
         if documents:
             self.bulk_index_documents(documents, index_name)
+        if passages:
+            self.index_passages(passages)
         
         print(f"Finished processing {processed_count} Gesetze documents")
 
@@ -518,8 +888,8 @@ class SimpleLegalDocumentIndexer:
             print(f"   Looking for directory: {urteile_dir.absolute()}")
             return
         
-        all_documents = []
         processed_files = 0
+        batch_size = 50
         
         print(f"Processing Urteile from {urteile_dir}...")
         
@@ -532,26 +902,39 @@ class SimpleLegalDocumentIndexer:
                     continue
                 file_path = Path(root) / fn
                 try:
-                    documents = self.process_urteil_document(file_path)
-                    processed_files += 1
-                    # Index documents in small batches to avoid large requests
-                    batch_size = 50
-                    for i in range(0, len(documents), batch_size):
-                        batch = documents[i:i+batch_size]
+                    # Stream cases and index them in small batches to avoid large requests
+                    batch = []
+                    passages = []
+                    extracted = 0
+                    self.timings.input_bytes += file_path.stat().st_size
+                    for doc in self.timings.timed_iter("parse", self.iter_urteil_documents(file_path)):
+                        doc["doc_id"] = self.document_id(doc)
+                        batch.append(doc)
+                        if self.passage_index:
+                            with self.timings.stage("passages"):
+                                passages.extend(self.iter_passages(doc))
+                        extracted += 1
+                        if len(batch) >= batch_size:
+                            self.bulk_index_documents(batch, index_name)
+                            batch = []
+                        if len(passages) >= PASSAGE_BATCH_SIZE:
+                            self.index_passages(passages)
+                            passages = []
+                    if batch:
                         self.bulk_index_documents(batch, index_name)
-                    print(f"Processed {file_path} - extracted {len(documents)} cases")
+                    if passages:
+                        self.index_passages(passages)
+                    processed_files += 1
+                    print(f"Processed {file_path} - extracted {extracted} cases")
                 except Exception as e:
                     print(f"Error processing {file_path}: {e}")
         
-        # Index remaining documents
-        if all_documents:
-            self.bulk_index_documents(all_documents, index_name)
-        
         print(f"Finished processing {processed_files} Urteile files")
 
     def index_all(self):
         """Index all documents"""
         print("Starting full indexing of legal documents...")
+        self.ensure_passage_index(full_reindex=True)
         print("\n" + "="*50)
         print("STEP 1: Indexing Gesetze (Laws and Regulations)")
         print("="*50)
@@ -575,6 +958,8 @@ class SimpleLegalDocumentIndexer:
         print("="*50)
         self.get_index_stats('legal_gesetze')
         self.get_index_stats('legal_urteile')
+        if self.passage_index:
+            self.get_index_stats(self.passage_index)
 
     def get_index_stats(self, index_name: str):
         """Get statistics about an index"""
@@ -674,6 +1059,288 @@ class SimpleLegalDocumentIndexer:
             print(f"Search error: {response.status_code} - {response.text}")
             return None
 
+# ---- Benchmark harness (--benchmark) ----
+
+class _RecordingBulkHandler(BaseHTTPRequestHandler):
+    """Minimal Elasticsearch stand-in: accepts index management and _bulk calls.
+
+    Bulk bodies are counted but not parsed, so the fake server adds as little
+    CPU as possible to the measured process.
+    """
+    indices: set = set()
+    received_bytes = 0
+    received_docs = 0
+
+    def _reply(self, status: int, payload: Optional[Dict[str, Any]] = None):
+        body = json.dumps(payload or {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def do_HEAD(self):
+        self._reply(200 if self.path.strip('/') in self.indices else 404)
+
+    def do_PUT(self):
+        self._read_body()
+        self.indices.add(self.path.strip('/'))
+        self._reply(200, {"acknowledged": True})
+
+    def do_DELETE(self):
+        self.indices.discard(self.path.strip('/'))
+        self._reply(200, {"acknowledged": True})
+
+    def do_GET(self):
+        index_name = self.path.strip('/').split('/')[0]
+        if self.path.endswith('/_mapping'):
+            self._reply(200, {index_name: {"mappings": {"_meta": {"mapping_version": MAPPING_VERSION}}}})
+        else:
+            self._reply(404)
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path.startswith('/_bulk'):
+            type(self).received_bytes += len(body)
+            type(self).received_docs += body.count(b'\n') // 2
+            self._reply(200, {"took": 0, "errors": False, "items": []})
+        else:
+            self._reply(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_recording_bulk_server() -> tuple[ThreadingHTTPServer, str]:
+    """Start the fake _bulk endpoint on a free localhost port; returns (server, url)"""
+    handler = type("RecordingBulkHandler", (_RecordingBulkHandler,), {"indices": set()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def generate_synthetic_corpus(root: Path, laws: int = 20, years: int = 2, cases_per_year: int = 500, seed: int = 0):
+    """Write a deterministic corpus shaped like data/ (gesetze + yearly Urteile)"""
+    rng = random.Random(seed)
+    words = ("Der Kläger verlangt vom Beklagten Zahlung aus dem Mietvertrag nach fristloser Kündigung "
+             "wegen Zahlungsverzugs Revision Testament Gebühr Anspruch Schadensersatz Verjährung "
+             "Vermieter Mieter Wohnung Vertrag Frist Urteil Beschluss Landgericht Oberlandesgericht").split()
+
+    def sentence(n: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(n)) + "."
+
+    for i in range(laws):
+        law_dir = root / "gesetze" / "x" / f"law{i}"
+        law_dir.mkdir(parents=True, exist_ok=True)
+        parts = [f"---\nTitle: Synthetisches Gesetz {i}\njurabk: SG{i}\nslug: law{i}\n---\n\n",
+                 f"# Synthetisches Gesetz {i} (SG{i})\n\nAusfertigungsdatum: 2002-02-15\n\nFundstelle: BGBl. I S. {i}\n\n"]
+        for para in range(1, 200):
+            parts.append(f"## § {para} {rng.choice(words)}\n\n")
+            for absatz in range(1, 4):
+                parts.append(f"({absatz}) {sentence(30)}\n\n")
+        (law_dir / "index.md").write_text("".join(parts), encoding="utf-8")
+
+    urteile_dir = root / "urteile_markdown_by_year"
+    urteile_dir.mkdir(parents=True, exist_ok=True)
+    for y in range(years):
+        year = 2000 + y
+        parts = ["---\n", json.dumps({"year": year, "count": cases_per_year}, indent=2), "\n---\n\n",
+                 f"# Entscheidungen {year}\n\n"]
+        for c in range(cases_per_year):
+            parts.append(f"### {c + 1} ZR {c}/{year % 100:02d}\n")
+            parts.append(f"- Urteil | BGH | {c + 1} ZR {c}/{year % 100:02d} | {year}-03-{(c % 28) + 1:02d}\n")
+            parts.append(f"\n#### Tenor\n\n{sentence(40)}\n\n#### Entscheidungstext\n\n")
+            for rn in range(1, 12):
+                parts.append(f"{rn}\n\n{sentence(80)}\n\n")
+        (urteile_dir / f"{year}.md").write_text("".join(parts), encoding="utf-8")
+
+
+def generate_bgh_decisions(root: Path, files: int = 50, seed: int = 0):
+    """Write headerless BGH-style decisions that exercise extract_bgf_cases_from_content"""
+    rng = random.Random(seed)
+    words = "Der auftragsgemäße Entwurf eines Testaments löst die volle Gebühr aus Revision Notar Beteiligte".split()
+    target = root / "urteile_markdown_by_year" / "bgh"
+    target.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        parts = []
+        for case in range(3):
+            summary = " ".join(rng.choice(words) for _ in range(12)) + " BGH Revision"
+            parts.append(f"{summary}\nTenor\n\nDie Revision wird zurückgewiesen.\n\n")
+            parts.append(f"BGH, Beschluss vom {case + 1}. März 2018 - IX ZR {case}/17\n\n")
+            for _ in range(20):
+                parts.append(" ".join(rng.choice(words) for _ in range(60)) + ".\n\n")
+            parts.append("Tatbestand\n\n" + " ".join(rng.choice(words) for _ in range(200)) + "\n\n")
+        (target / f"bgh_{i}.md").write_text("".join(parts), encoding="utf-8")
+
+
+def run_parse_benchmark(args: argparse.Namespace, repeats: int = 3) -> Dict[str, Any]:
+    """Micro-benchmark of the extraction layer: best-of-N parse cost per MB, no HTTP"""
+    with tempfile.TemporaryDirectory(prefix="legalgenius-parse-bench-") as tmp:
+        corpus = Path(tmp)
+        generate_synthetic_corpus(corpus, laws=args.benchmark_laws, cases_per_year=args.benchmark_cases)
+        generate_bgh_decisions(corpus)
+        indexer = SimpleLegalDocumentIndexer(args.host, args.port)
+        groups = {
+            "gesetze": (sorted((corpus / "gesetze").rglob("index.md")), indexer.process_gesetz_document),
+            "urteile": (sorted((corpus / "urteile_markdown_by_year").glob("*.md")), indexer.process_urteil_document),
+            "bgh": (sorted((corpus / "urteile_markdown_by_year" / "bgh").glob("*.md")), indexer.process_urteil_document),
+        }
+        report: Dict[str, Any] = {}
+        for name, (files, parse) in groups.items():
+            size_mb = sum(p.stat().st_size for p in files) / (1024 * 1024)
+            best = None
+            for _ in range(repeats):
+                started = time.perf_counter()
+                for path in files:
+                    parse(path)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            report[name] = {"mb": round(size_mb, 2), "ms_per_mb": round(best * 1000 / size_mb, 1) if size_mb else None}
+    return report
+
+
+def sample_corpus(source: Path, root: Path, files: int, seed: int = 0):
+    """Link a random sample of real corpus files into root, keeping the data/ layout"""
+    rng = random.Random(seed)
+    for subdir, pattern in (("gesetze", "index.md"), ("urteile_markdown_by_year", "*.md")):
+        candidates = [p for p in (source / subdir).rglob(pattern) if p.name != "index.md" or subdir == "gesetze"]
+        for path in rng.sample(candidates, min(files, len(candidates))):
+            target = root / path.relative_to(source)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.symlink_to(path.resolve())
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Benchmark runs write to these prefixed indices, never to the live ones, and
+# delete them afterwards
+BENCHMARK_INDEX_PREFIX = "bench_"
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Index a synthetic or sampled corpus and report per-stage throughput"""
+    with tempfile.TemporaryDirectory(prefix="legalgenius-bench-") as tmp:
+        corpus = Path(tmp)
+        if args.benchmark_sample:
+            source = SimpleLegalDocumentIndexer(args.host, args.port).data_dir
+            sample_corpus(source, corpus, args.benchmark_sample)
+        else:
+            generate_synthetic_corpus(corpus, laws=args.benchmark_laws, cases_per_year=args.benchmark_cases)
+
+        server = None
+        indexer = SimpleLegalDocumentIndexer(
+            args.host,
+            args.port,
+            passage_index=None if args.no_passages else BENCHMARK_INDEX_PREFIX + args.passage_index,
+        )
+        index_names = [BENCHMARK_INDEX_PREFIX + "legal_gesetze", BENCHMARK_INDEX_PREFIX + "legal_urteile"]
+        if args.benchmark_es_url:
+            indexer.es_url = args.benchmark_es_url.rstrip('/')
+        else:
+            server, indexer.es_url = start_recording_bulk_server()
+        indexer.data_dir = corpus
+        indexer.verbose = False
+
+        profiler = None
+        if args.profile == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif args.profile == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument is not installed; pip install pyinstrument or use --profile cprofile")
+                raise SystemExit(2)
+            profiler = Profiler()
+            profiler.start()
+
+        started = time.perf_counter()
+        try:
+            indexer.ensure_passage_index(full_reindex=not (args.gesetze_only or args.urteile_only))
+            if not args.urteile_only:
+                indexer.index_gesetze(index_names[0])
+            if not args.gesetze_only:
+                indexer.index_urteile(index_names[1])
+        finally:
+            elapsed = time.perf_counter() - started
+            if server is not None:
+                server.shutdown()
+            else:
+                for index_name in index_names + [indexer.passage_index]:
+                    if index_name:
+                        try:
+                            requests.delete(f"{indexer.es_url}/{index_name}", timeout=ES_ADMIN_TIMEOUT)
+                        except requests.RequestException as e:
+                            print(f"Could not delete benchmark index {index_name}: {e}")
+
+        if args.profile == "cprofile":
+            import pstats
+            profiler.disable()
+            out = args.profile_out or "logs/indexer_benchmark.prof"
+            Path(out).parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(out)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+            print(f"cProfile stats written to {out}")
+        elif args.profile == "pyinstrument":
+            profiler.stop()
+            out = args.profile_out or "logs/indexer_benchmark.html"
+            Path(out).parent.mkdir(parents=True, exist_ok=True)
+            Path(out).write_text(profiler.output_html(), encoding="utf-8")
+            print(profiler.output_text(unicode=True))
+            print(f"pyinstrument report written to {out}")
+
+    timings = indexer.timings
+    input_mb = timings.input_bytes / (1024 * 1024)
+    documents = timings.counts["parse"]
+    report = {
+        "elapsed_s": round(elapsed, 3),
+        "input_mb": round(input_mb, 2),
+        "documents": documents,
+        "passages": timings.counts["serialize"] - documents if indexer.passage_index else 0,
+        "docs_per_s": round(documents / elapsed, 1) if elapsed else None,
+        "parse_s_per_mb": round(timings.seconds["parse"] / input_mb, 4) if input_mb else None,
+        "stages_s": {name: round(sec, 3) for name, sec in sorted(timings.seconds.items())},
+        "bulk_requests": timings.bulk_requests,
+        "bulk_mb": round(timings.bulk_bytes / (1024 * 1024), 2),
+        "es_took_s": round(timings.es_took_ms / 1000, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "es_url": args.benchmark_es_url or "recording fake _bulk endpoint",
+    }
+    return report
+
+
+def print_benchmark_report(report: Dict[str, Any]):
+    print("\n" + "=" * 50)
+    print("INDEXER BENCHMARK")
+    print("=" * 50)
+    print(f"Target:          {report['es_url']}")
+    print(f"Input:           {report['input_mb']:.2f} MB, {report['documents']} documents, {report['passages']} passages")
+    print(f"Elapsed:         {report['elapsed_s']:.3f} s ({report['docs_per_s']} docs/s)")
+    if report['parse_s_per_mb'] is not None:
+        print(f"Parse cost:      {report['parse_s_per_mb'] * 1000:.1f} ms/MB")
+    print(f"Bulk:            {report['bulk_requests']} requests, {report['bulk_mb']:.2f} MB, ES took {report['es_took_s']:.3f} s")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS:        {report['peak_rss_mb']:.1f} MB")
+    print("Stages:")
+    for name, seconds in report['stages_s'].items():
+        share = seconds / report['elapsed_s'] * 100 if report['elapsed_s'] else 0
+        print(f"  {name:<12} {seconds:8.3f} s  {share:5.1f}%")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Index legal documents into Elasticsearch')
@@ -684,11 +1351,44 @@ def main():
     parser.add_argument('--stats', action='store_true', help='Show index statistics')
     parser.add_argument('--search', nargs='+', help='Search for keywords')
     parser.add_argument('--index', default='legal_gesetze,legal_urteile', help='Index to search in (can be comma-separated)')
+    parser.add_argument('--passage-index', default='legal_passages', help='Index for section/paragraph/Randnummer passages')
+    parser.add_argument('--no-passages', action='store_true', help='Do not emit the passage index alongside whole documents')
+    parser.add_argument('--hyphenation-patterns', default=None, help='Hyphenation patterns file on the ES node (e.g. analysis/de_DR.xml) for compound splitting')
+    parser.add_argument('--check-mapping', action='store_true', help='Report mapping versions of the indices without changing them')
     parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    parser.add_argument('--benchmark', action='store_true', help='Index a synthetic or sampled corpus and report per-stage timings')
+    parser.add_argument('--benchmark-parse', action='store_true', help='Micro-benchmark the extraction layer only (parse cost per MB, no HTTP)')
+    parser.add_argument('--benchmark-sample', type=int, default=0, help='Benchmark on N randomly sampled files per document type from the data directory instead of a synthetic corpus')
+    parser.add_argument('--benchmark-laws', type=int, default=20, help='Synthetic corpus: number of Gesetze (default 20)')
+    parser.add_argument('--benchmark-cases', type=int, default=500, help='Synthetic corpus: decisions per year file (default 500)')
+    parser.add_argument('--benchmark-es-url', default=None, help='Benchmark against this Elasticsearch instead of the recording fake _bulk endpoint')
+    parser.add_argument('--benchmark-json', default=None, help='Also write the benchmark report as JSON to this path')
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], default=None, help='Profile the benchmark run')
+    parser.add_argument('--profile-out', default=None, help='Profile output path (default logs/indexer_benchmark.prof/.html)')
     
     args = parser.parse_args()
+
+    if args.benchmark_parse:
+        report = run_parse_benchmark(args)
+        for name, row in report.items():
+            print(f"{name:<8} {row['mb']:7.2f} MB  {row['ms_per_mb']:8.1f} ms/MB")
+        if args.benchmark_json:
+            Path(args.benchmark_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        return
+
+    if args.benchmark:
+        report = run_benchmark(args)
+        print_benchmark_report(report)
+        if args.benchmark_json:
+            Path(args.benchmark_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        return
     
-    indexer = SimpleLegalDocumentIndexer(args.host, args.port)
+    indexer = SimpleLegalDocumentIndexer(
+        args.host,
+        args.port,
+        passage_index=None if args.no_passages else args.passage_index,
+        hyphenation_patterns_path=args.hyphenation_patterns,
+    )
     
     if args.debug:
         print(f"🔍 DEBUG: Current working directory: {os.getcwd()}")
@@ -737,15 +1437,38 @@ def main():
                         print(f"{field}: {highlights[0]}")
                 
                 print("-" * 50)
+    elif args.check_mapping:
+        for index_name in ['legal_gesetze', 'legal_urteile', indexer.passage_index]:
+            if not index_name:
+                continue
+            try:
+                version = indexer.get_mapping_version(index_name)
+            except (RuntimeError, requests.RequestException) as e:
+                print(f"Index {index_name}: {e}")
+                continue
+            if version is None:
+                print(f"Index {index_name}: missing")
+            else:
+                state = "up to date" if version >= MAPPING_VERSION else "needs reindex"
+                print(f"Index {index_name}: mapping version {version} (current {MAPPING_VERSION}, {state})")
     elif args.stats:
         indexer.get_index_stats('legal_gesetze')
         indexer.get_index_stats('legal_urteile')
-    elif args.gesetze_only:
-        indexer.index_gesetze()
-    elif args.urteile_only:
-        indexer.index_urteile()
+        if indexer.passage_index:
+            indexer.get_index_stats(indexer.passage_index)
     else:
-        indexer.index_all()
+        try:
+            if args.gesetze_only:
+                indexer.ensure_passage_index(full_reindex=False)
+                indexer.index_gesetze()
+            elif args.urteile_only:
+                indexer.ensure_passage_index(full_reindex=False)
+                indexer.index_urteile()
+            else:
+                indexer.index_all()
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -104,6 +104,20 @@ export default function App() {
             console.log("Received event:", t, evt); // Debug logging
             if (t === "final_answer") {
               setAnswer(evt.message || "");
+            } else if (t === "content_delta") {
+              // Show the answer while it is generated; replaced by final_answer
+              setAnswer((prev) => (prev ?? "") + (evt.delta || ""));
+            } else if (t === "step") {
+              // Text streamed in a step that ended with tool calls is not the answer
+              setAnswer(null);
+            } else if (t === "reasoning_delta") {
+              setSteps((prev) => {
+                const last = prev[prev.length - 1];
+                if (last && last.type === "reasoning" && last.step === evt.step) {
+                  return [...prev.slice(0, -1), { ...last, content: (last.content || "") + (evt.delta || "") }];
+                }
+                return [...prev, { type: "reasoning", step: evt.step, content: evt.delta || "", timestamp: evt.timestamp }];
+              });
             } else if (t === "error") {
               setError(evt.message || "Unbekannter Fehler");
             }
@@ -1,8 +1,10 @@
 export const API_BASE = (typeof window !== 'undefined' && (window as any).ENV?.REACT_APP_API_BASE) || 'http://127.0.0.1:8000';
 
 export interface StreamEvent {
-  type: 'thinking' | 'step' | 'tool_thinking' | 'tool_event' | 'token_usage' | 'final_answer' | 'error' | 'complete';
+  type: 'thinking' | 'step' | 'tool_thinking' | 'tool_event' | 'token_usage' | 'reasoning' | 'content_delta' | 'reasoning_delta' | 'final_answer' | 'error' | 'complete';
   message?: string;
+  delta?: string; // content_delta / reasoning_delta: next chunk of the LLM output
+  content?: string;
   tool?: string;
   args?: Record<string, any>;
   tokens_sent?: number;
@@ -0,0 +1,289 @@
+"""
+Question -> final answer cache in front of the agent.
+
+Many users ask nearly the same question ("Kündigungsfrist Mietwohnung?"),
+and every one of them would otherwise run the full multi-step agent. Answers
+are stored in a SQLite file. The cache is off unless enabled with
+ANSWER_CACHE=on (logs/answer_cache.sqlite) or ANSWER_CACHE=<path>.
+Every entry belongs to a scope (the API uses one per user unless
+ANSWER_CACHE_SCOPE=global) and only matches within it, under:
+
+- the normalized question (case, Unicode form, punctuation and whitespace
+  folded), which is matched exactly, and
+- optionally an embedding of the question from a local CPU model
+  (ANSWER_CACHE_EMBED_MODEL, needs sentence-transformers). Questions whose
+  cosine similarity to a stored question reaches ANSWER_CACHE_SIMILARITY
+  reuse its answer.
+
+Entries expire after ANSWER_CACHE_TTL seconds and only match while the
+Elasticsearch index generation they were answered against is current, so
+a reindex invalidates them. The generation is derived from the legal_*
+indices (uuid and document count) or pinned with LEGAL_INDEX_GENERATION,
+and re-read at most every GENERATION_CHECK_INTERVAL seconds. If it cannot be
+determined, the cache is bypassed.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+DEFAULT_PATH = Path("logs") / "answer_cache.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_SIMILARITY = 0.93
+# Stored questions compared by embedding per lookup (most recent first)
+MAX_SIMILARITY_CANDIDATES = 5000
+GENERATION_CHECK_INTERVAL = 60.0
+
+_PUNCT_RE = re.compile(r"[^\w§]+")
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, Unicode form, punctuation and whitespace ("Was gilt für § 573 BGB?" -> "was gilt für § 573 bgb")"""
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    return " ".join(_PUNCT_RE.sub(" ", text).split())
+
+
+def query_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def es_index_generation(es_url: str = "http://localhost:9200", pattern: str = "legal_*") -> Optional[str]:
+    """Fingerprint of the search indices; changes whenever documents are (re)indexed"""
+    try:
+        response = requests.get(
+            f"{es_url}/_cat/indices/{pattern}",
+            params={"format": "json", "h": "index,uuid,docs.count"},
+            timeout=2,
+        )
+        if response.status_code != 200:
+            return None
+        rows = sorted(f"{r.get('index')}:{r.get('uuid')}:{r.get('docs.count')}" for r in response.json())
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+    if not rows:
+        return None
+    return hashlib.sha1("|".join(rows).encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Exact and (optionally) embedding-similarity lookup of earlier final answers"""
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = DEFAULT_TTL,
+        embed_model: Optional[str] = None,
+        similarity: float = DEFAULT_SIMILARITY,
+        es_url: str = "http://localhost:9200",
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.embed_model = embed_model
+        self.similarity = similarity
+        self.es_url = es_url
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._local = threading.local()
+        self._embedder: Any = None
+        self._embedder_lock = threading.Lock()
+        self._generation: Optional[str] = None
+        self._generation_checked: Optional[float] = None
+        self._generation_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(answers)")]
+        if columns and "scope" not in columns:
+            # Written before entries were scoped: they cannot be attributed, drop them
+            conn.execute("DROP TABLE answers")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " scope TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " generation TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " session_id TEXT,"
+            " embedding BLOB,"
+            " created REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (scope, key, model))"
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerCache"]:
+        setting = os.environ.get("ANSWER_CACHE", "")
+        if setting.lower() in ("", "off", "0", "false", "no"):
+            return None
+        try:
+            return cls(
+                DEFAULT_PATH if setting.lower() in ("on", "1", "true", "yes") else Path(setting),
+                ttl=float(os.environ.get("ANSWER_CACHE_TTL", str(DEFAULT_TTL))),
+                embed_model=os.environ.get("ANSWER_CACHE_EMBED_MODEL") or None,
+                similarity=float(os.environ.get("ANSWER_CACHE_SIMILARITY", str(DEFAULT_SIMILARITY))),
+                es_url=os.environ.get("ELASTICSEARCH_URL", "http://localhost:9200"),
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"[answer-cache] disabled: {e}", file=sys.stderr)
+            return None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self) -> Optional[str]:
+        pinned = os.environ.get("LEGAL_INDEX_GENERATION")
+        if pinned:
+            return pinned
+        now = time.monotonic()
+        if self._generation_checked is not None and now - self._generation_checked <= GENERATION_CHECK_INTERVAL:
+            return self._generation
+        # One request probes Elasticsearch, concurrent ones use the last known value;
+        # a failed probe (None) is kept for the interval too, so lookups do not wait on it each time
+        if not self._generation_lock.acquire(blocking=False):
+            return self._generation
+        try:
+            self._generation = es_index_generation(self.es_url)
+            self._generation_checked = time.monotonic()
+        finally:
+            self._generation_lock.release()
+        return self._generation
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Normalized embedding of text, or None without a configured/installed model"""
+        if not self.embed_model:
+            return None
+        with self._embedder_lock:
+            if self._embedder is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError:  # optional dependency
+                    print("[answer-cache] sentence-transformers not installed; exact matching only", file=sys.stderr)
+                    self.embed_model = None
+                    return None
+                self._embedder = SentenceTransformer(self.embed_model, device="cpu")
+            vector = self._embedder.encode([text], normalize_embeddings=True)[0]
+        return [float(v) for v in vector]
+
+    def lookup(self, query: str, model: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """Cached entry {answer, query, session_id, created, similarity} for query within scope, or None"""
+        generation = self.generation()
+        if generation is None:
+            return None
+        normalized = normalize_query(query)
+        oldest = time.time() - self.ttl
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT key, query, answer, session_id, created FROM answers"
+                " WHERE scope = ? AND key = ? AND model = ? AND generation = ? AND created >= ?",
+                (scope, query_key(normalized), model or "", generation, oldest),
+            ).fetchone()
+            similarity = 1.0
+            if row is None:
+                row, similarity = self._lookup_similar(conn, normalized, model, generation, oldest, scope)
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE answers SET hits = hits + 1 WHERE scope = ? AND key = ? AND model = ?", (scope, row[0], model or "")
+            )
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if similarity < 1.0:
+            self.similar_hits += 1
+        return {"query": row[1], "answer": row[2], "session_id": row[3], "created": row[4], "similarity": similarity}
+
+    def _lookup_similar(self, conn: sqlite3.Connection, normalized: str, model: str, generation: str, oldest: float, scope: str):
+        vector = self._embed(normalized)
+        if vector is None:
+            return None, 0.0
+        rows = conn.execute(
+            "SELECT key, query, answer, session_id, created, embedding FROM answers"
+            " WHERE scope = ? AND model = ? AND generation = ? AND created >= ? AND embedding IS NOT NULL"
+            " ORDER BY created DESC LIMIT ?",
+            (scope, model or "", generation, oldest, MAX_SIMILARITY_CANDIDATES),
+        ).fetchall()
+        best, best_score = None, 0.0
+        for row in rows:
+            stored = array("f")
+            stored.frombytes(row[5])
+            # Both vectors are normalized: the dot product is the cosine similarity
+            score = sum(a * b for a, b in zip(vector, stored))
+            if score > best_score:
+                best, best_score = row, score
+        if best is None or best_score < self.similarity:
+            return None, 0.0
+        return best[:5], best_score
+
+    def store(self, query: str, model: str, answer: str, session_id: Optional[str] = None, scope: str = "") -> None:
+        generation = self.generation()
+        if generation is None or not answer:
+            return
+        normalized = normalize_query(query)
+        vector = self._embed(normalized)
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO answers (scope, key, model, generation, query, answer, session_id, embedding, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    scope,
+                    query_key(normalized),
+                    model or "",
+                    generation,
+                    query,
+                    answer,
+                    session_id,
+                    sqlite3.Binary(array("f", vector).tobytes()) if vector is not None else None,
+                    time.time(),
+                ),
+            )
+        except sqlite3.Error:
+            return
+        self.stores += 1
+
+    def prune(self) -> int:
+        """Drop expired entries and entries of older index generations"""
+        generation = self.generation()
+        conn = self._conn()
+        cur = conn.execute(
+            "DELETE FROM answers WHERE created < ? OR (? IS NOT NULL AND generation != ?)",
+            (time.time() - self.ttl, generation, generation),
+        )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries = self._conn().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "generation": self._generation or os.environ.get("LEGAL_INDEX_GENERATION"),
+            "embed_model": self.embed_model,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
@@ -1,9 +1,11 @@
 import os
 import json
 import time
+import threading
 from pathlib import Path
 from uuid import uuid4
-from typing import Optional, Dict, Any, Generator, List
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Generator, Iterator, List
 
 from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,7 +14,12 @@ from pydantic import BaseModel
 from openai import OpenAI
 
 # Reuse existing agent implementation
-from client.agent_cli import MCPClient, run_agent, load_config, _build_tools_spec, SYSTEM_PROMPT, build_dispatch_functions
+from client.budget import StepBudget
+from client.compaction import ContextCompactor
+from client.agent_cli import MCPClient, run_agent, load_config, TOOLS_SPEC, system_message, cached_prompt_tokens, build_dispatch_functions, ToolCallMemo, iter_tool_results, iter_chat_completion, DEFAULT_TOOL_CONCURRENCY, LLM_STREAM
+from .mcp_pool import MCPWorkerPool, MCPPoolExhausted
+from .llm_pool import LLMClientPool
+from .answer_cache import AnswerCache
 from .models import init_db, get_db, get_or_create_user, deduct_tokens, set_credits, UserCredit
 from sqlalchemy.orm import Session
 from jose import jwt
@@ -43,6 +50,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class _PerThreadStdout:
+    """sys.stdout stand-in: a thread inside capture() writes to its own buffer, all others to the real stream"""
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer if buffer is not None else self._stream).write(text)
+
+    def flush(self) -> None:
+        if getattr(self._local, "buffer", None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    @contextmanager
+    def capture(self) -> Iterator[StringIO]:
+        buffer = StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+
+# Installed once: swapping sys.stdout per request would mix the output of concurrent requests
+_STDOUT = sys.stdout if isinstance(sys.stdout, _PerThreadStdout) else _PerThreadStdout(sys.stdout)
+sys.stdout = _STDOUT
+
 # Load config and ensure env vars
 CFG = load_config()
 os.environ.setdefault("LEGAL_DOC_ROOT", CFG.get("legal_doc_root", "./data/"))
@@ -50,7 +89,19 @@ os.environ.setdefault("LEGAL_DOC_ROOT", CFG.get("legal_doc_root", "./data/"))
 os.environ.setdefault("PYTHONPATH", str(Path.cwd()))
 
 # Global singletons
-MCP: Optional[MCPClient] = None
+MCP_POOL: Optional[MCPWorkerPool] = None
+# LLM clients are created on first use and reused across requests
+LLM_CLIENTS = LLMClientPool.from_env()
+# Final answers of earlier questions (None unless ANSWER_CACHE is set)
+ANSWER_CACHE: Optional[AnswerCache] = AnswerCache.from_env()
+# "user": answers are reused only for the user who asked them (requests without a user are not cached);
+# "global": shared by all users
+ANSWER_CACHE_SCOPE = os.environ.get("ANSWER_CACHE_SCOPE", "user")
+# "events" replays the recorded session of a cached answer on /stream, "answer" sends only the answer
+ANSWER_CACHE_REPLAY = os.environ.get("ANSWER_CACHE_REPLAY", "events")
+# endpoint -> stop reason -> requests stopped by their step budget (reported by /health)
+BUDGET_STOPS: Dict[str, Dict[str, int]] = {}
+_budget_lock = threading.Lock()
 OPENAI_CLIENT: Optional[OpenAI] = None
 RESOLVED_PROVIDER: str = os.environ.get("LLM_PROVIDER", "nebius")
 RESOLVED_MODEL: Optional[str] = None
@@ -113,6 +164,8 @@ class AskRequest(BaseModel):
     model: Optional[str] = None
     referer: Optional[str] = None
     site_title: Optional[str] = None
+    # Skip the answer cache and always run the agent
+    no_cache: bool = False
 
 
 class BatchAskRequest(BaseModel):
@@ -121,6 +174,71 @@ class BatchAskRequest(BaseModel):
     model: Optional[str] = None
     referer: Optional[str] = None
     site_title: Optional[str] = None
+    no_cache: bool = False
+
+
+# Answers that must not be reused: errors and the ungrounded fallback after the step budget
+_UNCACHEABLE_ANSWER_PREFIXES = ("LLM create failed", "Konnte keine", "⚠️ **HINWEIS")
+
+
+def _cache_scope(user: Optional[AuthedUser]) -> Optional[str]:
+    """Answer cache scope of a request, None when it must not use the cache"""
+    if ANSWER_CACHE_SCOPE == "global":
+        return "global"
+    return f"user:{user.user_id}" if user is not None else None
+
+
+def _cached_result(query: str, model: str, no_cache: bool = False, user: Optional[AuthedUser] = None) -> Optional[Dict[str, Any]]:
+    """run_agent_with_token_tracking-shaped result from the answer cache, or None"""
+    scope = _cache_scope(user)
+    if ANSWER_CACHE is None or no_cache or scope is None:
+        return None
+    cached = ANSWER_CACHE.lookup(query, model or "", scope=scope)
+    if cached is None:
+        return None
+    return {
+        "answer": cached["answer"],
+        # Nothing was sent to the LLM for this request
+        "token_usage": {
+            "total_tokens_sent": 0,
+            "total_tokens_received": 0,
+            "total_tokens": 0,
+            "total_tokens_cached": 0,
+            "step_breakdown": [],
+            "cached": True,
+        },
+        "cache": {
+            "cached_query": cached["query"],
+            "similarity": round(cached["similarity"], 4),
+            "cached_at": cached["created"],
+            "source_session": cached["session_id"],
+        },
+    }
+
+
+def _remember_answer(
+    query: str,
+    model: str,
+    answer: str,
+    session_id: Optional[str] = None,
+    budget: Optional[Dict[str, Any]] = None,
+    user: Optional[AuthedUser] = None,
+) -> None:
+    scope = _cache_scope(user)
+    if ANSWER_CACHE is None or scope is None or not answer or answer.startswith(_UNCACHEABLE_ANSWER_PREFIXES):
+        return
+    # Research cut short by the step budget may be incomplete
+    if budget and budget.get("stop_reason"):
+        return
+    ANSWER_CACHE.store(query, model or "", answer, session_id=session_id, scope=scope)
+
+
+def _record_budget(stats: Dict[str, Any]) -> None:
+    if not stats.get("stop_reason"):
+        return
+    with _budget_lock:
+        reasons = BUDGET_STOPS.setdefault(stats["endpoint"], {})
+        reasons[stats["stop_reason"]] = reasons.get(stats["stop_reason"], 0) + 1
 
 
 def _resolve_llm(provider: Optional[str], model_override: Optional[str]) -> Dict[str, Any]:
@@ -137,7 +255,7 @@ def _resolve_llm(provider: Optional[str], model_override: Optional[str]) -> Dict
         model = model_override or os.environ.get("OPENROUTER_MODEL", "Qwen/Qwen3-235B-A22B-Instruct-2507")
         if not api_key:
             raise HTTPException(status_code=400, detail="Missing OPENROUTER_API_KEY")
-        client = OpenAI(base_url=base_url, api_key=api_key)
+        client = LLM_CLIENTS.get(provider, base_url, api_key)
         referer = os.environ.get("OPENROUTER_SITE_URL")
         site_title = os.environ.get("OPENROUTER_SITE_TITLE")
         return {
@@ -158,7 +276,7 @@ def _resolve_llm(provider: Optional[str], model_override: Optional[str]) -> Dict
             raise HTTPException(status_code=400, detail="Missing NEBIUS_API_KEY")
         if not model:
             raise HTTPException(status_code=400, detail="Missing NEBIUS_MODEL or model override")
-        client = OpenAI(base_url=base_url, api_key=api_key)
+        client = LLM_CLIENTS.get(provider, base_url, api_key)
         return {
             "provider": provider,
             "client": client,
@@ -171,7 +289,7 @@ def _resolve_llm(provider: Optional[str], model_override: Optional[str]) -> Dict
         base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")
         api_key = os.environ.get("OLLAMA_API_KEY", "ollama")
         model = model_override or os.environ.get("OLLAMA_MODEL", "qwen3:4b")
-        client = OpenAI(base_url=base_url, api_key=api_key)
+        client = LLM_CLIENTS.get(provider, base_url, api_key)
         return {
             "provider": provider,
             "client": client,
@@ -193,18 +311,19 @@ def run_agent_with_token_tracking(
     site_title: Optional[str],
     provider: str = "openrouter",
     tools_mode: str = "auto",
+    endpoint: str = "ask",
 ) -> Dict[str, Any]:
     """Wrapper around run_agent that captures token usage from stdout"""
     
-    # Capture stdout to extract token information
-    old_stdout = sys.stdout
-    sys.stdout = captured_output = StringIO()
-    
     total_tokens_sent = 0
     total_tokens_received = 0
+    total_tokens_cached = 0
     step_tokens = []
+    budget = StepBudget.from_config(cfg, endpoint)
     
-    try:
+    # Capture this thread's stdout to extract token information; concurrent
+    # requests on other threads keep their own output
+    with _STDOUT.capture() as captured_output:
         # Run the original agent
         answer = run_agent(
             query=query,
@@ -216,73 +335,91 @@ def run_agent_with_token_tracking(
             site_title=site_title,
             provider=provider,
             tools_mode=tools_mode,
+            budget=budget,
         )
-        
-        # Parse captured output for token information
-        output_lines = captured_output.getvalue().split('\n')
-        for line in output_lines:
-            # Match pattern: [TOKENS] Step X - Y sent, Z received
-            # or [TOKENS] Y sent, Z received
-            token_match = re.search(r'\[TOKENS\](?:\s+Step\s+(\d+)\s+-\s+)?(\d+)\s+sent,\s+(\d+)\s+received', line)
-            if token_match:
-                step_num = token_match.group(1)
-                sent = int(token_match.group(2))
-                received = int(token_match.group(3))
-                
-                total_tokens_sent += sent
-                total_tokens_received += received
-                
-                step_tokens.append({
-                    "step": int(step_num) if step_num else None,
-                    "tokens_sent": sent,
-                    "tokens_received": received
-                })
-        
-        return {
-            "answer": answer,
-            "token_usage": {
-                "total_tokens_sent": total_tokens_sent,
-                "total_tokens_received": total_tokens_received,
-                "total_tokens": total_tokens_sent + total_tokens_received,
-                "step_breakdown": step_tokens
-            }
-        }
-        
-    finally:
-        # Restore stdout
-        sys.stdout = old_stdout
+    _record_budget(budget.stats())
+    
+    # Parse captured output for token information
+    output_lines = captured_output.getvalue().split('\n')
+    for line in output_lines:
+        # Match pattern: [TOKENS] Step X - Y sent, Z received[, C cached]
+        # or [TOKENS] Y sent, Z received[, C cached]
+        token_match = re.search(r'\[TOKENS\]\s+(?:Step\s+(\d+)\s+-\s+)?(\d+)\s+sent,\s+(\d+)\s+received(?:,\s+(\d+)\s+cached)?', line)
+        if token_match:
+            step_num = token_match.group(1)
+            sent = int(token_match.group(2))
+            received = int(token_match.group(3))
+            cached = int(token_match.group(4) or 0)
+            
+            total_tokens_sent += sent
+            total_tokens_received += received
+            total_tokens_cached += cached
+            
+            step_tokens.append({
+                "step": int(step_num) if step_num else None,
+                "tokens_sent": sent,
+                "tokens_received": received,
+                "tokens_cached": cached,
+            })
+    
+    return {
+        "answer": answer,
+        "token_usage": {
+            "total_tokens_sent": total_tokens_sent,
+            "total_tokens_received": total_tokens_received,
+            "total_tokens": total_tokens_sent + total_tokens_received,
+            "total_tokens_cached": total_tokens_cached,
+            "step_breakdown": step_tokens
+        },
+        "budget": budget.stats(),
+    }
 
 
 @app.on_event("startup")
 def _startup() -> None:
-    global MCP, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL, RESOLVED_REFERER, RESOLVED_SITE_TITLE
+    global MCP_POOL, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL, RESOLVED_REFERER, RESOLVED_SITE_TITLE
     # Initialize DB
     try:
         init_db()
     except Exception:
         pass
-    MCP = MCPClient(server_cmd=None, env=os.environ.copy())
+    MCP_POOL = MCPWorkerPool.from_env(env=os.environ.copy(), tool_timeouts=CFG.get("tool_timeouts"))
+    MCP_POOL.start()
     llm = _resolve_llm(provider=os.environ.get("LLM_PROVIDER", "nebius"), model_override=None)
     OPENAI_CLIENT = llm["client"]
     RESOLVED_PROVIDER = llm["provider"]
     RESOLVED_MODEL = llm["model"]
     RESOLVED_REFERER = llm.get("referer")
     RESOLVED_SITE_TITLE = llm.get("site_title")
+    if ANSWER_CACHE is not None:
+        try:
+            ANSWER_CACHE.prune()
+        except Exception:
+            pass
 
 
 @app.on_event("shutdown")
 def _shutdown() -> None:
-    global MCP
+    global MCP_POOL
     try:
-        if MCP:
-            MCP.close()
+        if MCP_POOL:
+            MCP_POOL.close()
     except Exception:
         pass
+    LLM_CLIENTS.close()
 
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
-    return {"ok": True, "provider": RESOLVED_PROVIDER, "model": RESOLVED_MODEL}
+    return {
+        "ok": True,
+        "provider": RESOLVED_PROVIDER,
+        "model": RESOLVED_MODEL,
+        "mcp_pool": MCP_POOL.stats() if MCP_POOL else None,
+        "llm_clients": LLM_CLIENTS.stats(),
+        "answer_cache": ANSWER_CACHE.stats() if ANSWER_CACHE else None,
+        "budget_stops": BUDGET_STOPS,
+    }
 
 
 # ---- Auth helpers (Clerk JWT) ----
@@ -393,8 +530,8 @@ def admin_set_credits(req: SetCreditsRequest, user: AuthedUser = Depends(get_cur
 @app.post("/test")
 def test(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Session = Depends(get_db)) -> Dict[str, Any]:
     """Legal research endpoint with limited steps"""
-    global MCP
-    if not MCP:
+    global MCP_POOL
+    if not MCP_POOL:
         return {"error": "MCP server not ready"}
     
     try:
@@ -407,17 +544,22 @@ def test(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sess
         site_title = req.site_title if req.site_title is not None else llm.get("site_title")
         
         # Use agent with limited steps for legal research
-        result = run_agent_with_token_tracking(
-            query=req.query,
-            mcp=MCP,
-            cfg=CFG,
-            client=client,
-            model=model,
-            referer=referer,
-            site_title=site_title,
-            provider=llm["provider"],
-            tools_mode="auto",
-        )
+        result = _cached_result(req.query, model, req.no_cache, user)
+        if result is None:
+            with MCP_POOL.worker() as mcp:
+                result = run_agent_with_token_tracking(
+                    query=req.query,
+                    mcp=mcp,
+                    cfg=CFG,
+                    client=client,
+                    model=model,
+                    referer=referer,
+                    site_title=site_title,
+                    provider=llm["provider"],
+                    tools_mode="auto",
+                    endpoint="test",
+                )
+            _remember_answer(req.query, model, result["answer"], budget=result.get("budget"), user=user)
         # Deduct tokens (separate in/out)
         try:
             usage = result.get("token_usage", {})
@@ -429,6 +571,7 @@ def test(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sess
                 "model": model,
                 "token_usage": result["token_usage"],
                 "credits": updated.as_dict(),
+                **({"cache": result["cache"]} if result.get("cache") else {}),
             }
         except Exception:
             # If deduction failed, still return basic info
@@ -437,6 +580,7 @@ def test(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sess
                 "provider": llm["provider"],
                 "model": model,
                 "token_usage": result["token_usage"],
+                **({"cache": result["cache"]} if result.get("cache") else {}),
             }
     except Exception as e:
         return {"error": str(e)}
@@ -444,8 +588,8 @@ def test(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sess
 
 @app.post("/ask")
 def ask(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Session = Depends(get_db)) -> Dict[str, Any]:
-    global MCP, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL
-    if not MCP or not OPENAI_CLIENT:
+    global MCP_POOL, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL
+    if not MCP_POOL or not OPENAI_CLIENT:
         raise HTTPException(status_code=503, detail="Server is not ready")
 
     # Allow request-level override of provider/model
@@ -458,21 +602,28 @@ def ask(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sessi
         model = llm["model"]
         referer = req.referer if req.referer is not None else llm.get("referer")
         site_title = req.site_title if req.site_title is not None else llm.get("site_title")
-        result = run_agent_with_token_tracking(
-            query=req.query,
-            mcp=MCP,
-            cfg=CFG,
-            client=client,
-            model=model,
-            referer=referer,
-            site_title=site_title,
-            provider=llm["provider"],
-            tools_mode="auto",
-        )
+        result = _cached_result(req.query, model, req.no_cache, user)
+        if result is None:
+            with MCP_POOL.worker() as mcp:
+                result = run_agent_with_token_tracking(
+                    query=req.query,
+                    mcp=mcp,
+                    cfg=CFG,
+                    client=client,
+                    model=model,
+                    referer=referer,
+                    site_title=site_title,
+                    provider=llm["provider"],
+                    tools_mode="auto",
+                    endpoint="ask",
+                )
+            _remember_answer(req.query, model, result["answer"], budget=result.get("budget"), user=user)
         resp = {
             "answer": result["answer"],
             "token_usage": result["token_usage"]
         }
+        if result.get("cache"):
+            resp["cache"] = result["cache"]
         # Deduct tokens and attach credits snapshot
         try:
             usage = result.get("token_usage", {})
@@ -494,20 +645,24 @@ def ask(req: AskRequest, user: AuthedUser = Depends(get_current_user), db: Sessi
                 "query": req.query,
                 "answer_preview": (result.get("answer") or "")[:2000],
                 "token_usage": result.get("token_usage", {}),
+                "answer_cache": bool(result.get("cache")),
+                "budget": result.get("budget"),
             })
         except Exception:
             pass
         return resp
     except HTTPException:
         raise
+    except MCPPoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/batch")
 def batch(req: BatchAskRequest) -> Dict[str, Any]:
-    global MCP, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL
-    if not MCP or not OPENAI_CLIENT:
+    global MCP_POOL, OPENAI_CLIENT, RESOLVED_PROVIDER, RESOLVED_MODEL
+    if not MCP_POOL or not OPENAI_CLIENT:
         raise HTTPException(status_code=503, detail="Server is not ready")
 
     try:
@@ -520,21 +675,27 @@ def batch(req: BatchAskRequest) -> Dict[str, Any]:
         outputs: list[Dict[str, Any]] = []
         for idx, q in enumerate(req.queries):
             start_ts = time.time()
-            result = run_agent_with_token_tracking(
-                query=q,
-                mcp=MCP,
-                cfg=CFG,
-                client=client,
-                model=model,
-                referer=referer,
-                site_title=site_title,
-                provider=llm["provider"],
-                tools_mode="auto",
-            )
+            result = _cached_result(q, model, req.no_cache)
+            if result is None:
+                with MCP_POOL.worker() as mcp:
+                    result = run_agent_with_token_tracking(
+                        query=q,
+                        mcp=mcp,
+                        cfg=CFG,
+                        client=client,
+                        model=model,
+                        referer=referer,
+                        site_title=site_title,
+                        provider=llm["provider"],
+                        tools_mode="auto",
+                        endpoint="batch",
+                    )
+                _remember_answer(q, model, result["answer"], budget=result.get("budget"))
             outputs.append({
                 "query": q,
                 "answer": result["answer"],
-                "token_usage": result["token_usage"]
+                "token_usage": result["token_usage"],
+                **({"cache": result["cache"]} if result.get("cache") else {}),
             })
             end_ts = time.time()
             try:
@@ -552,53 +713,116 @@ def batch(req: BatchAskRequest) -> Dict[str, Any]:
                     "query": q,
                     "answer_preview": (result.get("answer") or "")[:2000],
                     "token_usage": result.get("token_usage", {}),
+                    "answer_cache": bool(result.get("cache")),
+                    "budget": result.get("budget"),
                 })
             except Exception:
                 pass
         return {"results": outputs}
     except HTTPException:
         raise
+    except MCPPoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-class StreamingMCPClient(MCPClient):
-    """MCP Client that can yield tool events for streaming"""
+class StreamingMCPClient:
+    """Wraps a pooled MCP worker and records tool events for streaming"""
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, mcp: MCPClient):
+        self.mcp = mcp
         self.tool_events = []
+        # Tools of one step run on several threads
+        self._events_lock = threading.Lock()
         
     def call_tool(self, tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
         # Emit tool start event
         start_time = time.time()
-        self.tool_events.append({
-            'type': 'tool_start',
-            'tool': tool,
-            'args': args,
-            'timestamp': start_time
-        })
+        with self._events_lock:
+            self.tool_events.append({
+                'type': 'tool_start',
+                'tool': tool,
+                'args': args,
+                'timestamp': start_time
+            })
         
         # Call the actual tool
-        result = super().call_tool(tool, args)
+        result = self.mcp.call_tool(tool, args)
         
         # Emit tool complete event
-        self.tool_events.append({
-            'type': 'tool_complete',
-            'tool': tool,
-            'args': args,
-            'result': result,
-            'timestamp': start_time
-        })
+        with self._events_lock:
+            self.tool_events.append({
+                'type': 'tool_complete',
+                'tool': tool,
+                'args': args,
+                'result': result,
+                'timestamp': start_time
+            })
         
         return result
     
     def get_and_clear_events(self) -> List[Dict[str, Any]]:
-        events = self.tool_events.copy()
-        self.tool_events.clear()
+        with self._events_lock:
+            events = self.tool_events.copy()
+            self.tool_events.clear()
         return events
 
 
+def _replay_cached_answer(query: str, provider: str, model: Optional[str], session_id: str, cached: Dict[str, Any]) -> Generator[str, None, None]:
+    """Stream a cached answer; with ANSWER_CACHE_REPLAY=events the recorded session is replayed first.
+
+    Token usage and credits of the recorded session are not replayed: this
+    request costs nothing and reports a zero, cached token_usage.
+    """
+    start_ts = time.time()
+    model = model or ""
+    yield f"data: {json.dumps({'type': 'session', 'session_id': session_id, 'timestamp': time.time()})}\n\n"
+    _session_log(session_id, {"type": "session", "query": query, "provider": provider, "model": model})
+    cache_evt = {'type': 'answer_cache', **cached["cache"]}
+    yield f"data: {json.dumps({**cache_evt, 'timestamp': time.time()})}\n\n"
+    _session_log(session_id, cache_evt)
+    usage_evt = {'type': 'token_usage', 'tokens_sent': 0, 'tokens_received': 0, 'tokens_cached': 0, 'step': 0, 'cached': True}
+    yield f"data: {json.dumps({**usage_evt, 'timestamp': time.time()})}\n\n"
+    _session_log(session_id, usage_evt)
+    source = cached["cache"].get("source_session")
+    source_path = SESSIONS_DIR / f"{source}.jsonl" if source else None
+    if ANSWER_CACHE_REPLAY == "events" and source_path is not None and source_path.exists():
+        try:
+            with source_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get("type") in ("session", "answer_cache", "final_answer", "complete", "error", "token_usage", "credits", "budget"):
+                        continue
+                    event = {k: v for k, v in event.items() if k not in ("ts", "session_id")}
+                    event["replay"] = True
+                    yield f"data: {json.dumps({**event, 'timestamp': time.time()})}\n\n"
+        except OSError:
+            pass
+    final_evt = {'type': 'final_answer', 'message': cached["answer"], 'cached': True}
+    yield f"data: {json.dumps({**final_evt, 'timestamp': time.time()})}\n\n"
+    _session_log(session_id, final_evt)
+    end_ts = time.time()
+    _log_interaction({
+        "timestamp": end_ts,
+        "timestamp_iso": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(end_ts)),
+        "duration_ms": int((end_ts - start_ts) * 1000),
+        "endpoint": "stream",
+        "provider": provider,
+        "model": model,
+        "query": query,
+        "answer_preview": (cached["answer"] or "")[:2000],
+        "token_usage": cached["token_usage"],
+        "answer_cache": True,
+    })
+    complete_evt = {'type': 'complete'}
+    yield f"data: {json.dumps({**complete_evt, 'timestamp': time.time()})}\n\n"
+    _session_log(session_id, complete_evt)
+
+
 def stream_agent_response(
     query: str,
     provider: str,
@@ -607,13 +831,28 @@ def stream_agent_response(
     api_key: Optional[str] = None,
     base_url: Optional[str] = None,
     user: Optional[AuthedUser] = None,
+    no_cache: bool = False,
 ) -> Generator[str, None, None]:
     """Stream agent response with real-time tool usage"""
     
-    # Set up MCP client
-    mcp = StreamingMCPClient(server_cmd=None, env=os.environ.copy())
-    
+    # Repeated questions are answered from the answer cache without running the agent
+    try:
+        cached_model = _resolve_llm(provider=provider, model_override=model)["model"]
+        cached = _cached_result(query, cached_model, no_cache, user)
+    except Exception:
+        cached = None
+    if cached is not None:
+        yield from _replay_cached_answer(query, provider, cached_model, session_id, cached)
+        return
+
+    worker: Optional[MCPClient] = None
     try:
+        # Check out a warm MCP worker for the whole session
+        if not MCP_POOL:
+            raise RuntimeError("MCP server not ready")
+        worker = MCP_POOL.checkout()
+        mcp = StreamingMCPClient(worker)
+        
         # Set up LLM client
         llm = _resolve_llm(provider=provider, model_override=model)
         client = llm["client"]
@@ -623,6 +862,7 @@ def stream_agent_response(
         start_ts = time.time()
         total_tokens_sent = 0
         total_tokens_received = 0
+        total_tokens_cached = 0
         final_answer_logged: Optional[str] = None
         
         # Announce session and initial status
@@ -633,7 +873,7 @@ def stream_agent_response(
         _session_log(session_id, thinking_evt)
         
         # Set up tools and messages
-        tools = _build_tools_spec()
+        tools = TOOLS_SPEC
         extra_headers = {}
         if referer:
             extra_headers["HTTP-Referer"] = referer
@@ -641,17 +881,33 @@ def stream_agent_response(
             extra_headers["X-Title"] = site_title
             
         # Use shared dispatcher functions from agent_cli.py
-        DISPATCH = build_dispatch_functions(mcp, CFG)
+        compactor = ContextCompactor.from_config(CFG)
+        memo = ToolCallMemo(max_age=compactor.keep_steps if compactor is not None else None) if CFG.get("memoize_tool_calls", True) else None
+        DISPATCH = build_dispatch_functions(mcp, CFG, memo)
         
         messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            system_message(llm.get("provider") or provider, resolved_model, bool(CFG.get("prompt_cache", True))),
             {"role": "user", "content": f"Question: {query}"},
         ]
         
         steps = 0
-        max_steps = 50  # Reduced for streaming
+        budget = StepBudget.from_config(CFG, "stream")
+        # Set once the budget is used up: one last call without tools for the final answer
+        wrap_up = False
         
-        while steps < max_steps:
+        while True:
+            if not wrap_up and budget.check() is not None:
+                _record_budget(budget.stats())
+                budget_evt = {'type': 'budget', 'message': f'Recherche beendet: {budget.reason_text()}', **budget.stats()}
+                yield f"data: {json.dumps({**budget_evt, 'timestamp': time.time()})}\n\n"
+                _session_log(session_id, budget_evt)
+                if not budget.seen:
+                    err_evt = {'type': 'error', 'message': f'Keine Quellen gefunden: {budget.reason_text()}'}
+                    yield f"data: {json.dumps({**err_evt, 'timestamp': time.time()})}\n\n"
+                    _session_log(session_id, err_evt)
+                    break
+                messages.append(budget.wrap_up_message())
+                wrap_up = True
             print("\nSTEP", steps)
             step_evt = {'type': 'step', 'message': f'Schritt {steps + 1}: Verarbeite Anfrage...'}
             yield f"data: {json.dumps({**step_evt, 'timestamp': time.time()})}\n\n"
@@ -661,27 +917,49 @@ def stream_agent_response(
 #            tool_choice_val = "auto" if used_any_tool else "required" if provider != "ollama" else "auto"
             
             steps += 1
+            budget.start_step()
+            if memo is not None:
+                memo.step = steps
+            if compactor is not None:
+                compacted = compactor.compact(messages, steps)
+                if compacted["tokens_removed"]:
+                    compact_evt = {'type': 'compaction', 'step': steps, **compacted, 'session_tokens_saved': compactor.tokens_saved}
+                    yield f"data: {json.dumps({**compact_evt, 'timestamp': time.time()})}\n\n"
+                    _session_log(session_id, compact_evt)
             
             try:
                 create_kwargs = dict(
                     model=resolved_model,
                     messages=messages,
                     tools=tools,
-                    tool_choice="auto", #tool_choice_val,
+                    tool_choice="none" if wrap_up else "auto", #tool_choice_val,
                     extra_headers=extra_headers or None,
                     timeout=30
                 )
                 
-                resp = client.chat.completions.create(**create_kwargs)
+                # Forward content/reasoning tokens as they arrive
+                resp = None
+                streamed_reasoning = False
+                for kind, value in iter_chat_completion(client, stream=bool(CFG.get("llm_stream", LLM_STREAM)), **create_kwargs):
+                    if kind == "response":
+                        resp = value
+                    elif kind == "content":
+                        yield f"data: {json.dumps({'type': 'content_delta', 'delta': value, 'step': steps, 'timestamp': time.time()})}\n\n"
+                    elif kind == "reasoning":
+                        streamed_reasoning = True
+                        yield f"data: {json.dumps({'type': 'reasoning_delta', 'delta': value, 'step': steps, 'timestamp': time.time()})}\n\n"
 #                print (resp)
                 # Track token usage immediately
                 if resp.usage:
                     tokens_sent = resp.usage.prompt_tokens
                     tokens_received = resp.usage.completion_tokens
-                    print(f"[DEBUG] Emitting token usage: {tokens_sent} sent, {tokens_received} received for step {steps}")
+                    tokens_cached = cached_prompt_tokens(resp.usage)
+                    print(f"[DEBUG] Emitting token usage: {tokens_sent} sent, {tokens_received} received, {tokens_cached} cached for step {steps}")
                     total_tokens_sent += tokens_sent
                     total_tokens_received += tokens_received
-                    yield f"data: {json.dumps({'type': 'token_usage', 'tokens_sent': tokens_sent, 'tokens_received': tokens_received, 'step': steps, 'timestamp': time.time()})}\n\n"
+                    total_tokens_cached += tokens_cached
+                    budget.record_usage(resp.usage)
+                    yield f"data: {json.dumps({'type': 'token_usage', 'tokens_sent': tokens_sent, 'tokens_received': tokens_received, 'tokens_cached': tokens_cached, 'step': steps, 'timestamp': time.time()})}\n\n"
                     # Per-step deduction if user provided
                     try:
                         if user:
@@ -707,6 +985,11 @@ def stream_agent_response(
             
             # Process response
             if not getattr(resp, "choices", None) or not resp.choices:
+                if wrap_up:
+                    err_evt = {'type': 'error', 'message': f'Keine Antwort erhalten: {budget.reason_text()}'}
+                    yield f"data: {json.dumps({**err_evt, 'timestamp': time.time()})}\n\n"
+                    _session_log(session_id, err_evt)
+                    break
                 time.sleep(0.2)
                 continue
                 
@@ -715,8 +998,8 @@ def stream_agent_response(
             reasoning_content = getattr(msg, "reasoning_content", None) or ""
             tool_calls = getattr(msg, "tool_calls", None)
             
-            # Emit reasoning content if available
-            if reasoning_content:
+            # Emit reasoning content if available (already sent as deltas when streaming)
+            if reasoning_content and not streamed_reasoning:
                 yield f"data: {json.dumps({'type': 'reasoning', 'content': reasoning_content, 'timestamp': time.time()})}\n\n"
             
             # Handle function call format
@@ -728,7 +1011,7 @@ def stream_agent_response(
                     "function": {"name": fc.name, "arguments": fc.arguments or "{}"},
                 }]
                 
-            if tool_calls:
+            if tool_calls and not wrap_up:
                 # Stream tool thinking
                 for tc in tool_calls:
                     tool_name = tc.function.name
@@ -760,38 +1043,31 @@ def stream_agent_response(
                     })
                 messages.append(assistant_msg)
                 
-                # Execute tools and stream events
-                for tc in tool_calls:
-                    name = tc.function.name
-                    try:
-                        args = json.loads(tc.function.arguments or "{}")
-                    except Exception:
-                        args = {}
-                    fn = DISPATCH.get(name)
-                    if not fn:
-                        result_text = json.dumps({"error": f"Unknown tool: {name}"}, ensure_ascii=False)
-                    else:
-                        try:
-                            result_text = fn(**args)
-                            
-                            # Stream and persist tool events
-                            events = mcp.get_and_clear_events()
-                            for event in events:
-                                tool_evt = {'type': 'tool_event', 'event': event}
-                                yield f"data: {json.dumps({**tool_evt, 'timestamp': time.time()})}\n\n"
-                                _session_log(session_id, tool_evt)
-                                
-                        except Exception as e:
-                            result_text = json.dumps({"error": str(e)}, ensure_ascii=False)
-                            tool_err = {'type': 'tool_event', 'event': {'type': 'tool_error', 'tool': name, 'error': str(e)}}
-                            yield f"data: {json.dumps({**tool_err, 'timestamp': time.time()})}\n\n"
-                            _session_log(session_id, tool_err)
-                            
-                    messages.append({
+                # Execute tools concurrently and stream events as each call completes
+                results: List[str] = [""] * len(tool_calls)
+                concurrency = int(CFG.get("tool_concurrency", DEFAULT_TOOL_CONCURRENCY))
+                for i, result_text, error in iter_tool_results(tool_calls, DISPATCH, concurrency):
+                    results[i] = result_text
+                    for event in mcp.get_and_clear_events():
+                        tool_evt = {'type': 'tool_event', 'event': event}
+                        yield f"data: {json.dumps({**tool_evt, 'timestamp': time.time()})}\n\n"
+                        _session_log(session_id, tool_evt)
+                    if error is not None:
+                        tool_err = {'type': 'tool_event', 'event': {'type': 'tool_error', 'tool': tool_calls[i].function.name, 'error': str(error)}}
+                        yield f"data: {json.dumps({**tool_err, 'timestamp': time.time()})}\n\n"
+                        _session_log(session_id, tool_err)
+
+                # Tool messages keep the order of tool_calls
+                for tc, result_text in zip(tool_calls, results):
+                    tool_msg = {
                         "role": "tool",
                         "tool_call_id": tc.id,
                         "content": result_text,
-                    })
+                    }
+                    if compactor is not None:
+                        compactor.add_tool_message(tool_msg, steps)
+                    messages.append(tool_msg)
+                budget.record_results([tc.function.name for tc in tool_calls], results)
                 continue
                 
             # Final response
@@ -799,6 +1075,7 @@ def stream_agent_response(
             final_evt = {'type': 'final_answer', 'message': final_answer}
             yield f"data: {json.dumps({**final_evt, 'timestamp': time.time()})}\n\n"
             _session_log(session_id, final_evt)
+            _remember_answer(query, resolved_model, final_answer, session_id, budget=budget.stats(), user=user)
             # Log the interaction upon final answer
             end_ts = time.time()
             try:
@@ -817,24 +1094,25 @@ def stream_agent_response(
                         "total_tokens_sent": total_tokens_sent,
                         "total_tokens_received": total_tokens_received,
                         "total_tokens": total_tokens_sent + total_tokens_received,
+                        "total_tokens_cached": total_tokens_cached,
+                        "tokens_saved_by_compaction": compactor.tokens_saved if compactor is not None else 0,
                     },
+                    "memoized_tool_calls": memo.hits if memo is not None else 0,
+                    "answer_cache": False,
                     "steps": steps,
+                    "budget": budget.stats(),
                 })
             except Exception:
                 pass
             break
             
-        if steps >= max_steps:
-            err_evt = {'type': 'error', 'message': 'Maximale Anzahl Schritte erreicht'}
-            yield f"data: {json.dumps({**err_evt, 'timestamp': time.time()})}\n\n"
-            _session_log(session_id, err_evt)
-            
     except Exception as e:
         err_evt = {'type': 'error', 'message': f'Systemfehler: {str(e)}'}
         yield f"data: {json.dumps({**err_evt, 'timestamp': time.time()})}\n\n"
         _session_log(session_id, err_evt)
     finally:
-        mcp.close()
+        if worker is not None and MCP_POOL:
+            MCP_POOL.checkin(worker)
         
     complete_evt = {'type': 'complete'}
     yield f"data: {json.dumps({**complete_evt, 'timestamp': time.time()})}\n\n"
@@ -853,6 +1131,7 @@ def stream_ask(req: AskRequest, user: AuthedUser = Depends(get_current_user)):
                 model=req.model or RESOLVED_MODEL,
                 session_id=session_id,
                 user=user,
+                no_cache=req.no_cache,
             ):
                 yield event
         except Exception as e:
@@ -0,0 +1,93 @@
+"""Shared OpenAI-compatible LLM clients for the API endpoints."""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # optional dependency (pip install legalgenius[http2])
+    HTTP2_AVAILABLE = False
+
+
+class LLMClientPool:
+    """
+    One OpenAI client per (provider, base_url, api_key), created on first use
+    and shared by all requests and threads.
+
+    - Each client owns a keep-alive connection pool, so consecutive /ask,
+      /test, /batch and /stream calls skip the TCP and TLS handshakes.
+    - HTTP/2 (multiplexing concurrent completions over one connection) is
+      used when the h2 package is installed, unless disabled.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 120.0,
+        http2: Optional[bool] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+        self._clients: Dict[Tuple[str, str, str], OpenAI] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMClientPool":
+        http2 = os.environ.get("LLM_HTTP2", "auto").lower()
+        return cls(
+            max_connections=int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", "120")),
+            http2=None if http2 == "auto" else http2 not in ("0", "false", "no", "off"),
+        )
+
+    def get(self, provider: str, base_url: str, api_key: str) -> OpenAI:
+        key = (provider, base_url, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.reused += 1
+                return client
+            client = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                http_client=DefaultHttpxClient(limits=self.limits, http2=self.http2),
+            )
+            self._clients[key] = client
+            self.created += 1
+            return client
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "created": self.created,
+                "reused": self.reused,
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
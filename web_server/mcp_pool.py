@@ -0,0 +1,216 @@
+"""Pool of long-lived MCP server processes shared by the API endpoints."""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from client.agent_cli import MCPClient, make_mcp_client
+
+
+class MCPPoolExhausted(RuntimeError):
+    pass
+
+
+class MCPWorkerPool:
+    """
+    Fixed-size pool of MCP server subprocesses with checkout/checkin semantics.
+    With MCP_TRANSPORT=inprocess the workers are in-process clients instead.
+
+    - Workers are spawned once and reused, so imports, config and warm caches
+      survive across API requests.
+    - checkout() health-checks a worker (process alive + ping round-trip) and
+      transparently replaces dead ones.
+    - checkin() recycles a worker after max_requests checkouts; replacements
+      are spawned in the background so the request that returns it is not
+      delayed.
+    - The pool counts its workers (idle, checked out or being spawned). If a
+      spawn fails, checkout() refills the missing slots on demand, so
+      transient failures do not shrink the pool for good.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        max_requests: int = 200,
+        checkout_timeout: float = 30.0,
+        ping_timeout: float = 5.0,
+        server_cmd: Optional[List[str]] = None,
+        env: Optional[dict] = None,
+        transport: Optional[str] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        preload: bool = True,
+    ):
+        self.size = max(1, size)
+        self.max_requests = max_requests
+        self.checkout_timeout = checkout_timeout
+        self.ping_timeout = ping_timeout
+        self.server_cmd = server_cmd
+        if preload and transport != "inprocess":
+            # Workers warm up (config, ES connection pool) right after spawning
+            env = dict(env if env is not None else os.environ)
+            env.setdefault("MCP_PRELOAD", "1")
+        self.env = env
+        self.transport = transport
+        self.tool_timeouts = tool_timeouts
+        # LIFO keeps the most recently used (warmest) worker in front
+        self._idle: "queue.LifoQueue[MCPClient]" = queue.LifoQueue()
+        self._served: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        # Workers that exist or are being spawned; at most size
+        self._slots = 0
+        self.spawned = 0
+        self.spawn_failures = 0
+        self.recycled = 0
+        self.replaced_unhealthy = 0
+
+    @classmethod
+    def from_env(cls, env: Optional[dict] = None, tool_timeouts: Optional[Dict[str, float]] = None) -> "MCPWorkerPool":
+        return cls(
+            size=int(os.environ.get("MCP_POOL_SIZE", "4")),
+            max_requests=int(os.environ.get("MCP_POOL_MAX_REQUESTS", "200")),
+            checkout_timeout=float(os.environ.get("MCP_POOL_CHECKOUT_TIMEOUT", "30")),
+            env=env,
+            transport=os.environ.get("MCP_TRANSPORT"),
+            tool_timeouts=tool_timeouts,
+        )
+
+    def start(self) -> None:
+        for _ in range(self.size):
+            try:
+                worker = self._spawn()
+            except Exception as e:
+                # checkout() spawns the missing worker later
+                print(f"[mcp-pool] Could not spawn worker: {e}")
+                continue
+            if worker is not None:
+                self._idle.put(worker)
+
+    def _spawn(self) -> Optional[MCPClient]:
+        """New worker in a free slot; None if the pool is full. A failed spawn gives the slot back and raises."""
+        with self._lock:
+            if self._slots >= self.size:
+                return None
+            self._slots += 1
+        try:
+            worker = make_mcp_client(server_cmd=self.server_cmd, env=self.env, transport=self.transport, tool_timeouts=self.tool_timeouts)
+        except Exception:
+            with self._lock:
+                self._slots -= 1
+                self.spawn_failures += 1
+            raise
+        with self._lock:
+            self._served[id(worker)] = 0
+            self.spawned += 1
+        return worker
+
+    def _retire(self, worker: MCPClient) -> None:
+        with self._lock:
+            self._served.pop(id(worker), None)
+            self._slots -= 1
+        try:
+            worker.close()
+        except Exception:
+            pass
+
+    def _replace_in_background(self, worker: MCPClient) -> None:
+        def _run():
+            self._retire(worker)
+            if self._closed:
+                return
+            try:
+                replacement = self._spawn()
+            except Exception as e:
+                print(f"[mcp-pool] Could not spawn replacement worker: {e}")
+                return
+            if replacement is not None:
+                self._idle.put(replacement)
+        threading.Thread(target=_run, name="mcp-pool-replace", daemon=True).start()
+
+    def healthy(self, worker: MCPClient) -> bool:
+        return worker.alive and worker.ping(timeout=self.ping_timeout)
+
+    def checkout(self) -> MCPClient:
+        if self._closed:
+            raise MCPPoolExhausted("MCP worker pool is closed")
+        deadline = time.monotonic() + self.checkout_timeout
+        last_error: Optional[Exception] = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                detail = f" (last spawn error: {last_error})" if last_error is not None else ""
+                raise MCPPoolExhausted(f"No MCP worker available within {self.checkout_timeout:.0f}s{detail}")
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = None
+            if worker is None:
+                # Below size (failed spawns, retired workers): refill the slot now
+                try:
+                    worker = self._spawn()
+                except Exception as e:
+                    last_error = e
+                    time.sleep(min(0.5, max(0.0, remaining)))
+                    continue
+            if worker is None:
+                # Pool is full: wait for a checkin, waking up now and then in case a slot frees up
+                try:
+                    worker = self._idle.get(timeout=min(1.0, remaining))
+                except queue.Empty:
+                    continue
+            if self.healthy(worker):
+                return worker
+            with self._lock:
+                self.replaced_unhealthy += 1
+            self._retire(worker)
+
+    def checkin(self, worker: MCPClient) -> None:
+        with self._lock:
+            served = self._served.get(id(worker), 0) + 1
+            self._served[id(worker)] = served
+        if self._closed:
+            self._retire(worker)
+        elif not worker.alive:
+            with self._lock:
+                self.replaced_unhealthy += 1
+            self._replace_in_background(worker)
+        elif self.max_requests and served >= self.max_requests:
+            with self._lock:
+                self.recycled += 1
+            self._replace_in_background(worker)
+        else:
+            self._idle.put(worker)
+
+    @contextmanager
+    def worker(self) -> Iterator[MCPClient]:
+        worker = self.checkout()
+        try:
+            yield worker
+        finally:
+            self.checkin(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "max_requests": self.max_requests,
+                "workers": self._slots,
+                "spawned": self.spawned,
+                "spawn_failures": self.spawn_failures,
+                "recycled": self.recycled,
+                "replaced_unhealthy": self.replaced_unhealthy,
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(worker)